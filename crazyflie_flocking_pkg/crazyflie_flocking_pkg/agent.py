@@ -1,16 +1,27 @@
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict
 
 import numpy as np
-from rclpy.impl.rcutils_logger import RcutilsLogger
 
 from crazyflie_flocking_pkg.flocking_forces import ForcesGenerator
+from crazyflie_flocking_pkg.utils import NavigationField, OccupancyGrid
 from crazyflie_flocking_pkg.utils.configuration import FlockingConfig
 from crazyflie_flocking_pkg.utils.definitions import (
-    Direction,
-    Obstacle,
+    OBSTACLE_DTYPE,
+    OBSTACLE_THRESHOLD,
     ObstacleType,
 )
-from crazyflie_swarm_pkg.crazyflie import CrazyState
+from crazyflie_flocking_pkg.utils.telemetry import FlockingTelemetry
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import (
+    MULTIRANGER_BEAMS,
+    CrazyState,
+)
+
+if TYPE_CHECKING:
+    from rclpy.impl.rcutils_logger import RcutilsLogger
+
+# Shared result of the ticks without obstacles, an empty array has nothing to modify
+NO_OBSTACLES = np.zeros(0, dtype=OBSTACLE_DTYPE)
+NO_OBSTACLES.flags.writeable = False
 
 
 class Agent:
@@ -18,10 +29,17 @@ class Agent:
         self,
         name: str,
         config: FlockingConfig,
-        ros2_logger: RcutilsLogger = None,
+        ros2_logger: "RcutilsLogger" = None,
+        telemetry: FlockingTelemetry = None,
+        occupancy_grid: OccupancyGrid = None,
+        navigation: NavigationField = None,
     ):
-        self.forces_gen = ForcesGenerator(config, ros2_logger)
+        self.forces_gen = ForcesGenerator(config, ros2_logger, occupancy_grid)
         self.ros2_logger = ros2_logger
+        self.telemetry = telemetry  # Records every tick if not None
+        self.occupancy_grid = occupancy_grid  # Shared by the agents of the swarm if not None
+        self.navigation = navigation  # Shared by the agents of the swarm if not None
+        self.goal = -1  # Id of the goal in navigation, -1 for none
         self.config = config
         self.name = name
         self.counter = 0
@@ -39,13 +57,24 @@ class Agent:
         neighbors = swarm_state.copy()
         neighbors.pop(self.name)  # remove myself from neighbors
 
-        # TODO: CONFIG
+        # Migration towards the goal, a lookup in its navigation function
         v_mig = np.array([0.0, 0.0, 0.0])
-        
+        if self.navigation is not None and self.goal >= 0:
+            v_mig = self.navigation.velocities(
+                state.get_position(),
+                self.goal,
+                self.config.migration.speed,
+                self.config.migration.slowdown_distance,
+            )[0]
+
         # Obstacles
         detected_obstacles = self.detect_obstacles(state)
-        obstacles = self.classify_obstacles(neighbors, detected_obstacles)
-        
+        obstacles = self.classify_obstacles(
+            neighbors, detected_obstacles, get_neighbor_positions(neighbors)
+        )
+        if self.occupancy_grid is not None:
+            self.update_occupancy_grid(state, neighbors)
+
         # Compute the forces
         forces = self.forces_gen.get_forces(
             state, neighbors, obstacles, v_mig
@@ -56,178 +85,137 @@ class Agent:
             -self.config.bounds.force_max,
             self.config.bounds.force_max,
         )
-        
+
         # Compute linear velocity
         v = self.config.gains.k_l * overall_force
         v = np.clip(v, -self.config.bounds.v_max, self.config.bounds.v_max)
-        
+
         # Compute angular velocity
         omega = 0.0
         if not is_omnidirectional:
             # Align overall_force to u_i
             cosyaw = np.cos(np.deg2rad(state.yaw))
             sinyaw = np.sin(np.deg2rad(state.yaw))
-            u_i = np.reshape(np.array([cosyaw, sinyaw, 0]), (3,1))
-            
+            u_i = np.reshape(np.array([cosyaw, sinyaw, 0]), (3, 1))
+
             # Linear speed, formulas (5), (7) TODO: aggiusta
-            v_scalar = self.config.gains.k_l * (np.dot(np.reshape(overall_force, (1,3)), u_i))
+            v_scalar = self.config.gains.k_l * (np.dot(np.reshape(overall_force, (1, 3)), u_i))
             v_scalar = np.clip(v_scalar, self.config.bounds.v_min, self.config.bounds.v_max)
             v = v_scalar[0] * u_i
-            v = np.reshape(v,(3,))
-            
+            v = np.reshape(v, (3,))
+
             # Angular speed, formula (8)
             # u_i_orthogonal computed as vector orthogonal to u_i and vector_orthogonal_to_plane (z axis)
             zdir = np.array([[0], [0], [1]])
             u_i_orthogonal = np.cross(zdir[:, 0], u_i[:, 0])
             omega_scalar = self.config.gains.k_a * (np.dot(overall_force, u_i_orthogonal))
-            self.ros2_logger.info(f"omega_scalar: {np.round(omega_scalar,2)}")
-            omega_scalar = np.clip(omega_scalar, self.config.bounds.omega_min, self.config.bounds.omega_max) 
+            omega_scalar = np.clip(omega_scalar, self.config.bounds.omega_min, self.config.bounds.omega_max)
             omega = -omega_scalar
-        
-        self.ros2_logger.info("")
-        self.ros2_logger.info("-------------------------")
-        self.ros2_logger.info(f"Agent {self.name}")
-        self.ros2_logger.info(f"State\n{state}")
-        self.ros2_logger.info(f"Number of obstacles: {len(obstacles)}")
-        self.ros2_logger.info(f"Inter Robot Force: {np.round(forces[:, 0],2)}")
-        self.ros2_logger.info(f"Obstacle Force: {np.round(forces[:, 1],2)}")
-        self.ros2_logger.info(f"Migration Force: {np.round(forces[:, 2],2)}")
-        self.ros2_logger.info(f"Overall Force: {np.round(overall_force,2)}")
-        if not is_omnidirectional:
-            self.ros2_logger.info(f"u_i: {np.round(u_i.transpose(),2)}")
-            self.ros2_logger.info(f"u_i_orthogonal: {np.round(u_i_orthogonal,2)}")
-            self.ros2_logger.info(f"v_scalar: {np.round(v_scalar,2)}")
-        self.ros2_logger.info(f"v: {np.round(v,2)}")
-        self.ros2_logger.info(f"omega: {np.round(omega,2)}")
-        self.ros2_logger.info("-------------------------")
-        self.ros2_logger.info("")
+
+        if self.telemetry is not None:
+            self.telemetry.record_agent(self.name, forces, v, omega, len(obstacles))
 
         return v, omega
 
     def detect_obstacles(
         self,
         state: CrazyState,
-    ) -> List[Obstacle]:
+    ) -> np.ndarray:
         """
-        Detects obstacles around the agent based on its state and the states of its neighbors.
+        Detects obstacles around the agent based on its multiranger readings.
         Args:
             state (CrazyState): The current state of the agent, which includes sensor readings.
-            neighbors (Dict[str, CrazyState]): A dictionary of neighboring agents' states, keyed by their identifiers.
         Returns:
-            List[Obstacle]: A list of detected obstacles, each with its absolute position, relative position, direction, and type.
-        The function performs the following steps:
-        1. Initializes an empty list to store detected obstacles.
-        2. Checks the agent's sensor readings in the front, left, back, right, and up directions.
-        If an obstacle is detected within a threshold distance (2 units), it calculates the obstacle's relative position,
-        converts it to an absolute position, and appends it to the list of detected obstacles.
+            np.ndarray: An OBSTACLE_DTYPE array with a record for every beam, among front, right,
+            back, left and up, reading an obstacle closer than OBSTACLE_THRESHOLD, with its
+            absolute position, relative position and direction. The type is left to classify_obstacles.
         """
-        detected_obstacles: List[Obstacle] = []
-        obstacle_threshold = 2
-
-        if state.mr_front < obstacle_threshold:
-            obstacle_rel_pos = state.mr_front * np.array([1, 0, 0])
-            obstacle_abs_pos = state.rel2glob(obstacle_rel_pos)
-            detected_obstacles.append(
-                Obstacle(
-                    abs_pos=obstacle_abs_pos,
-                    direction=Direction.front,
-                    rel_pos=obstacle_rel_pos,
-                )
-            )
-
-        if state.mr_left < obstacle_threshold:
-            obstacle_rel_pos = state.mr_left * np.array([0, 1, 0])
-            obstacle_abs_pos = state.rel2glob(obstacle_rel_pos)
-            detected_obstacles.append(
-                Obstacle(
-                    abs_pos=obstacle_abs_pos,
-                    direction=Direction.left,
-                    rel_pos=obstacle_rel_pos,
-                )
-            )
-
-        if state.mr_back < obstacle_threshold:
-            obstacle_rel_pos = state.mr_back * np.array([-1, 0, 0])
-            obstacle_abs_pos = state.rel2glob(obstacle_rel_pos)
-            detected_obstacles.append(
-                Obstacle(
-                    abs_pos=obstacle_abs_pos,
-                    direction=Direction.back,
-                    rel_pos=obstacle_rel_pos,
-                )
-            )
-
-        if state.mr_right < obstacle_threshold:
-            obstacle_rel_pos = state.mr_right * np.array([0, -1, 0])
-            obstacle_abs_pos = state.rel2glob(obstacle_rel_pos)
-            detected_obstacles.append(
-                Obstacle(
-                    abs_pos=obstacle_abs_pos,
-                    direction=Direction.right,
-                    rel_pos=obstacle_rel_pos,
-                )
-            )
-
-        if state.mr_up < obstacle_threshold:
-            obstacle_rel_pos = state.mr_up * np.array([0, 0, 1])
-            obstacle_abs_pos = state.rel2glob(obstacle_rel_pos)
-            detected_obstacles.append(
-                Obstacle(
-                    abs_pos=obstacle_abs_pos,
-                    direction=Direction.up,
-                    rel_pos=obstacle_rel_pos,
-                )
-            )
-
-        return detected_obstacles
+        ranges = (state.mr_front, state.mr_right, state.mr_back, state.mr_left, state.mr_up)
+        if min(ranges) >= OBSTACLE_THRESHOLD:
+            return NO_OBSTACLES
+
+        # World frame points of all the beams at once, NaN out of the threshold
+        points = state.multiranger_to_world(OBSTACLE_THRESHOLD)
+        directions = np.flatnonzero(~np.isnan(points[:, 0]))
+
+        obstacles = np.zeros(directions.shape[0], dtype=OBSTACLE_DTYPE)
+        obstacles["rel_pos"] = np.array(ranges)[directions, np.newaxis] * MULTIRANGER_BEAMS[directions]
+        obstacles["abs_pos"] = points[directions]
+        obstacles["direction"] = directions
+        obstacles["type"] = ObstacleType.none.value
+        return obstacles
+
+    def update_occupancy_grid(
+        self, state: CrazyState, neighbors: Dict[str, CrazyState]
+    ) -> None:
+        """
+        Integrates the horizontal multiranger beams of the agent in the shared
+        occupancy grid. Beams ending on a neighbor are only free space.
+        """
+        self.occupancy_grid.update_beams(
+            state.get_position(),
+            np.array([state.yaw]),
+            np.array([[state.mr_front, state.mr_right, state.mr_back, state.mr_left]]),
+            MULTIRANGER_BEAMS[:4],
+            OBSTACLE_THRESHOLD,
+            drones=np.array([(n.x, n.y) for n in neighbors.values()]).reshape(-1, 2),
+            drone_threshold=self.config.obstacles.drone_threshold,
+        )
 
     def classify_obstacles(
         self,
         neighbors: Dict[str, CrazyState],
-        detected_obstacles: List[Obstacle],
-    ) -> List[Obstacle]:
+        detected_obstacles: np.ndarray,
+        neighbor_positions: np.ndarray = None,
+    ) -> np.ndarray:
         """
 
         Args:
-            state (CrazyState): The current state of the agent, which includes sensor readings.
             neighbors (Dict[str, CrazyState]): A dictionary of neighboring agents' states, keyed by their identifiers.
+            detected_obstacles (np.ndarray): The OBSTACLE_DTYPE array of detect_obstacles.
+            neighbor_positions (np.ndarray): The (M, 3) neighbor_positions of the neighbors, if already computed.
         Returns:
-            List[Obstacle]: A list of classified obstacles, each with its absolute position, relative position, direction, and type.
+            np.ndarray: The detected obstacles, with their type set in place.
 
-        1. Iterates over the detected obstacles to determine their type:
-        - If the obstacle is below a certain height (0.1 units), it is classified as a floor.
-        - If the obstacle is within a close distance (0.1 units) to any neighbor, it is classified as a drone.
+        1. The distances of all the obstacles from all the neighbors are computed at once.
+        2. The type of each obstacle is set:
+        - If the obstacle is below obstacles.floor_height, it is classified as a floor.
+        - If the obstacle is closer than obstacles.drone_threshold to any neighbor, it is classified as a drone.
         - Otherwise, it is classified as a generic obstacle.
-        2. Returns the list of detected obstacles by setting the type
         """
+        if detected_obstacles.shape[0] == 0:
+            return detected_obstacles
+        if neighbor_positions is None:
+            neighbor_positions = get_neighbor_positions(neighbors)
+
+        abs_pos = detected_obstacles["abs_pos"]
+        is_floor = abs_pos[:, 2] < self.config.obstacles.floor_height
+        is_drone = np.zeros_like(is_floor)
+        if neighbor_positions.shape[0] > 0:
+            # (K, M) distances of the obstacles from the neighbors
+            distances = np.linalg.norm(
+                abs_pos[:, np.newaxis, :] - neighbor_positions[np.newaxis, :, :],
+                axis=2,
+            )
+            is_drone = distances.min(axis=1) < self.config.obstacles.drone_threshold
 
-        drone_treshold = 0.4
-
-        for o in detected_obstacles:
-            isObstacle = True
-
-            if o.abs_pos[2] < 0.05:
-                isObstacle = False
-                o.type = ObstacleType.floor
-                continue
-
-            for key, neighbor in neighbors.items():
-
-                dist = np.linalg.norm(
-                    o.abs_pos
-                    + neighbor.get_initial_position()
-                    - neighbor.get_position()
-                )
-                
-                if (
-                    dist < drone_treshold
-                ):  # TODO: make this a parameter, like "DRONE_CLASS_THRESHOLD"
-                    isObstacle = False
-                    o.type = ObstacleType.drone
-                    break
+        detected_obstacles["type"] = np.where(
+            is_floor,
+            ObstacleType.floor.value,
+            np.where(is_drone, ObstacleType.drone.value, ObstacleType.obstacle.value),
+        )
+        return detected_obstacles
 
-            # Obstacles that aren't floors or drones are classified as generic obstacles
-            if isObstacle:
-                o.type = ObstacleType.obstacle
 
-        return detected_obstacles
+def get_neighbor_positions(neighbors: Dict[str, CrazyState]) -> np.ndarray:
+    """
+    (M, 3) positions of the neighbors relative to their initial positions, the
+    frame in which the obstacles are compared with them.
+    """
+    return np.array(
+        [
+            (n.x - n.init_x, n.y - n.init_y, n.z - n.init_z)
+            for n in neighbors.values()
+        ],
+        dtype=float,
+    ).reshape(-1, 3)
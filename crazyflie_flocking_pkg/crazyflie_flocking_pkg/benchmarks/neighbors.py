@@ -0,0 +1,98 @@
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from crazyflie_flocking_pkg.flocking_engine import FlockingEngine
+from crazyflie_flocking_pkg.utils.configuration import (
+    FlockingConfig,
+    default_config_path,
+)
+from crazyflie_swarm_pkg.utils import load_config
+
+
+def random_swarm(
+    n: int, density: float, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Samples n drones uniformly in a square whose side keeps the number of
+    drones per square meter constant, at a flying height of about 0.5 m.
+    """
+    side = np.sqrt(n / density)
+    positions = np.empty((n, 3))
+    positions[:, :2] = rng.uniform(0, side, size=(n, 2))
+    positions[:, 2] = rng.uniform(0.4, 0.6, size=n)
+    return positions
+
+
+def time_it(function: Callable, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def run(
+    config: FlockingConfig, sizes: List[int], density: float, repeats: int
+) -> None:
+    engine = FlockingEngine(config)
+    rng = np.random.default_rng(0)
+
+    print(f"{'N':>6} {'dense [ms]':>12} {'grid [ms]':>12} {'speedup':>9}")
+    crossover = None
+    for n in sizes:
+        positions = random_swarm(n, density, rng)
+
+        dense = engine.get_inter_robot_forces_dense(positions)
+        grid = engine.get_inter_robot_forces_grid(positions)
+        if not np.allclose(dense, grid):
+            raise RuntimeError(f"Dense and grid forces differ for N={n}")
+
+        t_dense = time_it(
+            lambda: engine.get_inter_robot_forces_dense(positions), repeats
+        )
+        t_grid = time_it(
+            lambda: engine.get_inter_robot_forces_grid(positions), repeats
+        )
+        if crossover is None and t_grid < t_dense:
+            crossover = n
+
+        print(
+            f"{n:>6} {1e3 * t_dense:>12.3f} {1e3 * t_grid:>12.3f} {t_dense / t_grid:>8.2f}x"
+        )
+
+    if crossover is None:
+        print("The grid is never faster than the dense path for these sizes")
+    else:
+        print(
+            f"The grid is faster from N={crossover} (neighbors.grid_min_agents)"
+        )
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Brute-force vs spatial hash inter-robot forces benchmark"
+    )
+    parser.add_argument("--config", default=None, help="flocking config.yaml")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 25, 50, 100, 200, 500, 1000, 2000],
+    )
+    parser.add_argument(
+        "--density", type=float, default=0.5, help="drones per square meter"
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    parsed = parser.parse_args(args)
+
+    config_path = parsed.config or default_config_path()
+    config = load_config(config_path, FlockingConfig)
+    run(config, parsed.sizes, parsed.density, parsed.repeats)
+
+
+if __name__ == "__main__":
+    main()
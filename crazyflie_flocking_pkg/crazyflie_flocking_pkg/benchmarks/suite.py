@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import omegaconf
+
+from crazyflie_flocking_pkg.agent import Agent
+from crazyflie_flocking_pkg.benchmarks.neighbors import random_swarm
+from crazyflie_flocking_pkg.flocking_engine import (
+    FlockingEngine,
+    stack_swarm_state,
+)
+from crazyflie_flocking_pkg.flocking_forces import ForcesGenerator
+from crazyflie_flocking_pkg.utils.configuration import (
+    FlockingConfig,
+    default_config_path,
+)
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+from crazyflie_swarm_pkg.utils import RingBuffer, load_config
+
+SIZES = [3, 10, 50, 200, 1000]
+OBSTACLE_COUNTS = [0, 2, 4]  # Horizontal multiranger beams seeing an obstacle
+BENCHMARKS = [
+    "forces_get_forces",
+    "agent_compute_velocities",
+    "agent_detect_obstacles",
+    "agent_classify_obstacles",
+    "state_rel2glob",
+    "ringbuffer_append_mean",
+    "engine_compute_velocities",
+]
+
+# Versions and machine of a run: timings of different ones are not comparable
+ENVIRONMENT_KEYS = ["python", "numpy", "omegaconf", "machine"]
+
+# Multiranger fields of the beams that can see an obstacle, in order
+OBSTACLE_BEAMS = ["mr_front", "mr_left", "mr_back", "mr_right"]
+
+
+class NullLogger:
+    """
+    Stands in for the rclpy logger, so that the flocking code runs without a
+    ROS context and logging does not dominate the timings.
+    """
+
+    def debug(self, *args, **kwargs) -> None:
+        pass
+
+    def info(self, *args, **kwargs) -> None:
+        pass
+
+    def warn(self, *args, **kwargs) -> None:
+        pass
+
+    def error(self, *args, **kwargs) -> None:
+        pass
+
+
+def random_states(
+    n: int, n_obstacles: int, density: float, rng: np.random.Generator
+) -> Dict[str, CrazyState]:
+    """
+    Swarm of n drones with random yaw, where n_obstacles horizontal beams of
+    every drone read an obstacle closer than the detection threshold.
+    """
+    positions = random_swarm(n, density, rng)
+    states = {}
+    for i in range(n):
+        state = CrazyState(
+            x=positions[i, 0],
+            y=positions[i, 1],
+            z=positions[i, 2],
+            yaw=rng.uniform(-180, 180),
+            mr_front=np.inf,
+            mr_right=np.inf,
+            mr_back=np.inf,
+            mr_left=np.inf,
+            mr_up=np.inf,
+        )
+        for beam in OBSTACLE_BEAMS[:n_obstacles]:
+            setattr(state, beam, rng.uniform(0.3, 1.5))
+        states[f"cf{i}"] = state
+    return states
+
+
+def time_it(
+    function: Callable, repeats: int, number: int = 1
+) -> Dict[str, float]:
+    """
+    Times repeats batches of number calls of function.
+
+    Returns:
+        Dict[str, float]: Median and minimum time of a single call [s].
+    """
+    function()  # Warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "median_s": float(np.median(timings)),
+        "min_s": float(np.min(timings)),
+    }
+
+
+def run_case(
+    benchmark: str,
+    n: int,
+    n_obstacles: int,
+    config: FlockingConfig,
+    density: float,
+    repeats: int,
+    rng: np.random.Generator,
+) -> Dict[str, float]:
+    """
+    Times one benchmark for a swarm of n drones with n_obstacles obstacles per
+    drone. Per-agent benchmarks time the call of the first agent.
+    """
+    logger = NullLogger()
+    states = random_states(n, n_obstacles, density, rng)
+    names = list(states.keys())
+    agent = Agent(names[0], config, logger)
+    state = states[names[0]]
+    neighbors = {name: s for name, s in states.items() if name != names[0]}
+
+    if benchmark == "forces_get_forces":
+        forces_generator = ForcesGenerator(config, logger)
+        obstacles = agent.classify_obstacles(
+            neighbors, agent.detect_obstacles(state)
+        )
+        v_mig = np.zeros(3)
+        return time_it(
+            lambda: forces_generator.get_forces(
+                state, neighbors, obstacles, v_mig
+            ),
+            repeats,
+        )
+    if benchmark == "agent_compute_velocities":
+        return time_it(lambda: agent.compute_velocities(states), repeats)
+    if benchmark == "agent_detect_obstacles":
+        return time_it(
+            lambda: agent.detect_obstacles(state), repeats, number=100
+        )
+    if benchmark == "agent_classify_obstacles":
+        detected = agent.detect_obstacles(state)
+        return time_it(
+            lambda: agent.classify_obstacles(neighbors, detected), repeats
+        )
+    if benchmark == "state_rel2glob":
+        # One rel2glob per drone, as a swarm-wide obstacle detection does
+        rel_pos = np.array([1.0, 0.0, 0.0])
+        swarm = list(states.values())
+        return time_it(lambda: [s.rel2glob(rel_pos) for s in swarm], repeats)
+    if benchmark == "ringbuffer_append_mean":
+        # One append and mean per multiranger beam of every drone, as an update tick
+        buffers = [RingBuffer(10, (1,)) for _ in range(5 * n)]
+        values = rng.uniform(0.1, 4.0, 5 * n).tolist()
+
+        def tick():
+            for buffer, value in zip(buffers, values):
+                buffer.append(value)
+                buffer.compute_mean()
+
+        return time_it(tick, repeats)
+    if benchmark == "engine_compute_velocities":
+        engine = FlockingEngine(config)
+        positions, yaws, ranges = stack_swarm_state(states, names)
+        return time_it(
+            lambda: engine.compute_velocities(positions, yaws, ranges), repeats
+        )
+    raise ValueError(f"Unknown benchmark {benchmark}")
+
+
+def run(
+    config: FlockingConfig,
+    benchmarks: List[str],
+    sizes: List[int],
+    obstacle_counts: List[int],
+    density: float,
+    repeats: int,
+) -> List[Dict]:
+    rng = np.random.default_rng(0)
+    results = []
+    print(
+        f"{'benchmark':<28} {'N':>6} {'obst':>5} {'median [ms]':>12} {'min [ms]':>10}"
+    )
+    for benchmark in benchmarks:
+        # Only the obstacle benchmarks depend on the number of obstacles
+        counts = obstacle_counts
+        if benchmark in ("state_rel2glob", "ringbuffer_append_mean"):
+            counts = obstacle_counts[:1]
+        for n in sizes:
+            for n_obstacles in counts:
+                timing = run_case(
+                    benchmark, n, n_obstacles, config, density, repeats, rng
+                )
+                results.append(
+                    {
+                        "benchmark": benchmark,
+                        "n": n,
+                        "obstacles": n_obstacles,
+                        **timing,
+                    }
+                )
+                print(
+                    f"{benchmark:<28} {n:>6} {n_obstacles:>5} "
+                    + f"{1e3 * timing['median_s']:>12.4f} {1e3 * timing['min_s']:>10.4f}"
+                )
+    return results
+
+
+def compare(
+    results: List[Dict], baseline: Dict, tolerance: float
+) -> List[Dict]:
+    """
+    Compares the median timings with the baseline ones. The baseline must
+    come from the same environment, e.g. the no-ROS setup with the real
+    OmegaConf, a plain attribute lookup stand-in is several times faster.
+
+    Returns:
+        List[Dict]: The cases slower than the baseline by more than tolerance.
+    """
+
+    def key(result):
+        return (result["benchmark"], result["n"], result["obstacles"])
+
+    reference = {key(result): result for result in baseline["results"]}
+    regressions = []
+    print(
+        f"\n{'benchmark':<28} {'N':>6} {'obst':>5} {'ratio':>8}"
+        + f"  (tolerance {tolerance:.0%})"
+    )
+    for result in results:
+        if key(result) not in reference:
+            continue
+        ratio = result["median_s"] / reference[key(result)]["median_s"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append({**result, "ratio": ratio})
+        print(
+            f"{result['benchmark']:<28} {result['n']:>6} {result['obstacles']:>5} "
+            + f"{ratio:>7.2f}x{flag}"
+        )
+    return regressions
+
+
+def default_baseline_path() -> str:
+    return os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Flocking control path benchmarks, without ROS"
+    )
+    parser.add_argument("--config", default=None, help="flocking config.yaml")
+    parser.add_argument(
+        "--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument(
+        "--obstacles",
+        type=int,
+        nargs="+",
+        default=OBSTACLE_COUNTS,
+        help="horizontal beams of each drone seeing an obstacle (0-4)",
+    )
+    parser.add_argument(
+        "--density", type=float, default=0.5, help="drones per square meter"
+    )
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument(
+        "--output", default=None, help="save the results to this JSON file"
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="compare with this results file (default: the stored baseline)",
+    )
+    parser.add_argument("--no-compare", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown over the baseline reported as a regression",
+    )
+    parsed = parser.parse_args(args)
+
+    config_path = parsed.config or default_config_path()
+    config = load_config(config_path, FlockingConfig)
+    results = run(
+        config,
+        parsed.benchmarks,
+        parsed.sizes,
+        [min(max(n, 0), len(OBSTACLE_BEAMS)) for n in parsed.obstacles],
+        parsed.density,
+        parsed.repeats,
+    )
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "omegaconf": omegaconf.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "repeats": parsed.repeats,
+            "density": parsed.density,
+        },
+        "results": results,
+    }
+    if parsed.output:
+        with open(parsed.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults saved to {parsed.output}")
+
+    if parsed.no_compare:
+        return
+    baseline_path = parsed.baseline or default_baseline_path()
+    if not os.path.exists(baseline_path):
+        print(f"\nNo baseline at {baseline_path}")
+        return
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    different = [
+        key
+        for key in ENVIRONMENT_KEYS
+        if baseline["meta"].get(key) != report["meta"][key]
+    ]
+    if different:
+        print(
+            "\nWarning: the baseline was recorded with another "
+            + ", ".join(different)
+            + ", the ratios also measure the environment"
+        )
+    regressions = compare(results, baseline, parsed.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {baseline_path}")
+        sys.exit(1)
+    print(f"\nNo regression over {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+
+from crazyflie_flocking_pkg.utils import (
+    NavigationField,
+    OccupancyGrid,
+    SpatialHash,
+)
+from crazyflie_flocking_pkg.utils.configuration import FlockingConfig
+from crazyflie_flocking_pkg.utils.definitions import (
+    OBSTACLE_THRESHOLD,
+    Direction,
+)
+from crazyflie_flocking_pkg.utils.telemetry import FlockingTelemetry
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import (
+    MULTIRANGER_BEAMS,
+    CrazyState,
+)
+
+if TYPE_CHECKING:
+    from rclpy.impl.rcutils_logger import RcutilsLogger
+
+
+def stack_swarm_state(
+    swarm_state: Dict[str, CrazyState], names: List[str]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stacks the states of the swarm into the arrays used by the FlockingEngine.
+
+    Args:
+        swarm_state (Dict[str, CrazyState]): The states of the swarm, keyed by name.
+        names (List[str]): The order of the rows in the returned arrays.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: positions (N, 3), yaws (N,) in degrees
+        and multiranger readings (N, 5) front, right, back, left and up as in CrazyState.
+    """
+    n = len(names)
+    positions = np.empty((n, 3))
+    yaws = np.empty(n)
+    ranges = np.empty((n, 5))
+    for i, name in enumerate(names):
+        state = swarm_state[name]
+        positions[i] = (state.x, state.y, state.z)
+        yaws[i] = state.yaw
+        ranges[i] = (
+            state.mr_front,
+            state.mr_right,
+            state.mr_back,
+            state.mr_left,
+            state.mr_up,
+        )
+    return positions, yaws, ranges
+
+
+class FlockingEngine:
+    """
+    Whole-swarm counterpart of Agent and ForcesGenerator: computes the commands
+    of every drone in a single NumPy pass instead of one Python loop per pair.
+    Row i of every input and output array refers to the same drone.
+    """
+
+    def __init__(
+        self,
+        config: FlockingConfig,
+        ros2_logger: "RcutilsLogger" = None,
+        telemetry: FlockingTelemetry = None,
+        occupancy_grid: OccupancyGrid = None,
+    ):
+        self.config = config  # Also caches its scalars
+        self.ros2_logger = ros2_logger
+        self.telemetry = telemetry  # Records every tick if not None
+        self.neighbor_index = SpatialHash(config.dimensions.max_vis_objs)
+        # Overridden by the FlockingScheduler
+        self.neighbor_mode = config.neighbors.mode
+
+        # Obstacles seen by the swarm, None to use only the current readings
+        self.occupancy_grid = occupancy_grid
+        if occupancy_grid is None and config.occupancy_grid.enabled:
+            self.occupancy_grid = OccupancyGrid.from_config(
+                config.occupancy_grid
+            )
+
+        # Navigation functions of the goals, None without migration
+        self.navigation = None
+        # Goal of the drones without their own, -1 for none
+        self.swarm_goal = -1
+        self.goal_ids = np.zeros(0, dtype=np.int64)  # Goal of each drone
+        if config.migration.enabled:
+            self.navigation = NavigationField.from_config(
+                config.occupancy_grid
+            )
+            if len(config.migration.goal) >= 2:
+                self.swarm_goal = self.navigation.add_goal(
+                    config.migration.goal
+                )
+
+    @property
+    def config(self) -> FlockingConfig:
+        return self.__config
+
+    @config.setter
+    def config(self, config: FlockingConfig) -> None:
+        # Plain copies of the scalars used every tick, a lookup in the
+        # OmegaConf config costs more than the NumPy operations using it
+        self.__config = config
+        self.__k_r = float(config.gains.k_r)
+        self.__k_o = float(config.gains.k_o)
+        self.__k_m = float(config.gains.k_m)
+        self.__k_l = float(config.gains.k_l)
+        self.__k_a = float(config.gains.k_a)
+        self.__radius = float(config.dimensions.radius)
+        self.__d_eq = float(config.dimensions.d_eq)
+        self.__max_vis_objs = float(config.dimensions.max_vis_objs)
+        self.__force_max = float(config.bounds.force_max)
+        self.__v_min = float(config.bounds.v_min)
+        self.__v_max = float(config.bounds.v_max)
+        self.__omega_min = float(config.bounds.omega_min)
+        self.__omega_max = float(config.bounds.omega_max)
+        self.__grid_min_agents = int(config.neighbors.grid_min_agents)
+        self.__drone_threshold = float(config.obstacles.drone_threshold)
+        self.__migration_speed = float(config.migration.speed)
+        self.__slowdown_distance = float(config.migration.slowdown_distance)
+        self.__inflation = float(config.migration.inflation)
+
+    def get_forces(
+        self,
+        positions: np.ndarray,
+        yaws: np.ndarray,
+        ranges: np.ndarray = None,
+        v_mig: np.ndarray = None,
+        active: np.ndarray = None,
+    ) -> np.ndarray:
+        """
+        Computes the flocking forces of every drone of the swarm.
+
+        Args:
+            positions (np.ndarray): (N, 3) positions of the drones.
+            yaws (np.ndarray): (N,) yaw of the drones in degrees.
+            ranges (np.ndarray): (N, 5) multiranger readings front, right, back, left and up as in CrazyState, None if not available.
+            v_mig (np.ndarray): (3,) or (N, 3) migration velocity, None for no migration.
+            active (np.ndarray): (N,) mask of the drones that are neighbors of the others, None for all.
+
+        Returns:
+            np.ndarray: (N, 3, 3) forces, where [:, :, 0] is the inter-robot force, [:, :, 1] the obstacle
+            force and [:, :, 2] the migration force, as the columns returned by ForcesGenerator.get_forces.
+        """
+        positions = np.asarray(positions, dtype=float)
+        n = positions.shape[0]
+        forces = np.zeros((n, 3, 3))
+
+        # Inter-robot forces, formula (2)
+        if self.use_grid(n):
+            forces[:, :, 0] = self.get_inter_robot_forces_grid(
+                positions, active
+            )
+        else:
+            forces[:, :, 0] = self.get_inter_robot_forces_dense(
+                positions, active
+            )
+        forces[:, 2, 0] = 0
+
+        # Obstacle avoidance forces, formula (3)
+        if ranges is not None and self.occupancy_grid is not None:
+            self.update_occupancy_grid(positions, yaws, ranges)
+            forces[:, :, 1] = self.get_occupancy_grid_forces(positions)
+            if self.navigation is not None:
+                self.navigation.update_from_grid(
+                    self.occupancy_grid, self.__inflation
+                )
+        elif ranges is not None:
+            forces[:, :, 1] = self.get_obstacle_forces(yaws, ranges)
+
+        # Migration force, formula (4)
+        if v_mig is None and self.navigation is not None:
+            v_mig = self.get_migration_velocities(positions)
+        if v_mig is not None:
+            forces[:, :, 2] = self.__k_m * np.asarray(v_mig)
+
+        # Clip forces
+        overall_force = np.linalg.norm(np.sum(forces, axis=2), axis=1)
+        clipper = np.maximum(overall_force / self.__force_max, 1)
+
+        return forces / clipper[:, np.newaxis, np.newaxis]
+
+    def set_goal(self, goal: np.ndarray, rows: np.ndarray = None) -> None:
+        """
+        Sets the migration goal of the drones in rows, of the whole swarm if
+        rows is None. The navigation function of a goal is computed once, and
+        shared by all the drones with a goal in the same cell.
+        """
+        if self.navigation is None:
+            raise RuntimeError("Migration is not enabled")
+        id = self.navigation.add_goal(goal)
+        if rows is None:
+            self.swarm_goal = id
+            self.goal_ids[:] = id
+        else:
+            rows = np.atleast_1d(rows)
+            self.__resize_goal_ids(max(self.goal_ids.shape[0], rows.max() + 1))
+            self.goal_ids[rows] = id
+
+        # Forget the goals no drone migrates to anymore
+        used = set(self.goal_ids.tolist()) | {self.swarm_goal}
+        for unused in set(self.navigation.goals) - used:
+            self.navigation.remove_goal(unused)
+
+    def get_migration_velocities(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Migration velocity of every drone towards its goal, one lookup in the
+        navigation functions of the goals.
+        """
+        self.__resize_goal_ids(positions.shape[0])
+        return self.navigation.velocities(
+            positions,
+            self.goal_ids,
+            self.__migration_speed,
+            self.__slowdown_distance,
+        )
+
+    def __resize_goal_ids(self, n: int) -> None:
+        # The added drones migrate to the goal of the swarm
+        if self.goal_ids.shape[0] != n:
+            goal_ids = np.full(n, self.swarm_goal, dtype=np.int64)
+            k = min(n, self.goal_ids.shape[0])
+            goal_ids[:k] = self.goal_ids[:k]
+            self.goal_ids = goal_ids
+
+    def use_grid(self, n: int) -> bool:
+        """
+        Whether the inter-robot forces of a swarm of n drones are computed with
+        the SpatialHash neighbor index instead of the dense pairwise tensor.
+        """
+        mode = self.neighbor_mode
+        if mode == "auto":
+            return n >= self.__grid_min_agents
+        return mode == "grid"
+
+    def get_inter_robot_forces_dense(
+        self, positions: np.ndarray, active: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        Computes the inter-robot force, formula (2), of every drone from the
+        (N, N, 3) pairwise displacement tensor. Costs O(N^2) time and memory.
+        Only the active drones are neighbors, all of them if active is None.
+        """
+        displacement = (
+            positions[np.newaxis, :, :] - positions[:, np.newaxis, :]
+        )
+        distance = np.linalg.norm(displacement, axis=2)
+        norm = np.where(distance < 1e-14, 1.0, distance)
+        u_ij = displacement / norm[:, :, np.newaxis]
+
+        coefficient = self.__k_r * (distance - 2 * self.__radius - self.__d_eq)
+        # Remove myself and the neighbors out of the visibility radius
+        np.fill_diagonal(coefficient, 0.0)
+        coefficient[distance > self.__max_vis_objs] = 0.0
+        if active is not None:
+            coefficient[:, ~np.asarray(active, dtype=bool)] = 0.0
+
+        return np.einsum("ij,ijk->ik", coefficient, u_ij)
+
+    def get_inter_robot_forces_grid(
+        self, positions: np.ndarray, active: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        Computes the inter-robot force, formula (2), of every drone summing only
+        over the pairs closer than the visibility radius, found with the
+        neighbor index rebuilt from the current positions. Only the active
+        drones are neighbors, all of them if active is None.
+        """
+        n = positions.shape[0]
+        self.neighbor_index.build(positions)
+        i, j, displacement, distance = self.neighbor_index.query_pairs(
+            self.__max_vis_objs
+        )
+        if active is not None:
+            keep = np.asarray(active, dtype=bool)[j]
+            i, displacement, distance = (
+                i[keep],
+                displacement[keep],
+                distance[keep],
+            )
+        norm = np.where(distance < 1e-14, 1.0, distance)
+        weight = (
+            self.__k_r * (distance - 2 * self.__radius - self.__d_eq) / norm
+        )
+
+        f_inter_robot = np.empty((n, 3))
+        for k in range(3):
+            f_inter_robot[:, k] = np.bincount(
+                i, weights=weight * displacement[:, k], minlength=n
+            )
+        return f_inter_robot
+
+    def get_obstacle_forces(
+        self, yaws: np.ndarray, ranges: np.ndarray
+    ) -> np.ndarray:
+        """
+        Computes the obstacle avoidance force, formula (3), of every drone from
+        its multiranger readings. Every beam closer than OBSTACLE_THRESHOLD
+        pushes the drone away along the yaw-rotated beam direction.
+        """
+        ranges = np.asarray(ranges, dtype=float)
+        yaw = np.deg2rad(yaws)
+        cosyaw = np.cos(yaw)
+        sinyaw = np.sin(yaw)
+
+        # Versors to obstacles, rotated in the world frame by the yaw only
+        u_ik = np.empty((*ranges.shape, 3))
+        u_ik[:, :, 0] = (
+            cosyaw[:, np.newaxis] * MULTIRANGER_BEAMS[:, 0]
+            - sinyaw[:, np.newaxis] * MULTIRANGER_BEAMS[:, 1]
+        )
+        u_ik[:, :, 1] = (
+            sinyaw[:, np.newaxis] * MULTIRANGER_BEAMS[:, 0]
+            + cosyaw[:, np.newaxis] * MULTIRANGER_BEAMS[:, 1]
+        )
+        u_ik[:, :, 2] = 0  # the up beam has no horizontal component
+
+        detected = ranges < OBSTACLE_THRESHOLD
+        obstacle_distance = np.where(detected, ranges - self.__radius, 1.0)
+        contr = -np.where(detected, 1 / obstacle_distance**2, 0.0)
+
+        return self.__k_o * np.einsum("nb,nbk->nk", contr, u_ik)
+
+    def update_occupancy_grid(
+        self, positions: np.ndarray, yaws: np.ndarray, ranges: np.ndarray
+    ) -> None:
+        """
+        Integrates the horizontal multiranger beams of every drone in the
+        occupancy grid. Beams ending on another drone are only free space.
+        """
+        horizontal = slice(Direction.front.value, Direction.up.value)
+        self.occupancy_grid.update_beams(
+            positions,
+            yaws,
+            np.asarray(ranges, dtype=float)[:, horizontal],
+            MULTIRANGER_BEAMS[horizontal],
+            OBSTACLE_THRESHOLD,
+            drones=positions,
+            drone_threshold=self.__drone_threshold,
+            sources=np.arange(positions.shape[0]),
+        )
+
+    def get_occupancy_grid_forces(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Computes the obstacle avoidance force, formula (3), of every drone from
+        the nearest obstacle of the occupancy grid, pushing the drone along the
+        gradient of the distance field. The clearance is kept above one cell.
+        """
+        distance, gradient = self.occupancy_grid.lookup(positions)
+        detected = np.isfinite(distance)
+        obstacle_distance = np.maximum(
+            np.where(detected, distance, 1.0) - self.__radius,
+            self.occupancy_grid.resolution,
+        )
+        contr = np.where(detected, 1 / obstacle_distance**2, 0.0)
+
+        forces = np.zeros((positions.shape[0], 3))
+        forces[:, :2] = self.__k_o * contr[:, np.newaxis] * gradient
+        return forces
+
+    def compute_velocities(
+        self,
+        positions: np.ndarray,
+        yaws: np.ndarray,
+        ranges: np.ndarray = None,
+        v_mig: np.ndarray = None,
+        is_omnidirectional: bool = False,
+        active: np.ndarray = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the velocities of every drone of the swarm, as Agent.compute_velocities does for one drone.
+        If active is given, the inactive drones, e.g. with a stale state, are not neighbors of the others
+        and get zero velocities, to hover.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N, 3) linear velocities and (N,) yaw rates.
+        """
+        yaws = np.asarray(yaws, dtype=float)
+        forces = self.get_forces(positions, yaws, ranges, v_mig, active)
+
+        overall_force = np.clip(
+            np.sum(forces, axis=2),
+            -self.__force_max,
+            self.__force_max,
+        )
+
+        # Compute linear velocity
+        v = self.__k_l * overall_force
+        v = np.clip(v, -self.__v_max, self.__v_max)
+
+        # Compute angular velocity
+        omega = np.zeros(yaws.shape[0])
+        if not is_omnidirectional:
+            # Align overall_force to u_i
+            yaw = np.deg2rad(yaws)
+            u_i = np.stack(
+                (np.cos(yaw), np.sin(yaw), np.zeros_like(yaw)), axis=1
+            )
+
+            # Linear speed, formulas (5), (7)
+            v_scalar = self.__k_l * np.einsum("nk,nk->n", overall_force, u_i)
+            v_scalar = np.clip(v_scalar, self.__v_min, self.__v_max)
+            v = v_scalar[:, np.newaxis] * u_i
+
+            # Angular speed, formula (8), u_i_orthogonal = z x u_i
+            u_i_orthogonal = np.stack(
+                (-u_i[:, 1], u_i[:, 0], u_i[:, 2]), axis=1
+            )
+            omega_scalar = self.__k_a * np.einsum(
+                "nk,nk->n", overall_force, u_i_orthogonal
+            )
+            omega_scalar = np.clip(
+                omega_scalar,
+                self.__omega_min,
+                self.__omega_max,
+            )
+            omega = -omega_scalar
+
+        if active is not None:
+            inactive = ~np.asarray(active, dtype=bool)
+            v[inactive] = 0.0
+            omega[inactive] = 0.0
+
+        if self.telemetry is not None:
+            n_obstacles = 0
+            if ranges is not None:
+                n_obstacles = np.count_nonzero(
+                    np.asarray(ranges) < OBSTACLE_THRESHOLD, axis=1
+                )
+            self.telemetry.record(forces, v, omega, n_obstacles)
+
+        return v, omega
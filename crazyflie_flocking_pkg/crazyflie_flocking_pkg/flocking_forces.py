@@ -1,30 +1,50 @@
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict
 
 import numpy as np
 
-from crazyflie_flocking_pkg.utils import get_clipper, get_versor
+from crazyflie_flocking_pkg.utils import OccupancyGrid, get_clipper, get_versor
 from crazyflie_flocking_pkg.utils.configuration import FlockingConfig
-from crazyflie_flocking_pkg.utils.definitions import Direction, Obstacle
-from crazyflie_swarm_pkg.crazyflie import CrazyState
-from rclpy.impl.rcutils_logger import RcutilsLogger
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import (
+    MULTIRANGER_BEAMS,
+    CrazyState,
+)
 
+if TYPE_CHECKING:
+    from rclpy.impl.rcutils_logger import RcutilsLogger
 
 
 class ForcesGenerator:
-    def __init__(self, config: FlockingConfig, ros2_logger: RcutilsLogger):
+    def __init__(
+        self,
+        config: FlockingConfig,
+        ros2_logger: "RcutilsLogger",
+        occupancy_grid: OccupancyGrid = None,
+    ):
         self.config = config
         self.ros2_logger = ros2_logger
+        self.occupancy_grid = occupancy_grid  # Obstacle forces from the grid if not None
 
     def get_forces(
         self,
         state: CrazyState,
         neighbors: Dict[str, CrazyState],
-        obstacles: List[Obstacle],
+        obstacles: np.ndarray,
         v_mig: np.ndarray,
     ):
-        
-        self.ros2_logger.info(f"{neighbors}") 
-               
+        """
+        Computes the inter-robot, obstacle and migration forces of a drone.
+
+        Args:
+            state (CrazyState): The state of the drone.
+            neighbors (Dict[str, CrazyState]): The states of the other drones.
+            obstacles (np.ndarray): The OBSTACLE_DTYPE array of the detected obstacles,
+                unused if the forces come from the occupancy grid.
+            v_mig (np.ndarray): The migration velocity.
+
+        Returns:
+            np.ndarray: (3, 3) forces, one per column, clipped together to bounds.force_max.
+        """
+
         # Initialization
         f_inter_robot = np.zeros((3, 1))
         f_obstacle = np.zeros((3, 1))
@@ -37,22 +57,20 @@ class ForcesGenerator:
         for name, neighbor in neighbors.items():
             n_pos = neighbor.get_position()
 
-            neighbor_distance = (
-                np.linalg.norm(n_pos - self_pos)
-                - 2 * self.config.dimensions.radius
-            )
+            center_distance = np.linalg.norm(n_pos - self_pos)
 
-            #  It's not sure that this is right, it's done to avoid the case of the over-pulling of the drones if they're a lot
+            #  Neighbors out of the visibility radius are ignored, to avoid the over-pulling of the drones if they're a lot
             #  namely, if you have a lot of robot, thay can't be at d_eq to each other, but just a subset of them
             #  this means that all the other will pull the drone towards other drones, making the configuration "squeeze"
-            
-            # TODO: serve con piú di 3 robot
-            # if neighbor_distance > 2 * self.config.dimensions.d_eq:
-            #     continue
+            if center_distance > self.config.dimensions.max_vis_objs:
+                continue
+
+            neighbor_distance = (
+                center_distance - 2 * self.config.dimensions.radius
+            )
 
             # Direction of vector between me and nth neighbor
             u_ij = get_versor(n_pos - self_pos).reshape((3, 1))
-            self.ros2_logger.info(f"\n ************** {u_ij.transpose()} *****************\n")
 
             f_inter_robot += (
                 self.config.gains.k_r
@@ -62,10 +80,24 @@ class ForcesGenerator:
         f_inter_robot[2] = 0
 
         # Obstacle avoidance forces, formula (3)
-        for o in obstacles:
-            obstacle_distance = np.linalg.norm(o.rel_pos) - self.config.dimensions.radius
+        if self.occupancy_grid is not None:
+            # Nearest obstacle seen by the swarm, away along the distance gradient
+            distance, gradient = self.occupancy_grid.lookup(self_pos)
+            if np.isfinite(distance[0]):
+                obstacle_distance = max(
+                    distance[0] - self.config.dimensions.radius,
+                    self.occupancy_grid.resolution,
+                )
+                f_obstacle[:2, 0] = (
+                    self.config.gains.k_o / obstacle_distance**2 * gradient[0]
+                )
+        elif obstacles.shape[0] > 0:
+            obstacle_distance = (
+                np.linalg.norm(obstacles["rel_pos"], axis=1)
+                - self.config.dimensions.radius
+            )
 
-            # Versor to obstacle computation 
+            # Versors to obstacles, the beam directions rotated by the yaw only
             self_yaw = np.deg2rad(state.yaw)
             R = np.array(
                 [
@@ -74,29 +106,18 @@ class ForcesGenerator:
                     [0, 0, 1],
                 ]
             )
+            u_ik = MULTIRANGER_BEAMS[obstacles["direction"]] @ R.T
+            u_ik[:, 2] = 0  # the up beam has no horizontal component
 
-            if o.direction == Direction.front:
-                u_ik = R @ np.array([1, 0, 0])
-            elif o.direction == Direction.back:
-                u_ik = R @ np.array([-1, 0, 0])
-            elif o.direction == Direction.left:
-                u_ik = R @ np.array([0, 1, 0])
-            elif o.direction == Direction.right:
-                u_ik = R @ np.array([0, -1, 0])
-                
-            u_ik = np.reshape(u_ik, (3, 1))
-            
             # BE SURE THAT THE GAIN K_O IS NOT USED TWICE
             # We could test other kind of obstacle force just to see which one is the best
-            contr = (
-                - (1 / (obstacle_distance) ** 2) * u_ik
-            )  # f_obs originale
-            
+            contr = -(1 / obstacle_distance**2)[:, np.newaxis] * u_ik  # f_obs originale
+
             # d_0 = self.config.dimensions.max_vis_objs - self.config.dimensions.radius
             # contr = - (1/(obstacle_distance)**2 - 1/(d_0)**2)* u_ik  # f_obs continua
             # contr = - (1/(obstacle_distance) - 1/(d_0))**2 * u_ik    # f_obs APF
 
-            f_obstacle += self.config.gains.k_o * contr
+            f_obstacle += self.config.gains.k_o * contr.sum(axis=0).reshape((3, 1))
 
         f_obstacle[2] = 0
 
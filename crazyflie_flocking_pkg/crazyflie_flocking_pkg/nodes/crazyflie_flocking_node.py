@@ -1,14 +1,80 @@
-from typing import Any, Dict
+import os
+import time
+from typing import Any, Dict, List
 
+import numpy as np
 import rclpy
-from geometry_msgs.msg import Twist
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from geometry_msgs.msg import Point, Twist
 from rclpy.node import Node, Publisher, Subscription
+from std_msgs.msg import Float64MultiArray, MultiArrayDimension
+from std_srvs.srv import Trigger
 
-from crazyflie_flocking_pkg.agent import Agent
+from crazyflie_flocking_pkg.flocking_engine import FlockingEngine
 from crazyflie_flocking_pkg.utils.configuration import FlockingConfig
-from crazyflie_swarm_interfaces.msg import CrazyflieState
-from crazyflie_swarm_pkg.crazyflie import CrazyState
-from crazyflie_swarm_pkg.utils import SwarmConfig, load_config
+from crazyflie_flocking_pkg.utils.extrapolation import extrapolate_positions
+from crazyflie_flocking_pkg.utils.scheduler import (
+    COMPUTE,
+    STALE,
+    FlockingScheduler,
+)
+from crazyflie_flocking_pkg.utils.telemetry import (
+    TELEMETRY_FIELDS,
+    FlockingTelemetry,
+)
+from crazyflie_swarm_interfaces.msg import CrazyflieState, SwarmState
+from crazyflie_swarm_pkg.crazyflie import SwarmStateStore
+from crazyflie_swarm_pkg.crazyflie.latency_msg import (
+    latency_diagnostics,
+    stamp_to_seconds,
+)
+from crazyflie_swarm_pkg.crazyflie.swarm_state_msg import (
+    SWARM_STATE_FIELDS,
+    swarm_state_msg_stamps,
+    swarm_state_msg_to_arrays,
+)
+from crazyflie_swarm_pkg.utils import LatencyTracer, SwarmConfig, load_config
+
+# Latency stages of this node: ages of the poses (from their reception from
+# the Crazyflies) when received and used, and the durations of the tick
+LATENCY_STAGES = [
+    "swarm_state_transport",
+    "state_age_at_receive",
+    "state_age_at_compute",
+    "compute",
+    "cmd_vel_publish",
+    "pose_to_cmd_vel",
+]
+
+
+def scheduler_diagnostics(
+    scheduler: FlockingScheduler, node_name: str, reset: bool = False
+) -> DiagnosticArray:
+    """
+    Builds a DiagnosticArray with the level of the scheduler, the cost of the
+    computations in ms and the decisions of the ticks. The status is a
+    warning while the scheduler is degraded or the load exceeds the budget.
+    """
+    summary = scheduler.summary(reset)
+    status = DiagnosticStatus()
+    status.name = f"{node_name}: flocking scheduler"
+    status.hardware_id = node_name
+    status.level = DiagnosticStatus.OK
+    if summary["level"] > 0 or summary["load"] > summary["budget"]:
+        status.level = DiagnosticStatus.WARN
+    status.message = (
+        f"{summary['neighbor_mode']} neighbors, 1/{summary['divider']} rate, "
+        + f"load {summary['load']:.2f} of {summary['budget']:.2f}"
+    )
+    for key, value in summary.items():
+        if key.startswith("cost"):
+            key, value = f"{key}_ms", f"{1e3 * value:.3f}"
+        elif isinstance(value, float):
+            value = f"{value:.3f}"
+        status.values.append(KeyValue(key=key, value=str(value)))
+    msg = DiagnosticArray()
+    msg.status.append(status)
+    return msg
 
 
 class CrazyflieFlockingNode(Node):  # type: ignore
@@ -49,88 +115,347 @@ class CrazyflieFlockingNode(Node):  # type: ignore
                 name = crazyflie_config.name
                 self.swarm[name] = uri
 
-        # * Flocking Agents
-        self.agents: Dict[str, Agent] = {}
-        self.swarm_state: Dict[str, CrazyState] = {}
-        for name, _ in self.swarm.items():
-            agent = Agent(name, self.flocking_config, self.get_logger())
-            self.agents[name] = agent
-            self.swarm_state[name] = CrazyState()
-            
+        # * Flocking Engine (whole swarm at once)
+        self.engine = FlockingEngine(self.flocking_config, self.get_logger())
+        self.names: List[str] = list(self.swarm.keys())
+        self.swarm_state = SwarmStateStore(self.names)
+        # Time each state was received by this node [s], 0 if never
+        self.received = np.zeros(len(self.names))
+        self.__stamps_checked = False
+
+        # * Migration goals, of the whole swarm or of single drones
+        migration_config = self.flocking_config.migration
+        if migration_config.enabled:
+            self.create_subscription(
+                Point, migration_config.goal_topic, self.goal_callback, 10
+            )
+            for name in self.names:
+                self.create_subscription(
+                    Point,
+                    f"/{name}/goal",
+                    lambda msg, name=name: self.goal_callback(msg, name),
+                    10,
+                )
+
+        # * Latency tracing
+        self.tracer = None
+        latency_config = self.swarm_config.latency
+        if latency_config.enabled:
+            self.tracer = LatencyTracer(LATENCY_STAGES)
+            self.diagnostics_publisher = self.create_publisher(
+                DiagnosticArray, latency_config.topic, 10
+            )
+            if latency_config.publish_rate > 0:
+                self.create_timer(
+                    1 / latency_config.publish_rate, self.latency_callback
+                )
+
+        # * Telemetry (no cost when disabled)
+        self.telemetry = None
+        telemetry_config = self.flocking_config.telemetry
+        if telemetry_config.enabled:
+            self.telemetry = FlockingTelemetry(
+                self.names, telemetry_config.buffer_size
+            )
+            self.engine.telemetry = self.telemetry
+            self.create_service(
+                Trigger,
+                "/flocking/dump_telemetry",
+                self.dump_telemetry_service_callback,
+            )
+            if telemetry_config.publish_rate > 0:
+                self.telemetry_publisher = self.create_publisher(
+                    Float64MultiArray, telemetry_config.topic, 10
+                )
+                self.create_timer(
+                    1 / telemetry_config.publish_rate,
+                    self.telemetry_callback,
+                )
+        self.__msg_names: List[str] = []
+        self.__msg_rows = np.zeros(0, dtype=int)
+        self.__state_rows = np.zeros(0, dtype=int)
 
         # * Publishers
         self.cmd_vel_publishers: Dict[str, Publisher] = {}
-        velocity_publisher_rate = self.swarm_config.velocity_publisher_rate
         for name, _ in self.swarm.items():
             publisher = self.create_publisher(Twist, f"/{name}/cmd_vel", 10)
             self.cmd_vel_publishers[name] = publisher
-            self.create_timer(
+
+        velocity_publisher_rate = self.swarm_config.velocity_publisher_rate
+        self.create_timer(1 / velocity_publisher_rate, self.cmd_vel_callback)
+
+        # * Scheduler of the ticks, degrades the computations when they overrun
+        self.scheduler = None
+        self.v = np.zeros((len(self.names), 3))  # Last commands
+        self.yaw_rate = np.zeros(len(self.names))
+        self.__decision = COMPUTE
+        scheduler_config = self.flocking_config.scheduler
+        if scheduler_config.enabled:
+            self.scheduler = FlockingScheduler(
                 1 / velocity_publisher_rate,
-                lambda name=name, publisher=publisher: self.cmd_vel_callback(
-                    name, publisher
-                ),
+                self.flocking_config.neighbors.mode,
+                budget=scheduler_config.budget,
+                recover_ratio=scheduler_config.recover_ratio,
+                recover_ticks=scheduler_config.recover_ticks,
+                cooldown_ticks=scheduler_config.cooldown_ticks,
+                max_divider=scheduler_config.max_divider,
+                smoothing=scheduler_config.smoothing,
+                skip_unchanged=scheduler_config.skip_unchanged,
+                deadline=scheduler_config.deadline,
             )
+            if scheduler_config.publish_rate > 0:
+                self.scheduler_publisher = self.create_publisher(
+                    DiagnosticArray, scheduler_config.topic, 10
+                )
+                self.create_timer(
+                    1 / scheduler_config.publish_rate, self.scheduler_callback
+                )
 
         # * Subscriptions
         self.state_subscribers: Dict[str, Subscription] = {}
-        for name, _ in self.swarm.items():
-            subscriber = self.create_subscription(
-                CrazyflieState,
-                f"/{name}/state",
-                lambda msg, name=name: self.state_callback(msg, name),
+        if self.swarm_config.swarm_state_topic:
+            self.swarm_state_subscriber = self.create_subscription(
+                SwarmState,
+                self.swarm_config.swarm_state_topic,
+                self.swarm_state_callback,
                 10,
             )
-            self.state_subscribers[name] = subscriber
+        else:
+            for name, _ in self.swarm.items():
+                subscriber = self.create_subscription(
+                    CrazyflieState,
+                    f"/{name}/state",
+                    lambda msg, name=name: self.state_callback(msg, name),
+                    10,
+                )
+                self.state_subscribers[name] = subscriber
+
+    def cmd_vel_callback(self) -> None:
+        """
+        Callback function for the cmd_vel publishers. Computes the desired
+        velocities of the whole swarm with a single pass of the flocking
+        algorithm and sends them to the dock node. With the scheduler, ticks
+        without new states or out of the reduced rate republish the last
+        velocities, and ticks with only stale states publish nothing.
+        """
+        start = time.time()
+        if self.scheduler is not None:
+            newest = float(self.received.max(initial=0))
+            decision = self.scheduler.decide(newest, start)
+            if decision != self.__decision:
+                self.get_logger().info(f"Scheduler: {decision} ticks")
+                self.__decision = decision
+            if decision == STALE:
+                return
+            if decision != COMPUTE:
+                self.publish_cmd_vel(self.v, self.yaw_rate)
+                return
+
+        positions = self.swarm_state.positions
+        yaws = self.swarm_state.yaws
+        ranges = self.swarm_state.ranges
+
+        # Positions at this instant, from states up to a publishing period old
+        fresh = None
+        extrapolation_config = self.flocking_config.extrapolation
+        if extrapolation_config.enabled:
+            stamps = self.swarm_state.stamps
+            self.check_stamps(stamps)
+            positions, fresh = extrapolate_positions(
+                positions,
+                self.swarm_state.linear_velocities,
+                self.received,
+                start,
+                extrapolation_config.max_age,
+                stamps,
+            )
+
+        v, yaw_rate = self.engine.compute_velocities(
+            positions, yaws, ranges, is_omnidirectional=False, active=fresh
+        )
+        if fresh is not None and not fresh.all():
+            self.get_logger().warn(
+                "Stale states of "
+                + ", ".join(np.array(self.names)[~fresh].tolist()),
+                throttle_duration_sec=1.0,
+            )
+        computed = time.time()
+        self.v, self.yaw_rate = v, yaw_rate
+        self.publish_cmd_vel(v, yaw_rate)
+        cost = computed - start
+        if self.scheduler is not None and self.scheduler.record(cost):
+            level = self.scheduler.current
+            self.engine.neighbor_mode = level.neighbor_mode
+            self.get_logger().warn(
+                f"Scheduler level {self.scheduler.level}: "
+                + f"{level.neighbor_mode} neighbors, "
+                + f"computing 1/{level.divider} of the ticks "
+                + f"(load {self.scheduler.load:.2f})"
+            )
+
+        if self.tracer is not None:
+            published = time.time()
+            stamps = self.swarm_state.stamps
+            stamps = stamps[stamps > 0]
+            self.tracer.record_many("state_age_at_compute", start - stamps)
+            self.tracer.record("compute", cost)
+            self.tracer.record("cmd_vel_publish", published - computed)
+            self.tracer.record_many("pose_to_cmd_vel", published - stamps)
+
+    def publish_cmd_vel(self, v: np.ndarray, yaw_rate: np.ndarray) -> None:
+        for i, name in enumerate(self.names):
+            cmd_vel = Twist()
+            cmd_vel.linear.x = float(v[i, 0])
+            cmd_vel.linear.y = float(v[i, 1])
+            cmd_vel.linear.z = 0.0
+            cmd_vel.angular.x = 0.0
+            cmd_vel.angular.y = 0.0
+            cmd_vel.angular.z = float(yaw_rate[i])
+            self.cmd_vel_publishers[name].publish(cmd_vel)
+
+    def goal_callback(self, msg: Point, name: str = None) -> None:
+        """
+        Callback function for the goal subscribers. Sets the migration goal of
+        a drone, or of the whole swarm if name is None.
+        """
+        rows = None if name is None else self.swarm_state.indices[name]
+        try:
+            self.engine.set_goal(np.array([msg.x, msg.y]), rows)
+        except ValueError as e:
+            self.get_logger().warn(f"Goal rejected: {e}")
+            return
+        self.get_logger().info(
+            f"Migration goal of {name if name else 'the swarm'}: "
+            + f"({msg.x:.2f}, {msg.y:.2f})"
+        )
+
+    def latency_callback(self) -> None:
+        self.diagnostics_publisher.publish(
+            latency_diagnostics(
+                self.tracer,
+                self.get_name(),
+                self.swarm_config.latency.warn_threshold,
+                self.swarm_config.latency.window,
+            )
+        )
+
+    def scheduler_callback(self) -> None:
+        self.scheduler_publisher.publish(
+            scheduler_diagnostics(self.scheduler, self.get_name(), reset=True)
+        )
 
-    def cmd_vel_callback(self, name: str, publisher: Publisher) -> None:
+    def telemetry_callback(self) -> None:
         """
-        Callback function for the cmd_vel publisher. Takes the desired
-        velocities computed by the flocking algorithm and sends them to the dock
-        node.
+        Publishes the latest telemetry record of every drone as a
+        (drone, field) Float64MultiArray, rows ordered as self.names.
         """
-        v, yaw_rate = self.agents[name].compute_velocities(self.swarm_state, is_omnidirectional=False)
-        cmd_vel = Twist()
-        cmd_vel.linear.x = v[0]
-        cmd_vel.linear.y = v[1]
-        cmd_vel.linear.z = 0.0
-        cmd_vel.angular.x = 0.0
-        cmd_vel.angular.y = 0.0
-        cmd_vel.angular.z = yaw_rate
-        publisher.publish(cmd_vel)
+        latest = self.telemetry.latest()
+        msg = Float64MultiArray()
+        msg.layout.dim = [
+            MultiArrayDimension(
+                label="drone", size=latest.shape[0], stride=latest.size
+            ),
+            MultiArrayDimension(
+                label="field", size=latest.shape[1], stride=latest.shape[1]
+            ),
+        ]
+        msg.data = latest.ravel().tolist()
+        self.telemetry_publisher.publish(msg)
+
+    def dump_telemetry_service_callback(self, request, response):
+        """
+        Saves the telemetry history of the swarm in a .npz file of the
+        configured dump directory.
+        """
+        file_name = time.strftime("flocking_telemetry_%Y%m%d_%H%M%S.npz")
+        path = os.path.join(self.flocking_config.telemetry.dump_dir, file_name)
+        try:
+            path = self.telemetry.dump(path)
+        except OSError as e:
+            response.success = False
+            response.message = f"Cannot dump the telemetry: {e}"
+            self.get_logger().error(response.message)
+            return response
+        response.success = True
+        response.message = path
+        self.get_logger().info(
+            f"Telemetry dumped to {path} ({len(TELEMETRY_FIELDS)} fields)"
+        )
+        return response
+
+    def check_stamps(self, stamps: np.ndarray) -> None:
+        """
+        Warns once, when every drone has a state, if some states have no stamp
+        or a stamp later than their reception. The extrapolation then only
+        covers the time since the reception, and a clock of the source ahead
+        of the local one is not synchronized.
+        """
+        if self.__stamps_checked or not (self.received > 0).all():
+            return
+        self.__stamps_checked = True
+        missing = np.array(self.names)[stamps <= 0].tolist()
+        future = np.array(self.names)[stamps > self.received].tolist()
+        if missing:
+            self.get_logger().warn(
+                "No state stamps of "
+                + ", ".join(missing)
+                + ", extrapolating from the reception only"
+            )
+        if future:
+            self.get_logger().warn(
+                "State stamps in the future of "
+                + ", ".join(future)
+                + ", the clocks are not synchronized"
+            )
 
     def state_callback(self, msg: CrazyflieState, name: str) -> None:
         """
         Callback function for the state subscriber. Subscribes to the states of
-        the crazyflies in the swarm and saves them in the swarm_state dictionary.
+        the crazyflies in the swarm and saves them in the swarm_state store.
         """
-        state = self.swarm_state[name]
-
-        state.x = msg.position[0]
-        state.y = msg.position[1]
-        state.z = msg.position[2]
-
-        state.roll = msg.euler_orientation[0]
-        state.pitch = msg.euler_orientation[1]
-        state.yaw = msg.euler_orientation[2]
-
-        state.vx = msg.linear_velocity[0]
-        state.vy = msg.linear_velocity[1]
-        state.vz = msg.linear_velocity[2]
-        state.roll_rate = msg.angular_velocity[0]
-        state.pitch_rate = msg.angular_velocity[1]
-        state.yaw_rate = msg.angular_velocity[2]
-
-        state.mr_front = msg.multiranger[0]
-        state.mr_right = msg.multiranger[1]
-        state.mr_back = msg.multiranger[2]
-        state.mr_left = msg.multiranger[3]
-        state.mr_up = msg.multiranger[4]
-        
-        state.init_x = msg.initial_position[0]
-        state.init_y = msg.initial_position[1]
-        state.init_z = msg.initial_position[2]
-
-        self.swarm_state[name] = state
+        i = self.swarm_state.indices[name]
+        self.swarm_state.set_msg_arrays(
+            {key: getattr(msg, key) for key in SWARM_STATE_FIELDS}, i
+        )
+        stamp = stamp_to_seconds(msg.header.stamp)
+        self.swarm_state.stamps[i] = stamp
+        self.received[i] = time.time()
+        if self.tracer is not None and stamp > 0:
+            self.tracer.record("state_age_at_receive", time.time() - stamp)
+
+    def swarm_state_callback(self, msg: SwarmState) -> None:
+        """
+        Callback function for the swarm state subscriber. Decodes the states of
+        the whole swarm straight into the swarm_state store.
+        """
+        if msg.names != self.__msg_names:
+            # Rows of the message and of swarm_state of the drones of the swarm
+            self.__msg_names = list(msg.names)
+            rows = [
+                (j, self.swarm_state.indices[name])
+                for j, name in enumerate(msg.names)
+                if name in self.swarm_state
+            ]
+            self.__msg_rows = np.array([j for j, _ in rows], dtype=int)
+            self.__state_rows = np.array([i for _, i in rows], dtype=int)
+
+        self.swarm_state.set_msg_arrays(
+            swarm_state_msg_to_arrays(msg),
+            self.__state_rows,
+            self.__msg_rows,
+        )
+        stamps = swarm_state_msg_stamps(msg)[self.__msg_rows]
+        self.swarm_state.stamps[self.__state_rows] = stamps
+        self.received[self.__state_rows] = time.time()
+        if self.tracer is not None:
+            now = time.time()
+            self.tracer.record(
+                "swarm_state_transport",
+                now - stamp_to_seconds(msg.header.stamp),
+            )
+            self.tracer.record_many(
+                "state_age_at_receive", now - stamps[stamps > 0]
+            )
 
 
 def main(args: Any = None) -> None:
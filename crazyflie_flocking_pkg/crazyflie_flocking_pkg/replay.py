@@ -0,0 +1,344 @@
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import yaml
+
+from crazyflie_flocking_pkg.agent import Agent
+from crazyflie_flocking_pkg.flocking_engine import FlockingEngine
+from crazyflie_flocking_pkg.utils import NavigationField, OccupancyGrid
+from crazyflie_flocking_pkg.utils.configuration import (
+    FlockingConfig,
+    default_config_path,
+)
+from crazyflie_flocking_pkg.utils.extrapolation import extrapolate_positions
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+from crazyflie_swarm_pkg.utils.flight_recorder import FlightLog
+from crazyflie_swarm_pkg.utils.utils import load_config
+
+# Columns of a command: linear velocity and yaw rate
+COMMAND_FIELDS = ["vx", "vy", "vz", "omega"]
+REPLAY_MODELS = ["engine", "agent"]
+
+
+@dataclass
+class ReplayTicks:
+    """
+    States of the swarm seen by the flocking node at every tick of a flight,
+    as (T, N, k) arrays with the drones ordered as names.
+    """
+
+    names: List[str]
+    times: np.ndarray  # (T,) [s]
+    positions: np.ndarray  # (T, N, 3)
+    attitudes: np.ndarray  # (T, N, 3) roll, pitch, yaw [deg]
+    linear_velocities: np.ndarray  # (T, N, 3)
+    angular_velocities: np.ndarray  # (T, N, 3)
+    # (T, N, 5) front, right, back, left, up as in CrazyState
+    ranges: np.ndarray
+    # (T, N, 4) recorded commands, NaN where none was recorded
+    commands: np.ndarray
+    # (T, N) times the states were taken on the source [s], 0 if unknown
+    stamps: np.ndarray = None
+    received: np.ndarray = None  # (T, N) times the states were received [s]
+
+    def __len__(self) -> int:
+        return self.times.shape[0]
+
+    def swarm_state(self, t: int) -> Dict[str, CrazyState]:
+        """
+        States of the swarm at tick t, as the Agent takes them.
+        """
+        states = {}
+        for i, name in enumerate(self.names):
+            states[name] = CrazyState(
+                *self.positions[t, i].tolist(),
+                *self.attitudes[t, i].tolist(),
+                *self.linear_velocities[t, i].tolist(),
+                *self.angular_velocities[t, i].tolist(),
+                *self.ranges[t, i].tolist(),
+            )
+        return states
+
+
+def latest_rows(
+    times: np.ndarray, drones: np.ndarray, n: int, ticks: np.ndarray
+) -> np.ndarray:
+    """
+    (T, N) row of the last sample of each drone strictly before each tick, -1 if none.
+    """
+    rows = np.full((ticks.shape[0], n), -1)
+    for i in range(n):
+        drone_rows = np.flatnonzero(drones == i)
+        k = np.searchsorted(times[drone_rows], ticks, side="left") - 1
+        rows[:, i] = np.where(k >= 0, drone_rows[np.maximum(k, 0)], -1)
+    return rows
+
+
+def load_ticks(log: FlightLog, rate: float = None) -> ReplayTicks:
+    """
+    Rebuilds the ticks of the flocking node from a recorded flight.
+
+    The ticks are the times of the recorded commands of the first commanded
+    drone, since each tick of the flocking node commands every drone, or a
+    fixed rate over the states if rate is given or no command was recorded.
+    Every tick takes the last state of each drone received before it and the
+    first command of each drone until the next tick. Ticks before every drone
+    has a state are dropped.
+    """
+    n = len(log.names)
+    states = log.read("state")
+    commands = None
+    if "cmd_vel" in log.streams:
+        commands = log.read("cmd_vel")
+
+    if rate is None and commands is not None and commands["time"].shape[0] > 0:
+        first = commands["drone"][0]
+        ticks = commands["time"][commands["drone"] == first]
+    else:
+        period = 1 / (rate if rate else 5.0)
+        ticks = np.arange(
+            states["time"][0] + period, states["time"][-1], period
+        )
+
+    rows = latest_rows(states["time"], states["drone"], n, ticks)
+    valid = (rows >= 0).all(axis=1)
+    ticks, rows = ticks[valid], rows[valid]
+
+    recorded = np.full((ticks.shape[0], n, len(COMMAND_FIELDS)), np.nan)
+    if commands is not None and ticks.shape[0] > 0:
+        values = np.concatenate(
+            (commands["linear"], commands["angular"][:, 2:]), axis=1
+        )
+        ends = np.append(ticks[1:], np.inf)
+        for i in range(n):
+            drone_rows = np.flatnonzero(commands["drone"] == i)
+            drone_times = commands["time"][drone_rows]
+            k = np.searchsorted(drone_times, ticks, side="left")
+            found = k < drone_rows.shape[0]
+            found[found] &= drone_times[k[found]] < ends[found]
+            recorded[found, i] = values[drone_rows[k[found]]]
+
+    stamps = np.zeros(rows.shape)
+    if "stamp" in log.columns("state"):
+        stamps = states["stamp"][rows].astype(float)
+
+    return ReplayTicks(
+        names=list(log.names),
+        times=ticks,
+        positions=states["position"][rows].astype(float),
+        attitudes=states["euler_orientation"][rows].astype(float),
+        linear_velocities=states["linear_velocity"][rows].astype(float),
+        angular_velocities=states["angular_velocity"][rows].astype(float),
+        ranges=states["multiranger"][rows].astype(float),
+        commands=recorded,
+        stamps=stamps,
+        received=states["time"][rows],
+    )
+
+
+def replay(
+    config: FlockingConfig,
+    ticks: ReplayTicks,
+    model: str = "engine",
+    is_omnidirectional: bool = False,
+) -> np.ndarray:
+    """
+    Computes the commands of every tick with the FlockingEngine or one Agent
+    per drone. The replay is deterministic: the same ticks and config always
+    give the same commands.
+
+    Returns:
+        np.ndarray: (T, N, 4) commands, vx, vy, vz and omega.
+    """
+    n = len(ticks.names)
+    commands = np.zeros((len(ticks), n, len(COMMAND_FIELDS)))
+    if model == "engine":
+        engine = FlockingEngine(config)
+        extrapolate = (
+            config.extrapolation.enabled and ticks.received is not None
+        )
+        for t in range(len(ticks)):
+            # As the flocking node, from the positions at the tick
+            positions, active = ticks.positions[t], None
+            if extrapolate:
+                positions, active = extrapolate_positions(
+                    positions,
+                    ticks.linear_velocities[t],
+                    ticks.received[t],
+                    ticks.times[t],
+                    config.extrapolation.max_age,
+                    ticks.stamps[t],
+                )
+            v, omega = engine.compute_velocities(
+                positions,
+                ticks.attitudes[t, :, 2],
+                ticks.ranges[t],
+                is_omnidirectional=is_omnidirectional,
+                active=active,
+            )
+            commands[t, :, :3] = v
+            commands[t, :, 3] = omega
+    elif model == "agent":
+        occupancy_grid = None
+        if config.occupancy_grid.enabled:
+            occupancy_grid = OccupancyGrid.from_config(config.occupancy_grid)
+        navigation = None
+        goal = -1
+        if config.migration.enabled:
+            navigation = NavigationField.from_config(config.occupancy_grid)
+            if len(config.migration.goal) >= 2:
+                goal = navigation.add_goal(config.migration.goal)
+        agents = [
+            Agent(
+                name,
+                config,
+                occupancy_grid=occupancy_grid,
+                navigation=navigation,
+            )
+            for name in ticks.names
+        ]
+        for agent in agents:
+            agent.goal = goal
+        for t in range(len(ticks)):
+            swarm_state = ticks.swarm_state(t)
+            for i, agent in enumerate(agents):
+                v, omega = agent.compute_velocities(
+                    swarm_state, is_omnidirectional
+                )
+                commands[t, i, :3] = v
+                commands[t, i, 3] = omega
+            if navigation is not None and occupancy_grid is not None:
+                navigation.update_from_grid(
+                    occupancy_grid, config.migration.inflation
+                )
+    else:
+        raise ValueError(
+            f"Unknown replay model {model}, expected one of {REPLAY_MODELS}"
+        )
+    return commands
+
+
+def command_diffs(
+    commands: np.ndarray, reference: np.ndarray
+) -> Dict[str, Dict[str, float]]:
+    """
+    RMS and maximum absolute difference of each command field, over the
+    ticks and drones where the reference is known.
+    """
+    diffs = {}
+    error = commands - reference
+    for k, field in enumerate(COMMAND_FIELDS):
+        values = error[..., k][~np.isnan(error[..., k])]
+        if values.size == 0:
+            diffs[field] = {
+                "rms": float("nan"),
+                "max": float("nan"),
+                "count": 0,
+            }
+            continue
+        diffs[field] = {
+            "rms": float(np.sqrt(np.mean(values**2))),
+            "max": float(np.max(np.abs(values))),
+            "count": int(values.size),
+        }
+    return diffs
+
+
+def override_config(config: FlockingConfig, overrides: List[str]) -> None:
+    """
+    Applies key.subkey=value overrides to the config, the values being parsed as YAML.
+    """
+    for override in overrides:
+        key, value = override.split("=", 1)
+        *path, attribute = key.split(".")
+        target = config
+        for part in path:
+            target = getattr(target, part)
+        if not hasattr(target, attribute):
+            raise KeyError(f"Unknown config key {key}")
+        setattr(target, attribute, yaml.safe_load(value))
+
+
+def main(args=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replays a recorded flight through the flocking algorithm"
+    )
+    parser.add_argument(
+        "recording", help="directory of a flight_recorder recording"
+    )
+    parser.add_argument("--config", default=None, help="flocking config.yaml")
+    parser.add_argument(
+        "--set",
+        nargs="*",
+        default=[],
+        metavar="KEY=VALUE",
+        help="config overrides, e.g. gains.k_r=3.0",
+    )
+    parser.add_argument("--model", default="engine", choices=REPLAY_MODELS)
+    parser.add_argument("--omnidirectional", action="store_true")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="replay at this fixed rate [Hz] instead of the recorded ticks",
+    )
+    parser.add_argument(
+        "--reference",
+        default=None,
+        help="compare with the commands of a previous replay instead of the recorded ones",
+    )
+    parser.add_argument(
+        "--output", default=None, help="save the commands to this .npz file"
+    )
+    parsed = parser.parse_args(args)
+
+    config = load_config(
+        parsed.config or default_config_path(), FlockingConfig
+    )
+    override_config(config, parsed.set)
+
+    ticks = load_ticks(FlightLog(parsed.recording), parsed.rate)
+    print(f"{len(ticks)} ticks of {len(ticks.names)} drones")
+
+    start = time.perf_counter()
+    commands = replay(config, ticks, parsed.model, parsed.omnidirectional)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Replayed with the {parsed.model} in {elapsed:.3f}s, "
+        + f"{len(ticks) / max(elapsed, 1e-9):.0f} ticks/s"
+    )
+
+    reference = ticks.commands
+    source = "recorded"
+    if parsed.reference:
+        reference = np.load(parsed.reference)["commands"]
+        source = parsed.reference
+    if reference.shape == commands.shape:
+        print(f"Differences from the {source} commands:")
+        for field, diff in command_diffs(commands, reference).items():
+            print(
+                f"  - {field}: rms {diff['rms']:.4f} max {diff['max']:.4f} "
+                + f"over {diff['count']} commands"
+            )
+    else:
+        print(
+            f"Cannot compare with the {source} commands of shape {reference.shape}"
+        )
+
+    if parsed.output:
+        np.savez(
+            parsed.output,
+            commands=commands,
+            recorded=ticks.commands,
+            times=ticks.times,
+            names=np.array(ticks.names),
+            fields=np.array(COMMAND_FIELDS),
+        )
+        print(f"Commands saved to {parsed.output}")
+
+
+if __name__ == "__main__":
+    main()
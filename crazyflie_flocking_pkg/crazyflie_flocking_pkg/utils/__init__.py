@@ -1,4 +1,21 @@
 from .configuration import FlockingConfig
+from .extrapolation import extrapolate_positions
 from .misc import get_clipper, get_versor
+from .navigation import NavigationField
+from .occupancy_grid import OccupancyGrid
+from .scheduler import FlockingScheduler
+from .spatial_hash import SpatialHash
+from .telemetry import TELEMETRY_FIELDS, FlockingTelemetry
 
-__all__ = [FlockingConfig, get_clipper, get_versor]
+__all__ = [
+    FlockingConfig,
+    extrapolate_positions,
+    get_clipper,
+    get_versor,
+    NavigationField,
+    OccupancyGrid,
+    FlockingScheduler,
+    SpatialHash,
+    TELEMETRY_FIELDS,
+    FlockingTelemetry,
+]
@@ -1,4 +1,6 @@
+import os
 from dataclasses import dataclass, field
+from typing import List
 
 from omegaconf import MISSING
 
@@ -38,9 +40,117 @@ class AgentConfig:
     h: float = MISSING
 
 
+@dataclass
+class ObstaclesConfig:
+    # Max distance of an obstacle from a neighbor to be that drone [m]
+    drone_threshold: float = 0.4
+    floor_height: float = 0.05  # Obstacles below this height are the floor [m]
+
+
+@dataclass
+class OccupancyGridConfig:
+    # Obstacle forces from the shared grid instead of the current readings
+    enabled: bool = False
+    x_min: float = -5.0  # Bounds of the grid [m]
+    y_min: float = -5.0
+    x_max: float = 5.0
+    y_max: float = 5.0
+    resolution: float = 0.05  # Side of a cell [m]
+    log_odds_hit: float = 0.85  # Added to the cell a beam ends in
+    log_odds_miss: float = -0.4  # Added to the cells a beam crosses
+    log_odds_min: float = -2.0
+    log_odds_max: float = 3.5
+    occupied_threshold: float = 0.5  # Log-odds above which a cell is occupied
+    max_distance: float = 2.0  # Obstacles farther than this give no force [m]
+
+
+@dataclass
+class MigrationConfig:
+    # Migrate towards the goals along a navigation function
+    enabled: bool = False
+    # [x, y] goal of the whole swarm [m], empty for none
+    goal: List[float] = field(default_factory=list)
+    speed: float = 0.3  # Migration velocity far from the goal [m/s]
+    # Path length from the goal under which the velocity decreases [m]
+    slowdown_distance: float = 0.5
+    # Clearance of the paths from the obstacles of the occupancy grid [m]
+    inflation: float = 0.3
+    # Goal of the whole swarm, /{name}/goal for a single drone
+    goal_topic: str = "/flocking/goal"
+
+
+@dataclass
+class ExtrapolationConfig:
+    # Predict the positions of the swarm at the compute instant
+    enabled: bool = True
+    # States received longer ago are not neighbors, and their drone hovers [s]
+    max_age: float = 0.5
+
+
+@dataclass
+class NeighborsConfig:
+    mode: str = "auto"  # "dense", "grid" or "auto"
+    grid_min_agents: int = 200  # Swarm size from which "auto" uses the grid
+
+
+@dataclass
+class TelemetryConfig:
+    enabled: bool = False  # Record the forces and commands of every tick
+    buffer_size: int = 100  # Records kept per drone
+    # Rate of the latest records on the topic [Hz], 0 to disable
+    publish_rate: float = 1.0
+    topic: str = "/flocking/telemetry"
+    # Directory of the records dumped by the dump service
+    dump_dir: str = "/tmp"
+
+
+@dataclass
+class SchedulerConfig:
+    # Adapt the ticks of the node to the cost of the computations
+    enabled: bool = True
+    budget: float = 0.5  # Share of the tick period the computations may take
+    # Share of the budget under which the load is low enough to recover
+    recover_ratio: float = 0.5
+    # Computations with a low load before going back one level
+    recover_ticks: int = 20
+    # Computations after a level change before degrading again
+    cooldown_ticks: int = 5
+    # Lowest rate of the computations, as a fraction of the tick rate
+    max_divider: int = 8
+    smoothing: float = 0.2  # Weight of the last cost in the smoothed cost
+    # Republish the last commands when no state is newer
+    skip_unchanged: bool = True
+    # Ticks whose newest state is older than this publish nothing [s], 0 to disable
+    deadline: float = 1.0
+    publish_rate: float = 0.5  # Rate of the diagnostics [Hz], 0 to disable
+    topic: str = "/diagnostics"
+
+
 @dataclass
 class FlockingConfig:
     dimensions: DimensionsConfig = field(default_factory=DimensionsConfig)
     gains: GainsConfig = field(default_factory=GainsConfig)
     bounds: BoundsConfig = field(default_factory=BoundsConfig)
     agent: AgentConfig = field(default_factory=AgentConfig)
+    obstacles: ObstaclesConfig = field(default_factory=ObstaclesConfig)
+    occupancy_grid: OccupancyGridConfig = field(
+        default_factory=OccupancyGridConfig
+    )
+    migration: MigrationConfig = field(default_factory=MigrationConfig)
+    extrapolation: ExtrapolationConfig = field(
+        default_factory=ExtrapolationConfig
+    )
+    neighbors: NeighborsConfig = field(default_factory=NeighborsConfig)
+    telemetry: TelemetryConfig = field(default_factory=TelemetryConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+
+
+def default_config_path() -> str:
+    try:
+        from ament_index_python.packages import get_package_share_directory
+
+        root = get_package_share_directory("crazyflie_flocking_pkg")
+    except (ImportError, LookupError):
+        # Not installed in a ROS workspace: use the config of the source tree
+        root = os.path.join(os.path.dirname(__file__), "..", "..")
+    return os.path.join(root, "config/config.yaml")
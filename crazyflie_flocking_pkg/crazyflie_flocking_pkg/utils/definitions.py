@@ -1,17 +1,24 @@
 from enum import Enum
+from typing import List
 
 import numpy as np
 
 
+# Beams of the multiranger, in the order of the CrazyState fields and of
+# MULTIRANGER_BEAMS, the versors of the beams in the body frame
 class Direction(Enum):
     none = -1
     front = 0
-    left = 1
+    right = 1
     back = 2
-    right = 3
+    left = 3
     up = 4
 
 
+# Multiranger readings below this distance [m] are considered obstacles
+OBSTACLE_THRESHOLD = 2
+
+
 class ObstacleType(Enum):
     none = -1
     obstacle = 0
@@ -39,3 +46,42 @@ class Obstacle:
             + f"Absolute Position: {self.abs_pos.transpose()}\n"
             + f"Relative Position: {self.rel_pos.transpose()}\n"
         )
+
+
+# Detected obstacles as a structured array, one record per obstacle
+OBSTACLE_DTYPE = np.dtype(
+    [
+        ("abs_pos", np.float64, (3,)),  # Position in the world frame [m]
+        ("rel_pos", np.float64, (3,)),  # Position in the body frame [m]
+        ("direction", np.int8),  # Direction value of the beam
+        ("type", np.int8),  # ObstacleType value
+    ]
+)
+
+
+def obstacles_to_array(obstacles: List[Obstacle]) -> np.ndarray:
+    """
+    Packs a list of Obstacle into an OBSTACLE_DTYPE array.
+    """
+    array = np.zeros(len(obstacles), dtype=OBSTACLE_DTYPE)
+    for k, o in enumerate(obstacles):
+        array["abs_pos"][k] = np.reshape(o.abs_pos, 3)
+        array["rel_pos"][k] = np.reshape(o.rel_pos, 3)
+        array["direction"][k] = o.direction.value
+        array["type"][k] = o.type.value
+    return array
+
+
+def array_to_obstacles(array: np.ndarray) -> List[Obstacle]:
+    """
+    Unpacks an OBSTACLE_DTYPE array into a list of Obstacle.
+    """
+    return [
+        Obstacle(
+            abs_pos=o["abs_pos"].reshape(3, 1),
+            rel_pos=o["rel_pos"].copy(),
+            direction=Direction(int(o["direction"])),
+            type=ObstacleType(int(o["type"])),
+        )
+        for o in array
+    ]
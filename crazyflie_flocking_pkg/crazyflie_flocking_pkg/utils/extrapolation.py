@@ -0,0 +1,43 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def extrapolate_positions(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    received: np.ndarray,
+    now: float,
+    max_age: float,
+    stamps: np.ndarray = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Predicts the positions of the swarm at the instant now with a constant
+    velocity model, to compensate the age of the last received states.
+
+    The freshness of the states only depends on the local clock. The stamps
+    of the source, whose clock must be synchronized with the local one, only
+    add the transport delay, up to max_age, to the extrapolation.
+
+    Args:
+        positions (np.ndarray): (N, 3) last received positions.
+        velocities (np.ndarray): (N, 3) last received world frame velocities.
+        received (np.ndarray): (N,) local times the states were received [s], 0 if never.
+        now (float): The instant to predict the positions at [s], on the local clock.
+        max_age (float): States received longer ago are too stale to be trusted [s].
+        stamps (np.ndarray): (N,) times the states were taken on the source [s], 0 if unknown.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (N, 3) predicted positions and (N,) mask of
+        the fresh states. Stale states are not extrapolated.
+    """
+    received = np.asarray(received, dtype=float)
+    ages = now - received
+    fresh = (received > 0) & (ages <= max_age)
+    horizon = np.maximum(ages, 0.0)
+    if stamps is not None:
+        stamps = np.asarray(stamps, dtype=float)
+        delays = np.where(stamps > 0, received - stamps, 0.0)
+        horizon += np.clip(delays, 0.0, max_age)
+    horizon = np.where(fresh, horizon, 0.0)
+    return positions + velocities * horizon[:, np.newaxis], fresh
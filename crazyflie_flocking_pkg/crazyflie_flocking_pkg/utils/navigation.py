@@ -0,0 +1,318 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from crazyflie_flocking_pkg.utils.occupancy_grid import NEIGHBOR_OFFSETS
+
+# Length of the step to each of the NEIGHBOR_OFFSETS, in cells
+NEIGHBOR_STEPS = np.linalg.norm(NEIGHBOR_OFFSETS, axis=1)
+
+
+class NavigationField:
+    """
+    Navigation functions over a 2D grid: for every goal, the length of the
+    shortest 8-connected path of each cell to the goal around the blocked
+    cells, and the direction of steepest descent of that length.
+
+    A field is computed by a wavefront once, when its goal is added. When
+    the map changes, only the cells whose path may have changed are updated:
+    the ones costing more than the cheapest newly blocked cell are raised,
+    and the ones around the newly free cells lowered. The fields of all the
+    goals are stacked, so the migration velocities of a whole swarm with
+    distinct goals are a single lookup.
+
+    Cells are indexed [ix, iy] as in OccupancyGrid.
+    """
+
+    def __init__(
+        self,
+        x_min: float,
+        y_min: float,
+        x_max: float,
+        y_max: float,
+        resolution: float,
+    ):
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if x_max <= x_min or y_max <= y_min:
+            raise ValueError("The grid bounds are empty")
+        self.origin = np.array([x_min, y_min], dtype=float)
+        self.resolution = resolution
+        self.shape = (
+            int(np.ceil((x_max - x_min) / resolution)),
+            int(np.ceil((y_max - y_min) / resolution)),
+        )
+        self.blocked = np.zeros(self.shape, dtype=bool)
+
+        # Stacked fields, one per goal slot
+        # Path length to the goal [m], inf if unreachable
+        self.cost = np.zeros((0, *self.shape))
+        # Versor of steepest descent
+        self.direction = np.zeros((0, *self.shape, 2))
+        self.goals: Dict[int, np.ndarray] = {}  # Goal of each used slot
+
+        ix, iy = np.indices(self.shape)
+        self.__coords = np.stack((ix.ravel(), iy.ravel()), axis=1)
+
+    @classmethod
+    def from_config(cls, config) -> "NavigationField":
+        """
+        Builds a field with the bounds and resolution of an
+        OccupancyGridConfig, the grid the paths are planned on.
+        """
+        return cls(
+            config.x_min,
+            config.y_min,
+            config.x_max,
+            config.y_max,
+            config.resolution,
+        )
+
+    def __len__(self) -> int:
+        return len(self.goals)
+
+    def to_cells(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (K, 2) cells of (K, 2) points and the (K,) mask of the points inside
+        the grid.
+        """
+        cells = np.floor((points - self.origin) / self.resolution).astype(
+            np.int64
+        )
+        inside = (
+            (cells[:, 0] >= 0)
+            & (cells[:, 0] < self.shape[0])
+            & (cells[:, 1] >= 0)
+            & (cells[:, 1] < self.shape[1])
+            & np.isfinite(points).all(axis=1)
+        )
+        return cells, inside
+
+    def add_goal(self, goal: np.ndarray) -> int:
+        """
+        Computes the navigation function of a goal.
+
+        Returns:
+            int: The id of the goal, the one of an existing goal in the same
+                cell if any.
+        """
+        goal = np.asarray(goal, dtype=float).reshape(-1)[:2]
+        cell, inside = self.to_cells(goal.reshape(1, 2))
+        if not inside[0]:
+            raise ValueError(f"Goal {goal.tolist()} out of the grid")
+        for id, other in self.goals.items():
+            if (self.to_cells(other.reshape(1, 2))[0] == cell).all():
+                return id
+
+        free = [id for id in range(self.cost.shape[0]) if id not in self.goals]
+        if free:
+            id = free[0]
+        else:
+            id = self.cost.shape[0]
+            self.cost = np.concatenate((self.cost, np.zeros((1, *self.shape))))
+            self.direction = np.concatenate(
+                (self.direction, np.zeros((1, *self.shape, 2)))
+            )
+        self.goals[id] = goal
+
+        self.cost[id] = np.inf
+        seeds = np.zeros(0, dtype=np.int64)
+        goal_cell = self.__flat(cell)
+        if not self.blocked.reshape(-1)[goal_cell[0]]:
+            self.cost[id].reshape(-1)[goal_cell] = 0
+            seeds = goal_cell
+        self.__propagate(id, seeds)
+        self.__update_direction(
+            id, np.zeros(2, dtype=np.int64), np.array(self.shape)
+        )
+        return id
+
+    def remove_goal(self, id: int) -> None:
+        self.goals.pop(id)
+
+    def set_map(self, blocked: np.ndarray) -> None:
+        """
+        Replaces the blocked cells of the map and updates the fields of the
+        goals where the map changed.
+        """
+        blocked = np.asarray(blocked, dtype=bool)
+        newly_blocked = np.flatnonzero(blocked & ~self.blocked)
+        newly_free = np.flatnonzero(~blocked & self.blocked)
+        if newly_blocked.shape[0] == 0 and newly_free.shape[0] == 0:
+            return
+        self.blocked = blocked.copy()
+        for id, goal in self.goals.items():
+            self.__update_goal(id, goal, newly_blocked, newly_free)
+
+    def update_from_grid(self, occupancy_grid, inflation: float) -> None:
+        """
+        Blocks the cells of an OccupancyGrid of the same bounds closer than
+        inflation to an obstacle, so that the paths keep the drones clear.
+        """
+        self.set_map(occupancy_grid.distance <= inflation)
+
+    def velocities(
+        self,
+        positions: np.ndarray,
+        goal_ids: np.ndarray,
+        speed: float,
+        slowdown_distance: float = 0.0,
+    ) -> np.ndarray:
+        """
+        Migration velocities of N drones towards their goals, along the
+        steepest descent of the navigation functions, slowing down linearly
+        within slowdown_distance of the goal.
+
+        Args:
+            positions (np.ndarray): (N, 2) or (N, 3) positions of the drones.
+            goal_ids (np.ndarray): (N,) goal of each drone, -1 for none.
+            speed (float): Speed far from the goal [m/s].
+            slowdown_distance (float): Path length from the goal under which
+                the speed decreases [m].
+
+        Returns:
+            np.ndarray: (N, 3) velocities, zero without goal, outside of the
+                grid, with no path or at the goal.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(
+            -1, np.shape(positions)[-1]
+        )
+        goal_ids = np.broadcast_to(
+            np.asarray(goal_ids, dtype=np.int64), positions.shape[:1]
+        )
+        cells, inside = self.to_cells(positions[:, :2])
+        valid = inside & (goal_ids >= 0)
+        ids, cells = goal_ids[valid], cells[valid]
+
+        # Blocked cells have no path but still a direction out of them
+        scale = np.full(ids.shape[0], float(speed))
+        if slowdown_distance > 0:
+            cost = self.cost[ids, cells[:, 0], cells[:, 1]]
+            scale *= np.minimum(cost / slowdown_distance, 1)
+
+        v = np.zeros((positions.shape[0], 3))
+        v[valid, :2] = (
+            scale[:, np.newaxis]
+            * self.direction[ids, cells[:, 0], cells[:, 1]]
+        )
+        return v
+
+    def __flat(self, cells: np.ndarray) -> np.ndarray:
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def __neighbors(
+        self, flat: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Flat neighbors of flat cells, the rows of the cells they are neighbors
+        of and the length of the steps to them [cells].
+        """
+        cells = self.__coords[flat]
+        neighbors = (
+            cells[:, np.newaxis, :] + NEIGHBOR_OFFSETS[np.newaxis, :, :]
+        ).reshape(-1, 2)
+        rows = np.repeat(np.arange(flat.shape[0]), NEIGHBOR_OFFSETS.shape[0])
+        steps = np.tile(NEIGHBOR_STEPS, flat.shape[0])
+        inside = (
+            (neighbors[:, 0] >= 0)
+            & (neighbors[:, 0] < self.shape[0])
+            & (neighbors[:, 1] >= 0)
+            & (neighbors[:, 1] < self.shape[1])
+        )
+        return self.__flat(neighbors[inside]), rows[inside], steps[inside]
+
+    def __update_goal(
+        self,
+        id: int,
+        goal: np.ndarray,
+        newly_blocked: np.ndarray,
+        newly_free: np.ndarray,
+    ) -> None:
+        cost = self.cost[id].reshape(-1)
+        changed = [newly_blocked, newly_free]
+        seeds = []
+
+        if newly_blocked.shape[0] > 0:
+            # Raise: only the paths costing more than the cheapest newly
+            # blocked cell can go through a newly blocked cell
+            threshold = cost[newly_blocked].min()
+            if np.isfinite(threshold):
+                raised = np.flatnonzero(cost >= threshold)
+                cost[raised] = np.inf
+                changed.append(raised)
+                neighbors, _, _ = self.__neighbors(raised)
+                seeds.append(neighbors[np.isfinite(cost[neighbors])])
+
+        if newly_free.shape[0] > 0:
+            # Lower: the newly free cells open paths from their neighbors
+            neighbors, _, _ = self.__neighbors(newly_free)
+            seeds.append(neighbors[np.isfinite(cost[neighbors])])
+            goal_cell = self.__flat(self.to_cells(goal.reshape(1, 2))[0])
+            if np.isin(goal_cell, newly_free)[0]:
+                cost[goal_cell] = 0
+                seeds.append(goal_cell)
+
+        seeds = (
+            np.unique(np.concatenate(seeds))
+            if seeds
+            else np.zeros(0, dtype=np.int64)
+        )
+        changed.append(self.__propagate(id, seeds))
+
+        changed = np.concatenate(changed)
+        if changed.shape[0] > 0:
+            cells = self.__coords[changed]
+            self.__update_direction(
+                id,
+                np.maximum(cells.min(axis=0) - 1, 0),
+                np.minimum(cells.max(axis=0) + 2, self.shape),
+            )
+
+    def __propagate(self, id: int, frontier: np.ndarray) -> np.ndarray:
+        """
+        Wavefront of the path lengths of a goal from the frontier cells, until
+        no free cell gets a shorter path.
+
+        Returns:
+            np.ndarray: The flat cells whose path length changed.
+        """
+        cost = self.cost[id].reshape(-1)
+        blocked = self.blocked.reshape(-1)
+        changed = []
+        while frontier.shape[0] > 0:
+            neighbors, rows, steps = self.__neighbors(frontier)
+            candidates = cost[frontier][rows] + steps * self.resolution
+            better = (candidates < cost[neighbors]) & ~blocked[neighbors]
+            neighbors, candidates = neighbors[better], candidates[better]
+
+            # The shortest path wins where several reach the same cell
+            order = np.argsort(-candidates, kind="stable")
+            cost[neighbors[order]] = candidates[order]
+            frontier = np.unique(neighbors)
+            changed.append(frontier)
+        return (
+            np.concatenate(changed) if changed else np.zeros(0, dtype=np.int64)
+        )
+
+    def __update_direction(
+        self, id: int, low: np.ndarray, high: np.ndarray
+    ) -> None:
+        """
+        Directions of steepest descent of the cells in [low, high), towards
+        the neighbor with the shortest path, zero at the goal and where
+        unreachable.
+        """
+        cost = self.cost[id]
+        padded = np.pad(cost, 1, constant_values=np.inf)
+        best = np.full((high[0] - low[0], high[1] - low[1]), np.inf)
+        direction = np.zeros((*best.shape, 2))
+        for offset, step in zip(NEIGHBOR_OFFSETS, NEIGHBOR_STEPS):
+            start = low + 1 + offset
+            end = start + best.shape
+            neighbor = padded[slice(start[0], end[0]), slice(start[1], end[1])]
+            lower = neighbor < best
+            best[lower] = neighbor[lower]
+            direction[lower] = offset / step
+        cells = (slice(low[0], high[0]), slice(low[1], high[1]))
+        direction[~(best < cost[cells])] = 0
+        self.direction[id][cells] = direction
@@ -0,0 +1,357 @@
+from typing import Tuple
+
+import numpy as np
+
+# Offsets of the 8 neighbors of a cell, visited by the distance waves
+NEIGHBOR_OFFSETS = np.array(
+    [[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]]
+)
+
+
+class OccupancyGrid:
+    """
+    2D log-odds occupancy grid of the obstacles seen by the whole swarm, with
+    an incrementally updated Euclidean distance field.
+
+    Every multiranger beam is a ray: the cells it crosses get a miss and the
+    cell it ends in a hit, if the beam read an obstacle. Each cell also keeps
+    its nearest occupied cell (site), its distance from it and the gradient of
+    the distance, a versor pointing away from the obstacle. When cells turn
+    occupied or free, only the cells around them are updated, by waves over
+    the 8-neighborhoods as in a dynamic brushfire, so the distance to the
+    nearest obstacle seen so far is an O(1) lookup.
+
+    Cells are indexed [ix, iy], x and y growing with the index.
+    """
+
+    def __init__(
+        self,
+        x_min: float,
+        y_min: float,
+        x_max: float,
+        y_max: float,
+        resolution: float,
+        log_odds_hit: float = 0.85,
+        log_odds_miss: float = -0.4,
+        log_odds_min: float = -2.0,
+        log_odds_max: float = 3.5,
+        occupied_threshold: float = 0.5,
+        max_distance: float = 2.0,
+    ):
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if x_max <= x_min or y_max <= y_min:
+            raise ValueError("The grid bounds are empty")
+        self.origin = np.array([x_min, y_min], dtype=float)
+        self.resolution = resolution
+        self.shape = (
+            int(np.ceil((x_max - x_min) / resolution)),
+            int(np.ceil((y_max - y_min) / resolution)),
+        )
+        self.log_odds_hit = log_odds_hit
+        self.log_odds_miss = log_odds_miss
+        self.log_odds_min = log_odds_min
+        self.log_odds_max = log_odds_max
+        self.occupied_threshold = occupied_threshold
+        # The distance field is truncated here [m]
+        self.max_distance = max_distance
+
+        self.log_odds = np.zeros(self.shape, dtype=np.float32)
+        self.occupied = np.zeros(self.shape, dtype=bool)
+        self.distance = np.full(self.shape, np.inf)  # To the nearest site [m]
+        # Versor away from the nearest site
+        self.gradient = np.zeros((*self.shape, 2))
+        # Flat index, -1 if none
+        self.site = np.full(self.shape, -1, dtype=np.int64)
+
+        ix, iy = np.indices(self.shape)
+        self.__coords = np.stack((ix.ravel(), iy.ravel()), axis=1)
+
+    @classmethod
+    def from_config(cls, config) -> "OccupancyGrid":
+        """
+        Builds the grid of an OccupancyGridConfig.
+        """
+        return cls(
+            config.x_min,
+            config.y_min,
+            config.x_max,
+            config.y_max,
+            config.resolution,
+            config.log_odds_hit,
+            config.log_odds_miss,
+            config.log_odds_min,
+            config.log_odds_max,
+            config.occupied_threshold,
+            config.max_distance,
+        )
+
+    def to_cells(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (K, 2) cells of (K, 2) points and the (K,) mask of the points inside
+        the grid.
+        """
+        cells = np.floor((points - self.origin) / self.resolution).astype(
+            np.int64
+        )
+        inside = (
+            (cells[:, 0] >= 0)
+            & (cells[:, 0] < self.shape[0])
+            & (cells[:, 1] >= 0)
+            & (cells[:, 1] < self.shape[1])
+            & np.isfinite(points).all(axis=1)
+        )
+        return cells, inside
+
+    def update(
+        self,
+        origins: np.ndarray,
+        ends: np.ndarray,
+        hits: np.ndarray,
+    ) -> None:
+        """
+        Integrates K beams in the grid.
+
+        Args:
+            origins (np.ndarray): (K, 2) positions of the sensors.
+            ends (np.ndarray): (K, 2) ends of the beams, at their range or at
+                the max range.
+            hits (np.ndarray): (K,) whether each beam read an obstacle at its
+                end.
+        """
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        hits = np.asarray(hits, dtype=bool).reshape(-1)
+        valid = np.isfinite(origins).all(axis=1) & np.isfinite(ends).all(
+            axis=1
+        )
+        origins, ends, hits = origins[valid], ends[valid], hits[valid]
+        if origins.shape[0] == 0:
+            return
+
+        # Cells crossed by the rays, sampled every half cell up to the end cell
+        step = self.resolution / 2
+        ray = ends - origins
+        lengths = np.linalg.norm(ray, axis=1)
+        samples = np.arange(int(np.ceil(lengths.max() / step)) + 1) * step
+        crossed = samples[np.newaxis, :] < lengths[:, np.newaxis]
+        points = origins[:, np.newaxis, :] + (
+            samples[np.newaxis, :, np.newaxis]
+            * (ray / np.maximum(lengths, 1e-12)[:, np.newaxis])[
+                :, np.newaxis, :
+            ]
+        )
+        cells, inside = self.to_cells(points[crossed])
+        free = np.unique(self.__flat(cells[inside]))
+
+        end_cells, end_inside = self.to_cells(ends)
+        occupied = np.unique(self.__flat(end_cells[hits & end_inside]))
+        free = np.setdiff1d(free, occupied, assume_unique=True)
+
+        log_odds = self.log_odds.reshape(-1)
+        log_odds[free] += self.log_odds_miss
+        log_odds[occupied] += self.log_odds_hit
+        touched = np.concatenate((free, occupied))
+        log_odds[touched] = np.clip(
+            log_odds[touched], self.log_odds_min, self.log_odds_max
+        )
+
+        # Cells whose occupancy changed
+        was_occupied = self.occupied.reshape(-1)[touched]
+        is_occupied = log_odds[touched] > self.occupied_threshold
+        self.occupied.reshape(-1)[touched] = is_occupied
+        self.__update_distance(
+            touched[is_occupied & ~was_occupied],
+            touched[was_occupied & ~is_occupied],
+        )
+
+    def update_beams(
+        self,
+        positions: np.ndarray,
+        yaws: np.ndarray,
+        ranges: np.ndarray,
+        directions: np.ndarray,
+        max_range: float,
+        drones: np.ndarray = None,
+        drone_threshold: float = 0.0,
+        sources: np.ndarray = None,
+    ) -> None:
+        """
+        Integrates the horizontal multiranger beams of N drones. Beams ending
+        close to a drone other than their own are only free space, since the
+        drones are not static obstacles.
+
+        Args:
+            positions (np.ndarray): (N, 2) or (N, 3) positions of the drones.
+            yaws (np.ndarray): (N,) yaw of the drones in degrees.
+            ranges (np.ndarray): (N, B) readings of the beams.
+            directions (np.ndarray): (B, 2) or (B, 3) body frame versors of
+                the beams.
+            max_range (float): Readings at or beyond this distance are only
+                free space.
+            drones (np.ndarray): (M, 2) or (M, 3) positions of the drones of
+                the swarm.
+            drone_threshold (float): Max distance of a beam end from a drone
+                to be that drone [m].
+            sources (np.ndarray): (N,) row in drones of each of the N drones,
+                if they are there.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(
+            -1, np.shape(positions)[-1]
+        )
+        ranges = np.asarray(ranges, dtype=float).reshape(
+            positions.shape[0], -1
+        )
+        directions = np.asarray(directions, dtype=float)[:, :2]
+        yaw = np.deg2rad(np.asarray(yaws, dtype=float)).reshape(-1)
+        cosyaw, sinyaw = np.cos(yaw), np.sin(yaw)
+
+        # (N, B, 2) world frame versors of the beams, rotated by the yaw only
+        versors = np.empty((*ranges.shape, 2))
+        versors[:, :, 0] = (
+            cosyaw[:, np.newaxis] * directions[:, 0]
+            - sinyaw[:, np.newaxis] * directions[:, 1]
+        )
+        versors[:, :, 1] = (
+            sinyaw[:, np.newaxis] * directions[:, 0]
+            + cosyaw[:, np.newaxis] * directions[:, 1]
+        )
+        valid = ranges > 0
+        hits = valid & (ranges < max_range)
+        lengths = np.where(hits, ranges, max_range)
+        origins = np.broadcast_to(positions[:, np.newaxis, :2], versors.shape)
+        ends = origins + lengths[:, :, np.newaxis] * versors
+
+        if drones is not None and len(drones) > 0 and hits.any():
+            drones = np.asarray(drones, dtype=float).reshape(
+                -1, np.shape(drones)[-1]
+            )
+            rows, beams = np.nonzero(hits)
+            # (K, M) distances of the hits from the drones
+            distances = np.linalg.norm(
+                ends[rows, beams, np.newaxis, :] - drones[np.newaxis, :, :2],
+                axis=2,
+            )
+            if sources is not None:
+                own = np.asarray(sources)[rows]
+                distances[np.flatnonzero(own >= 0), own[own >= 0]] = np.inf
+            hits[rows, beams] = distances.min(axis=1) >= drone_threshold
+
+        self.update(origins[valid], ends[valid], hits[valid])
+
+    def lookup(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distance to the nearest occupied cell and its gradient at (N, 2)
+        points, inf and zeros outside of the grid or farther than
+        max_distance.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) distances [m] and (N, 2)
+                gradients.
+        """
+        points = np.asarray(points, dtype=float).reshape(
+            -1, np.shape(points)[-1]
+        )[:, :2]
+        cells, inside = self.to_cells(points)
+        distance = np.full(points.shape[0], np.inf)
+        gradient = np.zeros((points.shape[0], 2))
+        distance[inside] = self.distance[cells[inside, 0], cells[inside, 1]]
+        gradient[inside] = self.gradient[cells[inside, 0], cells[inside, 1]]
+        return distance, gradient
+
+    def clear(self) -> None:
+        self.log_odds[:] = 0
+        self.occupied[:] = False
+        self.distance[:] = np.inf
+        self.gradient[:] = 0
+        self.site[:] = -1
+
+    def __flat(self, cells: np.ndarray) -> np.ndarray:
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def __update_distance(
+        self, occupied: np.ndarray, freed: np.ndarray
+    ) -> None:
+        """
+        Updates the distance field after the flat cells occupied turned
+        occupied and the flat cells freed turned free.
+        """
+        distance = self.distance.reshape(-1)
+        gradient = self.gradient.reshape(-1, 2)
+        site = self.site.reshape(-1)
+        seeds = [occupied]
+
+        if freed.shape[0] > 0:
+            # Raise: the cells whose site was freed lose their distance. They
+            # are within max_distance of the freed cells, so only that window
+            # is searched.
+            coords = self.__coords[freed]
+            pad = int(np.ceil(self.max_distance / self.resolution)) + 1
+            low = np.maximum(coords.min(axis=0) - pad, 0)
+            high = np.minimum(coords.max(axis=0) + pad + 1, self.shape)
+            cells = (slice(low[0], high[0]), slice(low[1], high[1]))
+            window = self.site[cells]
+            lost = np.isin(window, freed)
+            window[lost] = -1
+            self.distance[cells][lost] = np.inf
+            self.gradient[cells][lost] = 0
+
+            # Lower from the cells around the raised ones that kept their site
+            lost_cells = np.argwhere(lost) + low
+            around = (
+                lost_cells[:, np.newaxis, :]
+                + NEIGHBOR_OFFSETS[np.newaxis, :, :]
+            ).reshape(-1, 2)
+            around = around[
+                (around[:, 0] >= 0)
+                & (around[:, 0] < self.shape[0])
+                & (around[:, 1] >= 0)
+                & (around[:, 1] < self.shape[1])
+            ]
+            around = np.unique(self.__flat(around))
+            seeds.append(around[site[around] >= 0])
+
+        distance[occupied] = 0
+        gradient[occupied] = 0
+        site[occupied] = occupied
+
+        # Lower: waves of sites over the 8-neighborhoods, until no cell gets
+        # closer
+        frontier = np.unique(np.concatenate(seeds))
+        while frontier.shape[0] > 0:
+            cells = self.__coords[frontier]
+            sites = site[frontier]
+            candidates = (
+                cells[:, np.newaxis, :] + NEIGHBOR_OFFSETS[np.newaxis, :, :]
+            ).reshape(-1, 2)
+            sites = np.repeat(sites, NEIGHBOR_OFFSETS.shape[0])
+            inside = (
+                (candidates[:, 0] >= 0)
+                & (candidates[:, 0] < self.shape[0])
+                & (candidates[:, 1] >= 0)
+                & (candidates[:, 1] < self.shape[1])
+            )
+            candidates, sites = candidates[inside], sites[inside]
+            offsets = (candidates - self.__coords[sites]) * self.resolution
+            d = np.hypot(offsets[:, 0], offsets[:, 1])
+            flat = self.__flat(candidates)
+            closer = (d < distance[flat]) & (d <= self.max_distance)
+            flat, sites, offsets, d = (
+                flat[closer],
+                sites[closer],
+                offsets[closer],
+                d[closer],
+            )
+
+            # The closest site wins where several reach the same cell
+            order = np.argsort(-d, kind="stable")
+            flat, sites, offsets, d = (
+                flat[order],
+                sites[order],
+                offsets[order],
+                d[order],
+            )
+            distance[flat] = d
+            site[flat] = sites
+            gradient[flat] = offsets / d[:, np.newaxis]
+            frontier = np.unique(flat)
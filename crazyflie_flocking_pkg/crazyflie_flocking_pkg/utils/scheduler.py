@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Decisions of a tick of FlockingScheduler
+COMPUTE = "compute"  # Compute the commands
+UNCHANGED = "unchanged"  # No new input since the last computation, republish
+DECIMATED = "decimated"  # Not the turn of the reduced rate, republish
+STALE = "stale"  # Every input is older than the deadline, publish nothing
+DECISIONS = [COMPUTE, UNCHANGED, DECIMATED, STALE]
+
+
+@dataclass
+class SchedulerLevel:
+    neighbor_mode: str  # Neighbor mode of the FlockingEngine
+    divider: int  # The commands are computed every divider ticks
+
+
+class FlockingScheduler:
+    """
+    Deadline-aware scheduler of the ticks of the flocking node.
+
+    Every tick it decides whether to compute the commands, republish the
+    last ones or skip the tick, and it measures the cost of the computations.
+    When their smoothed cost exceeds the budget, the share of the tick
+    period they may take, it degrades one level at a time: first the grid
+    neighbor mode, then halving the rate of the computations down to
+    1 / max_divider. After recover_ticks computations well within the
+    budget it goes back one level.
+    """
+
+    def __init__(
+        self,
+        period: float,
+        neighbor_mode: str,
+        budget: float = 0.5,
+        recover_ratio: float = 0.5,
+        recover_ticks: int = 20,
+        cooldown_ticks: int = 5,
+        max_divider: int = 8,
+        smoothing: float = 0.2,
+        skip_unchanged: bool = True,
+        deadline: float = 1.0,
+    ):
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.budget = budget
+        self.recover_ratio = recover_ratio
+        self.recover_ticks = recover_ticks
+        self.cooldown_ticks = cooldown_ticks
+        self.smoothing = smoothing
+        self.skip_unchanged = skip_unchanged
+        self.deadline = deadline  # 0 never skips
+
+        self.levels: List[SchedulerLevel] = [SchedulerLevel(neighbor_mode, 1)]
+        if neighbor_mode != "grid":
+            self.levels.append(SchedulerLevel("grid", 1))
+        divider = 2
+        while divider <= max_divider:
+            self.levels.append(SchedulerLevel("grid", divider))
+            divider *= 2
+        self.level = 0
+
+        self.ticks = 0
+        self.cost = 0.0  # Smoothed cost of the computations [s]
+        self.counts: Dict[str, int] = {decision: 0 for decision in DECISIONS}
+        self.computations = 0
+        self.overruns = 0  # Computations longer than the period
+        self.changes = 0  # Level changes
+        self.__last_input = None
+        self.__since_compute = 0  # Ticks since the last computation
+        self.__since_change = 0
+        self.__calm = 0
+        self.__window_max = 0.0
+        self.__window_sum = 0.0
+        self.__window_count = 0
+
+    @property
+    def current(self) -> SchedulerLevel:
+        return self.levels[self.level]
+
+    @property
+    def load(self) -> float:
+        """
+        Smoothed share of the time spent computing at the current level.
+        """
+        return self.cost / (self.period * self.current.divider)
+
+    def decide(self, newest_input: float, now: float) -> str:
+        """
+        Decides what to do at a tick.
+
+        Args:
+            newest_input (float): Time of the newest input, e.g. state, of the tick [s].
+            now (float): Time of the tick [s], on the clock of newest_input.
+
+        Returns:
+            str: One of DECISIONS.
+        """
+        if self.deadline > 0 and now - newest_input > self.deadline:
+            decision = STALE
+        elif self.skip_unchanged and newest_input == self.__last_input:
+            decision = UNCHANGED
+        elif self.__since_compute + 1 < self.current.divider:
+            decision = DECIMATED
+        else:
+            decision = COMPUTE
+            self.__last_input = newest_input
+            self.__since_compute = -1
+        self.__since_compute += 1
+        self.ticks += 1
+        self.counts[decision] += 1
+        return decision
+
+    def record(self, duration: float) -> bool:
+        """
+        Records the cost of a computation and adapts the level.
+
+        Returns:
+            bool: Whether the level changed.
+        """
+        if self.computations == 0:
+            self.cost = duration
+        else:
+            self.cost = (
+                self.smoothing * duration + (1 - self.smoothing) * self.cost
+            )
+        self.computations += 1
+        if duration > self.period:
+            self.overruns += 1
+        self.__window_max = max(self.__window_max, duration)
+        self.__window_sum += duration
+        self.__window_count += 1
+        self.__since_change += 1
+
+        if self.load > self.budget:
+            self.__calm = 0
+            if (
+                self.level < len(self.levels) - 1
+                and self.__since_change >= self.cooldown_ticks
+            ):
+                return self.__change(+1)
+        elif self.load < self.budget * self.recover_ratio and self.level > 0:
+            self.__calm += 1
+            # The load the previous level would have with the same cost
+            previous = self.cost / (
+                self.period * self.levels[self.level - 1].divider
+            )
+            if self.__calm >= self.recover_ticks and previous < self.budget:
+                return self.__change(-1)
+        else:
+            self.__calm = 0
+        return False
+
+    def __change(self, step: int) -> bool:
+        self.level += step
+        self.changes += 1
+        self.__since_change = 0
+        self.__calm = 0
+        return True
+
+    def summary(self, reset: bool = False) -> Dict[str, float]:
+        """
+        Level, budget, costs and decisions of the ticks, the costs since the
+        last reset, in s.
+        """
+        summary = {
+            "level": self.level,
+            "neighbor_mode": self.current.neighbor_mode,
+            "divider": self.current.divider,
+            "budget": self.budget,
+            "load": self.load,
+            "cost": self.cost,
+            "cost_mean": self.__window_sum / max(self.__window_count, 1),
+            "cost_max": self.__window_max,
+            "computations": self.__window_count,
+            "overruns": self.overruns,
+            "changes": self.changes,
+            **{
+                f"ticks_{decision}": count
+                for decision, count in self.counts.items()
+            },
+        }
+        if reset:
+            self.__window_max = 0.0
+            self.__window_sum = 0.0
+            self.__window_count = 0
+        return summary
@@ -0,0 +1,174 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class SpatialHash:
+    """
+    Uniform grid neighbor index over the positions of the swarm.
+
+    The index is rebuilt once per tick with build(), then every query only
+    visits the cells adjacent to the query point, so finding all the pairs
+    within the visibility radius costs O(N log N + pairs) instead of O(N^2).
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self.positions = np.zeros((0, 3))
+        self.__cells = np.zeros((0, 3), dtype=np.int64)
+        self.__origin = np.zeros(3, dtype=np.int64)
+        self.__dims = np.ones(3, dtype=np.int64)
+        self.__order = np.zeros(0, dtype=np.int64)
+        self.__sorted_keys = np.zeros(0, dtype=np.int64)
+        self.__padding = 0
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    def build(self, positions: np.ndarray, max_radius: float = None) -> None:
+        """
+        Rebuilds the index from the (N, 3) positions of the swarm.
+
+        Args:
+            positions (np.ndarray): (N, 3) positions of the drones.
+            max_radius (float): The largest radius that will be queried, defaults to the cell size.
+        """
+        if max_radius is None:
+            max_radius = self.cell_size
+        self.__padding = int(np.ceil(max_radius / self.cell_size))
+
+        self.positions = np.asarray(positions, dtype=float)
+        cells = np.floor(self.positions / self.cell_size).astype(np.int64)
+        if len(cells) > 0:
+            self.__origin = cells.min(axis=0) - self.__padding
+            cells -= self.__origin
+            self.__dims = cells.max(axis=0) + self.__padding + 1
+        self.__cells = cells
+
+        keys = self.__keys(cells)
+        self.__order = np.argsort(keys, kind="stable")
+        self.__sorted_keys = keys[self.__order]
+
+    def query_pairs(
+        self, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds every ordered pair of distinct drones closer than radius.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: i and j indices of the pairs,
+            (P, 3) displacements positions[j] - positions[i] and (P,) distances.
+        """
+        if radius > self.__padding * self.cell_size:
+            raise ValueError("radius exceeds the max_radius of the index")
+
+        n = len(self)
+        layers = int(np.ceil(radius / self.cell_size))
+        offsets = self.__offsets(layers)
+
+        i_idx = []
+        j_idx = []
+        points = np.arange(n)
+        for offset in offsets:
+            start, counts = self.__lookup(self.__cells + offset)
+            i, j = self.__expand(points, start, counts)
+            i_idx.append(i)
+            j_idx.append(j)
+
+        i = np.concatenate(i_idx)
+        j = np.concatenate(j_idx)
+        different = i != j
+        i = i[different]
+        j = j[different]
+
+        displacement = self.positions[j] - self.positions[i]
+        distance = np.linalg.norm(displacement, axis=1)
+        visible = distance <= radius
+
+        return i[visible], j[visible], displacement[visible], distance[visible]
+
+    def query_radius(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Returns the indices of the drones closer than radius to point.
+        """
+        if radius > self.__padding * self.cell_size:
+            raise ValueError("radius exceeds the max_radius of the index")
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        cell = np.floor(np.asarray(point) / self.cell_size).astype(np.int64)
+        cell -= self.__origin
+
+        layers = int(np.ceil(radius / self.cell_size))
+        offsets = self.__offsets(layers, within_span=False)
+
+        start, counts = self.__lookup(cell + offsets)
+        _, j = self.__expand(np.arange(len(offsets)), start, counts)
+        distance = np.linalg.norm(self.positions[j] - point, axis=1)
+
+        return j[distance <= radius]
+
+    def query_knn(
+        self, k: int, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds, for every drone, its k nearest neighbors closer than radius.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N, k) indices of the neighbors, padded with -1,
+            and (N, k) distances, padded with inf.
+        """
+        i, j, _, distance = self.query_pairs(radius)
+        order = np.lexsort((distance, i))
+        i = i[order]
+        j = j[order]
+        distance = distance[order]
+
+        # Rank of each pair among the pairs of the same drone
+        first = np.searchsorted(i, i, side="left")
+        rank = np.arange(len(i)) - first
+        kept = rank < k
+
+        neighbors = np.full((len(self), k), -1, dtype=np.int64)
+        distances = np.full((len(self), k), np.inf)
+        neighbors[i[kept], rank[kept]] = j[kept]
+        distances[i[kept], rank[kept]] = distance[kept]
+
+        return neighbors, distances
+
+    def __offsets(self, layers: int, within_span: bool = True) -> np.ndarray:
+        # Between two drones, along the axes the swarm spans less than layers cells
+        # (e.g. the height of a planar swarm) the farther offsets are always empty
+        extent = np.full(3, layers)
+        if within_span:
+            extent = np.minimum(extent, self.__dims - 2 * self.__padding - 1)
+        steps = [np.arange(-s, s + 1) for s in extent]
+        return np.stack(np.meshgrid(*steps, indexing="ij"), axis=-1).reshape(
+            -1, 3
+        )
+
+    def __keys(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[..., 0] * self.__dims[1] + cells[..., 1]) * self.__dims[
+            2
+        ] + cells[..., 2]
+
+    def __lookup(self, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Cells outside the grid are empty, skipping them also avoids key aliasing
+        inside = np.all((cells >= 0) & (cells < self.__dims), axis=1)
+        keys = self.__keys(cells)
+        start = np.searchsorted(self.__sorted_keys, keys, side="left")
+        end = np.searchsorted(self.__sorted_keys, keys, side="right")
+        counts = np.where(inside, end - start, 0)
+        return start, counts
+
+    def __expand(
+        self, queries: np.ndarray, start: np.ndarray, counts: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # One (query, point) pair for every point stored in the looked-up cell
+        total = counts.sum()
+        i = np.repeat(queries, counts)
+        run_start = np.repeat(start - (np.cumsum(counts) - counts), counts)
+        j = self.__order[run_start + np.arange(total)]
+        return i, j
@@ -0,0 +1,160 @@
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Columns of a telemetry record
+TELEMETRY_FIELDS = [
+    "time",
+    "f_inter_robot_x",
+    "f_inter_robot_y",
+    "f_inter_robot_z",
+    "f_obstacle_x",
+    "f_obstacle_y",
+    "f_obstacle_z",
+    "f_migration_x",
+    "f_migration_y",
+    "f_migration_z",
+    "f_overall_x",
+    "f_overall_y",
+    "f_overall_z",
+    "v_x",
+    "v_y",
+    "v_z",
+    "omega",
+    "n_obstacles",
+]
+TELEMETRY_COLUMNS = {name: i for i, name in enumerate(TELEMETRY_FIELDS)}
+
+
+class FlockingTelemetry:
+    """
+    Preallocated ring of numeric flocking records, one row per drone.
+
+    Every control tick writes the forces, the commanded velocities and the
+    number of obstacles of the drones into the next slot of their rows, with
+    no formatting nor allocation beyond the record itself. The records are
+    read back at low rate with latest() or dumped on demand with dump().
+    """
+
+    def __init__(self, names: List[str], size: int = 100):
+        if size <= 0:
+            raise ValueError("size must be positive")
+        self.names = list(names)
+        self.indices: Dict[str, int] = {
+            name: i for i, name in enumerate(self.names)
+        }
+        self.size = size
+        n = len(self.names)
+        self.data = np.full((size, n, len(TELEMETRY_FIELDS)), np.nan)
+        self.__index = np.zeros(n, dtype=int)  # Next slot of each row
+        self.__count = np.zeros(n, dtype=int)
+        self.__rows = np.arange(n)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        (N,) number of records held for each drone.
+        """
+        return self.__count.copy()
+
+    def record(
+        self,
+        forces: np.ndarray,
+        v: np.ndarray,
+        omega: np.ndarray,
+        n_obstacles: np.ndarray,
+        rows: np.ndarray = None,
+        timestamp: float = None,
+    ) -> None:
+        """
+        Records one control tick.
+
+        Args:
+            forces (np.ndarray): (K, 3, 3) inter-robot, obstacle and migration forces, as returned by FlockingEngine.get_forces.
+            v (np.ndarray): (K, 3) linear velocities.
+            omega (np.ndarray): (K,) yaw rates.
+            n_obstacles (np.ndarray): (K,) number of detected obstacles.
+            rows (np.ndarray): The K rows written, all the drones if None.
+            timestamp (float): Time of the tick [s], the wall clock if None.
+        """
+        if rows is None:
+            rows = self.__rows
+        rows = np.atleast_1d(rows)
+        slots = self.__index[rows]
+        record = self.data[slots, rows]
+        record[:, 0] = time.time() if timestamp is None else timestamp
+        record[:, 1:10] = np.reshape(
+            np.swapaxes(np.reshape(forces, (-1, 3, 3)), 1, 2), (-1, 9)
+        )
+        record[:, 10:13] = record[:, 1:4] + record[:, 4:7] + record[:, 7:10]
+        record[:, 13:16] = np.reshape(v, (-1, 3))
+        record[:, 16] = omega
+        record[:, 17] = n_obstacles
+        self.data[slots, rows] = record
+
+        self.__index[rows] = (slots + 1) % self.size
+        self.__count[rows] = np.minimum(self.__count[rows] + 1, self.size)
+
+    def record_agent(
+        self,
+        name: str,
+        forces: np.ndarray,
+        v: np.ndarray,
+        omega: float,
+        n_obstacles: int,
+        timestamp: float = None,
+    ) -> None:
+        """
+        Records the tick of a single Agent, forces being the (3, 3) matrix of
+        ForcesGenerator.get_forces.
+        """
+        self.record(
+            np.reshape(forces, (1, 3, 3)),
+            v,
+            omega,
+            n_obstacles,
+            self.indices[name],
+            timestamp,
+        )
+
+    def latest(self) -> np.ndarray:
+        """
+        (N, F) last record of each drone, NaN for the drones with no record.
+        """
+        return self.data[(self.__index - 1) % self.size, self.__rows]
+
+    def history(self) -> np.ndarray:
+        """
+        (size, N, F) records of each drone from the oldest to the latest,
+        the slots not written yet being NaN at the beginning.
+        """
+        order = (
+            self.__index[np.newaxis, :] + np.arange(self.size)[:, np.newaxis]
+        ) % self.size
+        return self.data[order, self.__rows]
+
+    def clear(self) -> None:
+        self.data[:] = np.nan
+        self.__index[:] = 0
+        self.__count[:] = 0
+
+    def dump(self, path: str) -> str:
+        """
+        Saves the history, the drone names and the fields in a .npz file.
+
+        Returns:
+            str: The path of the saved file.
+        """
+        if not path.endswith(".npz"):
+            path += ".npz"
+        np.savez(
+            path,
+            history=self.history(),
+            names=np.array(self.names),
+            fields=np.array(TELEMETRY_FIELDS),
+        )
+        return path
@@ -12,6 +12,7 @@ setup(
     package_dir={
         "": "."
     },  # Tell setuptools that packages are under current dir
+    package_data={package_name: ["benchmarks/baseline.json"]},
     data_files=[
         (
             "share/ament_index/resource_index/packages",
@@ -34,6 +35,9 @@ setup(
     entry_points={
         "console_scripts": [
             f"crazyflie_flocking_exec = {package_name}.nodes.crazyflie_flocking_node:main",
+            f"crazyflie_flocking_bench_neighbors = {package_name}.benchmarks.neighbors:main",
+            f"crazyflie_flocking_bench = {package_name}.benchmarks.suite:main",
+            f"crazyflie_flocking_replay = {package_name}.replay:main",
         ],
     },
 )
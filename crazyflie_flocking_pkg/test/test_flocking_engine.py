@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from crazyflie_flocking_pkg.agent import Agent
+from crazyflie_flocking_pkg.flocking_engine import (
+    FlockingEngine,
+    stack_swarm_state,
+)
+from crazyflie_flocking_pkg.utils.configuration import (
+    FlockingConfig,
+    default_config_path,
+)
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+from crazyflie_swarm_pkg.utils.utils import load_config
+
+
+def random_swarm(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return {
+        f"cf{i}": CrazyState(
+            *rng.uniform(-2.0, 2.0, 3),
+            *rng.uniform(-10.0, 10.0, 2),
+            rng.uniform(-180.0, 180.0),
+            *np.zeros(6),
+            *rng.uniform(0.2, 3.0, 5),
+        )
+        for i in range(n)
+    }
+
+
+@pytest.mark.parametrize("neighbor_mode", ["dense", "grid"])
+@pytest.mark.parametrize("is_omnidirectional", [False, True])
+def test_engine_matches_agent(neighbor_mode, is_omnidirectional):
+    config = load_config(default_config_path(), FlockingConfig)
+    swarm_state = random_swarm(12)
+    names = list(swarm_state.keys())
+
+    engine = FlockingEngine(config)
+    engine.neighbor_mode = neighbor_mode
+    v, omega = engine.compute_velocities(
+        *stack_swarm_state(swarm_state, names),
+        is_omnidirectional=is_omnidirectional,
+    )
+
+    for i, name in enumerate(names):
+        agent_v, agent_omega = Agent(name, config).compute_velocities(
+            swarm_state, is_omnidirectional
+        )
+        np.testing.assert_allclose(v[i], np.ravel(agent_v), atol=1e-9)
+        np.testing.assert_allclose(omega[i], agent_omega, atol=1e-9)
+
+
+def test_inactive_drones_hover_and_are_not_neighbors():
+    config = load_config(default_config_path(), FlockingConfig)
+    positions, yaws, ranges = stack_swarm_state(
+        random_swarm(6, seed=1), [f"cf{i}" for i in range(6)]
+    )
+    active = np.array([True, True, True, True, True, False])
+
+    engine = FlockingEngine(config)
+    v, omega = engine.compute_velocities(positions, yaws, active=active)
+    reference_v, reference_omega = engine.compute_velocities(
+        positions[:5], yaws[:5]
+    )
+
+    assert not v[5].any() and omega[5] == 0.0
+    np.testing.assert_allclose(v[:5], reference_v)
+    np.testing.assert_allclose(omega[:5], reference_omega)
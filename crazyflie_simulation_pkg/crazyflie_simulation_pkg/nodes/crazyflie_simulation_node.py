@@ -1,3 +1,4 @@
+import math
 from typing import Any, Dict
 
 import rclpy
@@ -9,8 +10,12 @@ from std_msgs.msg import Float32
 from std_srvs.srv import Empty
 
 from crazyflie_simulation_pkg.utils import SwarmConfig, load_config
-from crazyflie_swarm_interfaces.msg import CrazyflieState
+from crazyflie_swarm_interfaces.msg import CrazyflieState, SwarmState
 from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+from crazyflie_swarm_pkg.crazyflie.swarm_state_msg import (
+    arrays_to_swarm_state_msg,
+    states_to_arrays,
+)
 
 
 class CrazyflieSimulation(Node):
@@ -49,23 +54,33 @@ class CrazyflieSimulation(Node):
         velocity_publisher_rate = self.config.velocity_publisher_rate
         for name in self.swarm:
             publisher = self.create_publisher(Twist, f"/gz/{name}/cmd_vel", 10)
+            callback = self.publisher_velocity_callback
             self.create_timer(
                 1 / velocity_publisher_rate,
-                lambda name=name, publisher=publisher: self.publisher_velocity_callback(
+                lambda name=name, publisher=publisher: callback(
                     name, publisher
                 ),
             )
 
         state_publisher_rate = self.config.state_publisher_rate
-        for name in self.swarm:
-            publisher = self.create_publisher(
-                CrazyflieState, f"/{name}/state", 10
+        if self.config.drone_states:
+            for name in self.swarm:
+                publisher = self.create_publisher(
+                    CrazyflieState, f"/{name}/state", 10
+                )
+                self.create_timer(
+                    1 / state_publisher_rate,
+                    lambda name=name, publisher=publisher: self.state_callback(
+                        name, publisher
+                    ),
+                )
+
+        if self.config.swarm_state_topic:
+            self.swarm_state_publisher = self.create_publisher(
+                SwarmState, self.config.swarm_state_topic, 10
             )
             self.create_timer(
-                1 / state_publisher_rate,
-                lambda name=name, publisher=publisher: self.state_callback(
-                    name, publisher
-                ),
+                1 / state_publisher_rate, self.swarm_state_callback
             )
 
         # * Subscriptions
@@ -129,9 +144,15 @@ class CrazyflieSimulation(Node):
         state.roll = self.current_odoms[name].pose.pose.orientation.x
         state.pitch = self.current_odoms[name].pose.pose.orientation.y
         state.yaw = self.current_odoms[name].pose.pose.orientation.z
-        state.vx = self.current_odoms[name].twist.twist.linear.x
-        state.vy = self.current_odoms[name].twist.twist.linear.y
-        state.vz = self.current_odoms[name].twist.twist.linear.z
+        # The odometry twist is in the body frame, the state in the world one
+        q = self.current_odoms[name].pose.pose.orientation
+        yaw = math.atan2(
+            2 * (q.w * q.z + q.x * q.y), 1 - 2 * (q.y**2 + q.z**2)
+        )
+        linear = self.current_odoms[name].twist.twist.linear
+        state.vx = math.cos(yaw) * linear.x - math.sin(yaw) * linear.y
+        state.vy = math.sin(yaw) * linear.x + math.cos(yaw) * linear.y
+        state.vz = linear.z
         state.roll_rate = self.current_odoms[name].twist.twist.angular.x
         state.pitch_rate = self.current_odoms[name].twist.twist.angular.y
         state.yaw_rate = self.current_odoms[name].twist.twist.angular.z
@@ -169,6 +190,15 @@ class CrazyflieSimulation(Node):
 
         publisher.publish(state_msg)
 
+    def swarm_state_callback(self) -> None:
+        states = [self.current_states[name] for name in self.swarm]
+        swarm_state_msg = arrays_to_swarm_state_msg(
+            self.swarm, [""] * len(self.swarm), states_to_arrays(states)
+        )
+        swarm_state_msg.header.stamp = self.get_clock().now().to_msg()
+        swarm_state_msg.header.frame_id = "world"
+        self.swarm_state_publisher.publish(swarm_state_msg)
+
     def subscriber_velocity_callback(self, msg: Twist, name: str) -> None:
         self.current_twist_commands[name] = msg
 
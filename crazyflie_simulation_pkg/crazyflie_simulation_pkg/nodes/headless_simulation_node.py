@@ -0,0 +1,182 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import rclpy
+from geometry_msgs.msg import Twist
+from nav_msgs.msg import Odometry
+from rclpy.node import Node, Publisher
+from sensor_msgs.msg import LaserScan
+
+from crazyflie_simulation_pkg.simulator import (
+    MultirangerSimulator,
+    ObstacleWorld,
+    SwarmSimulator,
+)
+from crazyflie_simulation_pkg.utils import SwarmConfig, load_config
+
+# Multiranger LaserScan of the Gazebo models: back, right, front, left
+SCAN_ANGLE_MIN = -3.14
+SCAN_ANGLE_MAX = 1.57
+SCAN_SAMPLES = 4
+SCAN_TO_MULTIRANGER = [2, 1, 0, 3]  # Multiranger columns of the scan ranges
+
+
+def initial_positions(crazyflies, spacing: float) -> np.ndarray:
+    """
+    Initial positions of the drones: the configured ones, the others on a
+    square grid with the given spacing.
+    """
+    n = len(crazyflies)
+    side = int(np.ceil(np.sqrt(max(n, 1))))
+    positions = np.zeros((n, 3))
+    for i, crazyflie_config in enumerate(crazyflies):
+        position = crazyflie_config.initial_position
+        if position is not None:
+            positions[i] = (position.x, position.y, position.z)
+        else:
+            positions[i] = (spacing * (i % side), spacing * (i // side), 0.0)
+    return positions
+
+
+class HeadlessSimulation(Node):
+    """
+    Gazebo stand-in: integrates the /gz/{name}/cmd_vel commands emitted by
+    CrazyflieSimulation for the whole swarm in one NumPy step and publishes
+    the same /{name}/odom and /{name}/multiranger topics as the Gazebo bridge.
+    """
+
+    def __init__(self):
+        super().__init__("headless_simulation_node")
+
+        # * Load Config
+        self.declare_parameter("swarm_config_path", "")
+        swarm_config_path = (
+            self.get_parameter("swarm_config_path")
+            .get_parameter_value()
+            .string_value
+        )
+        self.config = load_config(swarm_config_path, SwarmConfig)
+        simulator_config = self.config.simulator
+
+        # * Simulator
+        crazyflies = [cf for cf in self.config.crazyflies if cf.active]
+        self.names: List[str] = [cf.name for cf in crazyflies]
+        self.simulator = SwarmSimulator(
+            initial_positions(crazyflies, simulator_config.spawn_spacing),
+            simulator_config,
+        )
+
+        world = ObstacleWorld()
+        if simulator_config.world_file:
+            world_file = os.path.join(
+                os.path.dirname(swarm_config_path), simulator_config.world_file
+            )
+            world = ObstacleWorld.from_file(world_file)
+        self.multiranger = MultirangerSimulator(
+            world, simulator_config.multiranger
+        )
+        self.get_logger().info(
+            f"HeadlessSimulationNode started with {len(self.names)} drones "
+            + f"and {len(world)} obstacles"
+        )
+
+        # * Subscriptions
+        for i, name in enumerate(self.names):
+            self.create_subscription(
+                Twist,
+                f"/gz/{name}/cmd_vel",
+                lambda msg, i=i: self.cmd_vel_callback(msg, i),
+                10,
+            )
+
+        # * Publishers
+        self.odom_publishers: Dict[str, Publisher] = {}
+        self.multiranger_publishers: Dict[str, Publisher] = {}
+        for name in self.names:
+            self.odom_publishers[name] = self.create_publisher(
+                Odometry, f"/{name}/odom", 10
+            )
+            self.multiranger_publishers[name] = self.create_publisher(
+                LaserScan, f"/{name}/multiranger", 10
+            )
+
+        # * Timers
+        self.dt = 1 / simulator_config.rate
+        self.create_timer(self.dt, self.step_callback)
+        self.create_timer(1 / simulator_config.odom_rate, self.odom_callback)
+        self.create_timer(
+            1 / simulator_config.multiranger_rate, self.multiranger_callback
+        )
+
+    def cmd_vel_callback(self, msg: Twist, i: int) -> None:
+        self.simulator.set_command(
+            i, msg.linear.x, msg.linear.y, msg.linear.z, msg.angular.z
+        )
+
+    def step_callback(self) -> None:
+        self.simulator.step(self.dt)
+
+    def odom_callback(self) -> None:
+        stamp = self.get_clock().now().to_msg()
+        positions = self.simulator.positions.tolist()
+        orientations = self.simulator.orientations().tolist()
+        velocities = self.simulator.body_velocities().tolist()
+        yaw_rates = self.simulator.yaw_rates.tolist()
+
+        for i, name in enumerate(self.names):
+            msg = Odometry()
+            msg.header.stamp = stamp
+            msg.header.frame_id = "world"
+            msg.child_frame_id = f"{name}/odom"
+            pose = msg.pose.pose
+            pose.position.x, pose.position.y, pose.position.z = positions[i]
+            (
+                pose.orientation.x,
+                pose.orientation.y,
+                pose.orientation.z,
+                pose.orientation.w,
+            ) = orientations[i]
+            twist = msg.twist.twist
+            twist.linear.x, twist.linear.y, twist.linear.z = velocities[i]
+            twist.angular.z = yaw_rates[i]
+            self.odom_publishers[name].publish(msg)
+
+    def compute_ranges(self) -> np.ndarray:
+        """
+        (N, 4) multiranger ranges in the LaserScan order: back, right, front, left.
+        """
+        ranges = self.multiranger.cast(
+            self.simulator.positions, self.simulator.yaws
+        )
+        return ranges[:, SCAN_TO_MULTIRANGER]
+
+    def multiranger_callback(self) -> None:
+        stamp = self.get_clock().now().to_msg()
+        ranges = self.compute_ranges().tolist()
+        multiranger_config = self.config.simulator.multiranger
+        for i, name in enumerate(self.names):
+            msg = LaserScan()
+            msg.header.stamp = stamp
+            msg.header.frame_id = f"{name}/base_link"
+            msg.angle_min = SCAN_ANGLE_MIN
+            msg.angle_max = SCAN_ANGLE_MAX
+            msg.angle_increment = (SCAN_ANGLE_MAX - SCAN_ANGLE_MIN) / (
+                SCAN_SAMPLES - 1
+            )
+            msg.range_min = multiranger_config.min_range
+            msg.range_max = multiranger_config.max_range
+            msg.ranges = ranges[i]
+            self.multiranger_publishers[name].publish(msg)
+
+
+def main(args: Any = None) -> None:
+    rclpy.init(args=args)
+    headless_simulation_node = HeadlessSimulation()
+    rclpy.spin(headless_simulation_node)
+    headless_simulation_node.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+from .multiranger import MultirangerSimulator, ObstacleWorld
+from .swarm_simulator import SwarmSimulator
+
+__all__ = [MultirangerSimulator, ObstacleWorld, SwarmSimulator]
@@ -0,0 +1,253 @@
+from typing import List
+
+import numpy as np
+
+from crazyflie_simulation_pkg.utils.configuration import (
+    MultirangerConfig,
+    WorldConfig,
+)
+from crazyflie_simulation_pkg.utils.utils import load_config
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import (
+    MULTIRANGER_BEAMS,
+    MULTIRANGER_FIELDS,
+    CrazyState,
+    rotation_matrices,
+)
+
+
+class ObstacleWorld:
+    """
+    Static world of boxes (yawed), vertical cylinders and walls, stored as
+    arrays so that all the rays can be cast against all the obstacles at once.
+    Walls are boxes spanning their start and end points.
+    """
+
+    def __init__(self, config: WorldConfig = None):
+        if config is None:
+            config = WorldConfig()
+
+        boxes = [(box.center, box.size, box.yaw) for box in config.boxes]
+        for wall in config.walls:
+            start = np.asarray(wall.start, dtype=float)
+            end = np.asarray(wall.end, dtype=float)
+            center = (start + end) / 2
+            delta = end - start
+            boxes.append(
+                (
+                    [center[0], center[1], wall.base + wall.height / 2],
+                    [np.linalg.norm(delta), wall.thickness, wall.height],
+                    np.arctan2(delta[1], delta[0]),
+                )
+            )
+        self.box_centers = np.array(
+            [b[0] for b in boxes], dtype=float
+        ).reshape(-1, 3)
+        self.box_half_sizes = (
+            np.array([b[1] for b in boxes], dtype=float).reshape(-1, 3) / 2
+        )
+        box_yaws = np.array([b[2] for b in boxes], dtype=float)
+        self.box_cos = np.cos(box_yaws)
+        self.box_sin = np.sin(box_yaws)
+
+        self.cylinder_centers = np.array(
+            [c.center for c in config.cylinders], dtype=float
+        ).reshape(-1, 3)
+        self.cylinder_radii = np.array(
+            [c.radius for c in config.cylinders], dtype=float
+        )
+        self.cylinder_half_heights = (
+            np.array([c.height for c in config.cylinders], dtype=float) / 2
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "ObstacleWorld":
+        return cls(load_config(path, WorldConfig))
+
+    def __len__(self) -> int:
+        return len(self.box_centers) + len(self.cylinder_centers)
+
+    def intersect(
+        self, origins: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        """
+        Distance along each ray to the closest obstacle, inf if none is hit.
+        A ray starting inside an obstacle has distance 0.
+
+        Args:
+            origins (np.ndarray): (R, 3) ray origins.
+            directions (np.ndarray): (R, 3) unit ray directions.
+
+        Returns:
+            np.ndarray: (R,) distances.
+        """
+        distances = np.full(origins.shape[0], np.inf)
+        if len(self.box_centers) > 0:
+            distances = np.minimum(
+                distances, self.__intersect_boxes(origins, directions)
+            )
+        if len(self.cylinder_centers) > 0:
+            distances = np.minimum(
+                distances, self.__intersect_cylinders(origins, directions)
+            )
+        return distances
+
+    def __intersect_boxes(
+        self, origins: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        # Rays in the frame of each box: (R, B, 3)
+        relative = (
+            origins[:, np.newaxis, :] - self.box_centers[np.newaxis, :, :]
+        )
+        cos, sin = self.box_cos, self.box_sin
+        o = np.empty_like(relative)
+        o[..., 0] = cos * relative[..., 0] + sin * relative[..., 1]
+        o[..., 1] = -sin * relative[..., 0] + cos * relative[..., 1]
+        o[..., 2] = relative[..., 2]
+        d = np.empty_like(relative)
+        d[..., 0] = (
+            cos * directions[:, np.newaxis, 0]
+            + sin * directions[:, np.newaxis, 1]
+        )
+        d[..., 1] = (
+            -sin * directions[:, np.newaxis, 0]
+            + cos * directions[:, np.newaxis, 1]
+        )
+        d[..., 2] = directions[:, np.newaxis, 2]
+
+        # Slab test
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse = 1.0 / d
+            t1 = (-self.box_half_sizes - o) * inverse
+            t2 = (self.box_half_sizes - o) * inverse
+        # Rays parallel to a slab: inside it for every t, or never
+        parallel = d == 0
+        inside = np.abs(o) <= self.box_half_sizes
+        t_min = np.where(
+            parallel, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2)
+        )
+        t_max = np.where(
+            parallel, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2)
+        )
+        t_near = t_min.max(axis=2)
+        t_far = t_max.min(axis=2)
+
+        hit = (t_near <= t_far) & (t_far >= 0)
+        return np.where(hit, np.maximum(t_near, 0.0), np.inf).min(axis=1)
+
+    def __intersect_cylinders(
+        self, origins: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        # Horizontal circle: |o + t d - c|^2 = r^2 in the xy plane, (R, C)
+        o = origins[:, np.newaxis, :] - self.cylinder_centers[np.newaxis, :, :]
+        dx = directions[:, np.newaxis, 0]
+        dy = directions[:, np.newaxis, 1]
+        a = dx**2 + dy**2
+        b = 2 * (o[..., 0] * dx + o[..., 1] * dy)
+        c = o[..., 0] ** 2 + o[..., 1] ** 2 - self.cylinder_radii**2
+        discriminant = b**2 - 4 * a * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            root = np.sqrt(np.maximum(discriminant, 0.0))
+            t_circle_min = (-b - root) / (2 * a)
+            t_circle_max = (-b + root) / (2 * a)
+        vertical = a == 0
+        t_circle_min = np.where(
+            vertical, np.where(c <= 0, -np.inf, np.inf), t_circle_min
+        )
+        t_circle_max = np.where(
+            vertical, np.where(c <= 0, np.inf, -np.inf), t_circle_max
+        )
+        missed = ~vertical & (discriminant < 0)
+
+        # Vertical extent
+        dz = directions[:, np.newaxis, 2]
+        half = self.cylinder_half_heights
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1 = (-half - o[..., 2]) / dz
+            t2 = (half - o[..., 2]) / dz
+        inside_z = np.abs(o[..., 2]) <= half
+        flat = dz == 0
+        t_z_min = np.where(
+            flat, np.where(inside_z, -np.inf, np.inf), np.minimum(t1, t2)
+        )
+        t_z_max = np.where(
+            flat, np.where(inside_z, np.inf, -np.inf), np.maximum(t1, t2)
+        )
+
+        t_near = np.maximum(t_circle_min, t_z_min)
+        t_far = np.minimum(t_circle_max, t_z_max)
+        hit = ~missed & (t_near <= t_far) & (t_far >= 0)
+        return np.where(hit, np.maximum(t_near, 0.0), np.inf).min(axis=1)
+
+
+class MultirangerSimulator:
+    """
+    Batched multiranger: casts the five beams of every drone against an
+    ObstacleWorld in one vectorized pass, with optional Gaussian noise and
+    clipping of the readings to the sensor range.
+    """
+
+    def __init__(self, world: ObstacleWorld, config: MultirangerConfig = None):
+        self.world = world
+        self.config = config if config is not None else MultirangerConfig()
+        self.rng = np.random.default_rng(self.config.seed)
+
+    def cast(
+        self,
+        positions: np.ndarray,
+        yaws: np.ndarray,
+        rolls: np.ndarray = None,
+        pitches: np.ndarray = None,
+    ) -> np.ndarray:
+        """
+        Computes the multiranger readings of N drones.
+
+        Args:
+            positions (np.ndarray): (N, 3) positions of the drones.
+            yaws (np.ndarray): (N,) yaws of the drones [rad].
+            rolls (np.ndarray): (N,) rolls of the drones [rad], zero if None.
+            pitches (np.ndarray): (N,) pitches of the drones [rad], zero if None.
+
+        Returns:
+            np.ndarray: (N, 5) ranges, front, right, back, left and up as in CrazyState.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        n = positions.shape[0]
+        rotations = rotation_matrices(
+            np.zeros(n) if rolls is None else rolls,
+            np.zeros(n) if pitches is None else pitches,
+            np.asarray(yaws, dtype=float),
+        )
+        # (N, 5, 3) beams in the world frame
+        directions = np.einsum("nij,bj->nbi", rotations, MULTIRANGER_BEAMS)
+        origins = np.repeat(positions, len(MULTIRANGER_BEAMS), axis=0)
+        ranges = self.world.intersect(origins, directions.reshape(-1, 3))
+        ranges = ranges.reshape(n, len(MULTIRANGER_BEAMS))
+
+        config = self.config
+        if config.noise_std > 0:
+            ranges = ranges + self.rng.normal(
+                0.0, config.noise_std, ranges.shape
+            )
+        ranges = np.maximum(ranges, config.min_range)
+        out_of_range = ranges > config.max_range
+        ranges[out_of_range] = (
+            config.max_range if config.clip_to_max_range else np.inf
+        )
+        return ranges
+
+    def cast_states(self, states: List[CrazyState]) -> np.ndarray:
+        """
+        Computes the multiranger readings of the drones from their states
+        (attitude in degrees) and writes them into their mr_* fields.
+        """
+        positions = np.array([(s.x, s.y, s.z) for s in states], dtype=float)
+        attitudes = np.deg2rad(
+            np.array([(s.roll, s.pitch, s.yaw) for s in states], dtype=float)
+        ).reshape(-1, 3)
+        ranges = self.cast(
+            positions, attitudes[:, 2], attitudes[:, 0], attitudes[:, 1]
+        )
+        for state, values in zip(states, ranges.tolist()):
+            for state_field, value in zip(MULTIRANGER_FIELDS, values):
+                setattr(state, state_field, value)
+        return ranges
@@ -0,0 +1,96 @@
+import numpy as np
+
+from crazyflie_simulation_pkg.utils.configuration import SimulatorConfig
+
+
+class SwarmSimulator:
+    """
+    Kinematic simulator of N Crazyflies, stepped in one NumPy pass for the
+    whole swarm.
+
+    Each drone tracks its last velocity command (vx, vy, vz, yaw_rate) with a
+    first-order lag, as the velocity controller of the Gazebo models does.
+    Linear commands are in the body frame (rotated by the yaw) when
+    body_frame_commands is set, else in the world frame. Drones cannot go
+    below the ground.
+    """
+
+    def __init__(
+        self, initial_positions: np.ndarray, config: SimulatorConfig = None
+    ):
+        self.config = config if config is not None else SimulatorConfig()
+        initial_positions = np.asarray(initial_positions, dtype=float)
+        initial_positions = initial_positions.reshape(-1, 3)
+        self.n = initial_positions.shape[0]
+
+        self.positions = initial_positions.copy()  # World frame [m]
+        self.yaws = np.zeros(self.n)  # [rad]
+        self.velocities = np.zeros((self.n, 3))  # World frame [m/s]
+        self.yaw_rates = np.zeros(self.n)  # [rad/s]
+        self.commands = np.zeros((self.n, 4))  # vx, vy, vz, yaw_rate
+        self.time = 0.0
+
+    def set_command(
+        self, i: int, vx: float, vy: float, vz: float, yaw_rate: float
+    ) -> None:
+        self.commands[i] = (vx, vy, vz, yaw_rate)
+
+    def step(self, dt: float) -> None:
+        config = self.config
+        cos_yaw = np.cos(self.yaws)
+        sin_yaw = np.sin(self.yaws)
+
+        # Commanded velocities in the world frame
+        target = self.commands[:, :3].copy()
+        if config.body_frame_commands:
+            vx, vy = self.commands[:, 0], self.commands[:, 1]
+            target[:, 0] = cos_yaw * vx - sin_yaw * vy
+            target[:, 1] = sin_yaw * vx + cos_yaw * vy
+        speed = np.linalg.norm(target, axis=1)
+        too_fast = speed > config.max_velocity
+        target[too_fast] *= (config.max_velocity / speed[too_fast])[
+            :, np.newaxis
+        ]
+        target_yaw_rates = np.clip(
+            self.commands[:, 3], -config.max_yaw_rate, config.max_yaw_rate
+        )
+
+        # First-order response of the velocity controller
+        alpha = 1.0
+        if config.time_constant > 0:
+            alpha = min(dt / config.time_constant, 1.0)
+        self.velocities += alpha * (target - self.velocities)
+        self.yaw_rates += alpha * (target_yaw_rates - self.yaw_rates)
+
+        self.positions += self.velocities * dt
+        self.yaws = np.angle(np.exp(1j * (self.yaws + self.yaw_rates * dt)))
+
+        # Ground
+        grounded = self.positions[:, 2] <= 0.0
+        self.positions[grounded, 2] = 0.0
+        self.velocities[grounded, 2] = np.maximum(
+            self.velocities[grounded, 2], 0.0
+        )
+
+        self.time += dt
+
+    def orientations(self) -> np.ndarray:
+        """
+        Orientation of the drones as (N, 4) quaternions (x, y, z, w), yaw only.
+        """
+        quaternions = np.zeros((self.n, 4))
+        quaternions[:, 2] = np.sin(self.yaws / 2)
+        quaternions[:, 3] = np.cos(self.yaws / 2)
+        return quaternions
+
+    def body_velocities(self) -> np.ndarray:
+        """
+        Linear velocities of the drones in their body frame, as in the Gazebo odometry.
+        """
+        cos_yaw = np.cos(self.yaws)
+        sin_yaw = np.sin(self.yaws)
+        vx, vy = self.velocities[:, 0], self.velocities[:, 1]
+        velocities = self.velocities.copy()
+        velocities[:, 0] = cos_yaw * vx + sin_yaw * vy
+        velocities[:, 1] = -sin_yaw * vx + cos_yaw * vy
+        return velocities
@@ -1,4 +1,18 @@
-from .configuration import CrazyflieConfig, SwarmConfig
+from .configuration import (
+    CrazyflieConfig,
+    MultirangerConfig,
+    SimulatorConfig,
+    SwarmConfig,
+    WorldConfig,
+)
 from .utils import load_config, log
 
-__all__ = [log, load_config, CrazyflieConfig, SwarmConfig]
+__all__ = [
+    log,
+    load_config,
+    CrazyflieConfig,
+    MultirangerConfig,
+    SimulatorConfig,
+    SwarmConfig,
+    WorldConfig,
+]
@@ -1,14 +1,14 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 
 from omegaconf import MISSING
 
 
 @dataclass
 class Position:
-    x: float
-    y: float
-    z: float
+    x: float = 0.0
+    y: float = 0.0
+    z: float = 0.0
 
 
 @dataclass
@@ -16,14 +16,71 @@ class CrazyflieConfig:
     active: bool = False
     name: str = MISSING
     incoming_twist_topic: str = MISSING
+    initial_position: Optional[Position] = None  # Headless simulator only
+
+
+@dataclass
+class MultirangerConfig:
+    min_range: float = 0.01  # [m]
+    max_range: float = 3.49  # [m]
+    clip_to_max_range: bool = True  # Readings beyond max_range are max_range, else inf
+    noise_std: float = 0.0  # Standard deviation of the Gaussian noise [m]
+    seed: Optional[int] = None  # Noise seed, None for a random one
+
+
+@dataclass
+class BoxConfig:
+    center: List[float] = field(default_factory=lambda: [0.0, 0.0, 0.0])
+    size: List[float] = field(default_factory=lambda: [1.0, 1.0, 1.0])
+    yaw: float = 0.0  # [rad]
+
+
+@dataclass
+class CylinderConfig:
+    center: List[float] = field(default_factory=lambda: [0.0, 0.0, 0.0])
+    radius: float = 0.5
+    height: float = 1.0
+
+
+@dataclass
+class WallConfig:
+    start: List[float] = field(default_factory=lambda: [0.0, 0.0])  # x, y
+    end: List[float] = field(default_factory=lambda: [1.0, 0.0])  # x, y
+    height: float = 2.0
+    thickness: float = 0.1
+    base: float = 0.0  # z of the bottom of the wall
+
+
+@dataclass
+class WorldConfig:
+    boxes: List[BoxConfig] = field(default_factory=list)
+    cylinders: List[CylinderConfig] = field(default_factory=list)
+    walls: List[WallConfig] = field(default_factory=list)
+
+
+@dataclass
+class SimulatorConfig:
+    rate: float = 100.0  # Integration rate [Hz]
+    odom_rate: float = 50.0  # /{name}/odom publish rate [Hz]
+    multiranger_rate: float = 20.0  # /{name}/multiranger publish rate [Hz]
+    time_constant: float = 0.1  # First-order response of the velocity controller [s]
+    max_velocity: float = 1.0  # [m/s]
+    max_yaw_rate: float = 2.0  # [rad/s]
+    body_frame_commands: bool = True  # cmd_vel linear velocity in the body frame, as in Gazebo
+    spawn_spacing: float = 1.0  # Grid spacing of the drones without initial_position [m]
+    world_file: str = ""  # Obstacles, relative to the config directory, "" for none
+    multiranger: MultirangerConfig = field(default_factory=MultirangerConfig)
 
 
 @dataclass
 class SwarmConfig:
     state_publisher_rate: float = field(default=10.0)
     velocity_publisher_rate: float = field(default=1.0)
+    swarm_state_topic: str = field(default="/swarm/state")  # "" disables it
+    drone_states: bool = field(default=True)  # Also publish /{name}/state
     max_ang_z_rate: float = field(default=0.4)
     height: float = field(default=0.5)
+    simulator: SimulatorConfig = field(default_factory=SimulatorConfig)
     crazyflies: List[CrazyflieConfig] = field(
         default_factory=list[CrazyflieConfig]
     )
@@ -0,0 +1,31 @@
+import os
+
+from ament_index_python.packages import get_package_share_directory
+from launch import LaunchDescription
+from launch_ros.actions import Node
+
+
+def generate_launch_description():
+    # Same topics as crazyflie_simulation.launch.py, without Gazebo and the bridge
+    root = get_package_share_directory("crazyflie_simulation_pkg")
+    swarm_config_path = os.path.join(root, "config/config.yaml")
+
+    headless_sim = Node(
+        package="crazyflie_simulation_pkg",
+        executable="headless_simulation_exec",
+        output="screen",
+        parameters=[
+            {"swarm_config_path": swarm_config_path},
+        ],
+    )
+
+    cf_sim = Node(
+        package="crazyflie_simulation_pkg",
+        executable="crazyflie_simulation_exec",
+        output="screen",
+        parameters=[
+            {"swarm_config_path": swarm_config_path},
+        ],
+    )
+
+    return LaunchDescription([headless_sim, cf_sim])
@@ -60,6 +60,7 @@ setup(
     entry_points={
         "console_scripts": [
             "crazyflie_simulation_exec = crazyflie_simulation_pkg.nodes.crazyflie_simulation_node:main",
+            "headless_simulation_exec = crazyflie_simulation_pkg.nodes.headless_simulation_node:main",
         ],
     },
 )
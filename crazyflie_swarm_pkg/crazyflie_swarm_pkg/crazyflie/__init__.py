@@ -1,4 +1,40 @@
-from .crazyflie_robot import CrazyflieRobot
-from .crazyflie_state import CrazyState
+from importlib import import_module
 
-__all__ = [CrazyState, CrazyflieRobot]
+from .crazyflie_state import (
+    CrazyState,
+    multiranger_to_world,
+    rotation_matrices,
+)
+from .state_buffer import StateBuffer, StateSample
+from .swarm_state_store import CrazyStateProxy, SwarmStateStore
+
+# Exports that need cflib, imported on first access so that the states can
+# be used without it, e.g. by the offline replay of the flocking package
+CFLIB_EXPORTS = {
+    "CrazyflieRobot": ".crazyflie_robot",
+    "BringUpReport": ".swarm_bringup",
+    "bring_up_swarm": ".swarm_bringup",
+    "release_robot": ".swarm_bringup",
+    "ShardedSwarm": ".swarm_shards",
+    "SwarmBroadcaster": ".broadcaster",
+    "SetpointStreamer": ".setpoint_streamer",
+    "StreamerStats": ".setpoint_streamer",
+}
+
+
+def __getattr__(name: str):
+    if name in CFLIB_EXPORTS:
+        return getattr(import_module(CFLIB_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "CrazyState",
+    "multiranger_to_world",
+    "rotation_matrices",
+    "StateBuffer",
+    "StateSample",
+    "CrazyStateProxy",
+    "SwarmStateStore",
+    *CFLIB_EXPORTS,
+]
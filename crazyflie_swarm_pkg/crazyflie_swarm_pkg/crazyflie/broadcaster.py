@@ -0,0 +1,195 @@
+import re
+import struct
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cflib.crtp as crtp
+from cflib.crtp.crtpstack import CRTPPacket, CRTPPort
+
+from crazyflie_swarm_pkg.crazyflie.crazyflie_robot import CrazyflieRobot
+from crazyflie_swarm_pkg.utils import BroadcastConfig, log
+
+# Generic commander setpoint types, as in cflib.crazyflie.commander
+TYPE_STOP = 0
+TYPE_VELOCITY_WORLD = 1
+TYPE_HOVER = 5
+
+RADIO_URI = re.compile(
+    r"^radio://([^/]+)/(\d+)/(250K|1M|2M)(?:/[0-9a-fA-F]+)?"
+)
+
+
+def parse_radio_uri(uri: str) -> Optional[Tuple[str, int, str]]:
+    """
+    Extracts Crazyradio, channel and datarate from a radio:// URI.
+
+    Returns:
+        Optional[Tuple[str, int, str]]: (radio, channel, datarate), None if the URI is not a radio link.
+    """
+    match = RADIO_URI.match(uri)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2)), match.group(3)
+
+
+def broadcast_uri(radio: str, channel: int, datarate: str) -> str:
+    return f"radiobroadcast://{radio}/{channel}/{datarate}"
+
+
+def setpoint_packet(setpoint_type: int, *values: float) -> CRTPPacket:
+    """
+    Builds a generic commander setpoint packet, the same one sent by
+    cflib.crazyflie.commander to a single Crazyflie.
+    """
+    packet = CRTPPacket()
+    packet.port = CRTPPort.COMMANDER_GENERIC
+    packet.data = struct.pack(f"<B{len(values)}f", setpoint_type, *values)
+    return packet
+
+
+@dataclass
+class BroadcastGroup:
+    uri: str  # radiobroadcast:// URI of the Crazyradio and channel
+    robots: List[CrazyflieRobot] = field(default_factory=list)
+    link: object = None  # cflib link driver, None if it could not be opened
+
+
+class SwarmBroadcaster:
+    """
+    Sends swarm-wide commands (take off, land, emergency stop) as one
+    broadcast packet per Crazyradio and channel, so that all the Crazyflies
+    of a group receive the command at the same time.
+
+    Broadcast packets are not acknowledged: when confirm is set, each
+    Crazyflie then receives the same (idempotent) setpoint on its own
+    acknowledged link, which confirms it and covers a lost broadcast.
+    Crazyflies that are not on a radio link, or whose group link cannot be
+    opened, only get the unicast command.
+    """
+
+    def __init__(
+        self,
+        robots: List[CrazyflieRobot],
+        config: BroadcastConfig = None,
+        logger=None,
+    ):
+        self.config = config if config is not None else BroadcastConfig()
+        self.logger = logger
+        self.groups: Dict[str, BroadcastGroup] = {}
+        self.unicast: List[CrazyflieRobot] = []
+
+        for robot in robots:
+            radio = parse_radio_uri(robot.uri) if self.config.enabled else None
+            if radio is None:
+                self.unicast.append(robot)
+                continue
+            uri = broadcast_uri(*radio)
+            self.groups.setdefault(uri, BroadcastGroup(uri=uri)).robots.append(
+                robot
+            )
+
+    # * Links
+    def open(self) -> None:
+        for group in self.groups.values():
+            try:
+                group.link = crtp.get_link_driver(group.uri)
+            except Exception as e:
+                group.link = None
+                log(f"Error opening {group.uri}: {e}", self.logger, "warn")
+            if group.link is None:
+                log(
+                    f"Broadcast on {group.uri} unavailable, "
+                    + f"{len(group.robots)} Crazyflies will be commanded one by one",
+                    self.logger,
+                    "warn",
+                )
+            else:
+                names = ", ".join(robot.name for robot in group.robots)
+                log(f"Broadcast group {group.uri}: {names}", self.logger)
+
+    def close(self) -> None:
+        for group in self.groups.values():
+            if group.link is not None:
+                group.link.close()
+                group.link = None
+
+    # * Commands
+    def take_off(
+        self, height: float, duration: float = None
+    ) -> Dict[str, bool]:
+        for robot in self.__robots():
+            robot.check_ready()
+            robot.stopped = False
+        return self.__send(
+            setpoint_packet(TYPE_HOVER, 0.0, 0.0, 0.0, height),
+            lambda robot: robot.take_off(height, duration),
+        )
+
+    def land(self, duration: float = None) -> Dict[str, bool]:
+        for robot in self.__robots():
+            robot.is_flying = False
+        return self.__send(
+            setpoint_packet(TYPE_VELOCITY_WORLD, 0.0, 0.0, -0.05, 0.0),
+            lambda robot: robot.land(duration),
+        )
+
+    def emergency_stop(self) -> Dict[str, bool]:
+        # Latched before the packet, so that no setpoint stream rearms the motors
+        for robot in self.__robots():
+            robot.stopped = True
+            robot.is_flying = False
+            robot.take_off_done = False
+        return self.__send(
+            setpoint_packet(TYPE_STOP),
+            lambda robot: robot.emergency_stop(),
+        )
+
+    def __robots(self) -> List[CrazyflieRobot]:
+        robots = list(self.unicast)
+        for group in self.groups.values():
+            robots += group.robots
+        return robots
+
+    def __send(
+        self,
+        packet: CRTPPacket,
+        command: Callable[[CrazyflieRobot], None],
+    ) -> Dict[str, bool]:
+        """
+        Broadcasts the packet to every group, then sends the command to each
+        Crazyflie that needs a confirmation or a fallback.
+
+        Returns:
+            Dict[str, bool]: Whether each Crazyflie got the command, keyed by name.
+        """
+        pending = list(self.unicast)
+        broadcasted: List[CrazyflieRobot] = []
+        for group in self.groups.values():
+            if group.link is None:
+                pending += group.robots
+                continue
+            try:
+                for _ in range(self.config.repeats):
+                    group.link.send_packet(packet)
+                broadcasted += group.robots
+            except Exception as e:
+                log(
+                    f"Error broadcasting on {group.uri}: {e}",
+                    self.logger,
+                    "warn",
+                )
+                pending += group.robots
+
+        results = {robot.name: True for robot in broadcasted}
+        if self.config.confirm:
+            pending += broadcasted
+        for robot in pending:
+            try:
+                command(robot)
+                results[robot.name] = True
+            except Exception as e:
+                log(
+                    f"Error commanding {robot.name}: {e}", self.logger, "error"
+                )
+                results[robot.name] = False
+        return results
@@ -1,15 +1,31 @@
+import queue
 import time
 from threading import Event
 from typing import Dict
 
+import numpy as np
 from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
-from cflib.crazyflie.syncLogger import SyncLogger
 from cflib.utils.multiranger import Multiranger
 
 from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
-from crazyflie_swarm_pkg.utils import RangeDirection, RingBuffer, log
+from crazyflie_swarm_pkg.crazyflie.state_buffer import StateBuffer, StateSample
+from crazyflie_swarm_pkg.crazyflie.telemetry import (
+    TelemetryBlock,
+    pack_blocks,
+    telemetry_variables,
+)
+from crazyflie_swarm_pkg.utils import (
+    BringUpConfig,
+    MultiChannelRingBuffer,
+    RangeFilterConfig,
+    TelemetryConfig,
+    log,
+)
+
+# Multiranger channels, in the order of the CrazyState fields
+MULTIRANGER_CHANNELS = ["mr_front", "mr_right", "mr_back", "mr_left", "mr_up"]
 
 
 class CrazyflieRobot:
@@ -23,7 +39,10 @@ class CrazyflieRobot:
         multiranger=False,
         initial_position=None,
         default_take_off_height=0.2,
-        default_take_off_duration=3
+        default_take_off_duration=3,
+        telemetry_config=None,
+        range_filter_config=None,
+        bringup_config=None,
     ):
         self.uri = uri
         self.name = name
@@ -36,22 +55,36 @@ class CrazyflieRobot:
         self.default_land_duration = 3
         self.default_height = 0.2
         self.default_velocity = 0.1
-        self.emergency_stop_distance = 0.3 # TODO: put in config
 
         # State
         self.initial_position = initial_position
-        self.state = CrazyState()
-        self.state.init_x = initial_position.x
-        self.state.init_y = initial_position.y
-        self.state.init_z = initial_position.z
-        
+        self.state_buffer = StateBuffer(
+            CrazyState(
+                init_x=initial_position.x,
+                init_y=initial_position.y,
+                init_z=initial_position.z,
+            )
+        )
+
         log(f"{self.state}", self.logger)
-        
+
         self.estimators: Dict[str, LogConfig] = {}
+        if telemetry_config is None:
+            telemetry_config = TelemetryConfig()
+        self.telemetry_blocks: Dict[str, TelemetryBlock] = {
+            block.name: block
+            for block in pack_blocks(
+                telemetry_variables(telemetry_config, initial_position)
+            )
+        }
 
         # Connection
         self.__connection_timeout = 10  # seconds
         self.__connection_opened = False
+        self.__link_established_time = None
+        self.__deck_callbacks_added = False
+        self.bringup_timings: Dict[str, float] = {}
+        self.cf.link_established.add_callback(self.link_established_callback)
 
         # Flow deck
         self.__flow_deck_attached = False
@@ -59,67 +92,92 @@ class CrazyflieRobot:
         self.flow_deck_attached_event.clear()
 
         # Multiranger
-        multiranger_buffer_size = 10
+        if range_filter_config is None:
+            range_filter_config = RangeFilterConfig()
+        if bringup_config is None:
+            bringup_config = BringUpConfig()
+        self.emergency_stop_distance = bringup_config.emergency_stop_distance
         self.multiranger = multiranger
         self.__multiranger_attached = False
         self.multiranger_attached_event = Event()
         self.multiranger_attached_event.clear()
         self.multiranger_sensor = Multiranger(self.scf)
-        self.__buffer: Dict[RangeDirection, RingBuffer] = {}
-        self.__buffer[RangeDirection.FRONT] = RingBuffer(
-            multiranger_buffer_size, (1,)
-        )
-        self.__buffer[RangeDirection.RIGHT] = RingBuffer(
-            multiranger_buffer_size, (1,)
-        )
-        self.__buffer[RangeDirection.BACK] = RingBuffer(
-            multiranger_buffer_size, (1,)
-        )
-        self.__buffer[RangeDirection.LEFT] = RingBuffer(
-            multiranger_buffer_size, (1,)
-        )
-        self.__buffer[RangeDirection.UP] = RingBuffer(
-            multiranger_buffer_size, (1,)
+        self.__buffer = MultiChannelRingBuffer(
+            range_filter_config.buffer_size,
+            len(MULTIRANGER_CHANNELS),
+            range_filter_config.filter,
         )
-        self.__mean_buffer: Dict[RangeDirection, float] = {}
-        self.__mean_buffer[RangeDirection.FRONT] = 0.0
-        self.__mean_buffer[RangeDirection.RIGHT] = 0.0
-        self.__mean_buffer[RangeDirection.BACK] = 0.0
-        self.__mean_buffer[RangeDirection.LEFT] = 0.0
-        self.__mean_buffer[RangeDirection.UP] = 0.0
+        self.__filtered_ranges = np.zeros(len(MULTIRANGER_CHANNELS))
 
         self.take_off_done = False
         self.is_flying = False
+        self.stopped = False  # Latched by emergency_stop until the next take off
+
+    @property
+    def state(self) -> CrazyState:
+        """
+        The latest consistent state. It is shared with the other readers and
+        must not be modified: updates go through state_buffer.commit.
+        """
+        return self.state_buffer.state
 
     # * Initialization
-    def initialize(self):
+    def initialize(self, connection_timeout=None, estimator_timeout=None):
+        """
+        Connects to the Crazyflie, waits for its decks, resets the estimator
+        and starts the estimators logging. The duration of each phase (link,
+        toc, decks, estimator, logging) is stored in bringup_timings.
+
+        Args:
+            connection_timeout (float): Deadline for the link, TOC fetch and decks detection [s].
+            estimator_timeout (float): Deadline for the estimator reset [s], None waits until it converges.
+
+        Returns:
+            bool: True if the Crazyflie is ready to fly.
+        """
+        if connection_timeout is None:
+            connection_timeout = self.__connection_timeout
+        self.bringup_timings = {}
+
         log(f"Connecting to Crazyflie {self.name} ...", self.logger)
         start_initialization = time.time()
+        self.__link_established_time = None
         self.open_connection()
 
+        # Link established before the TOC fetch, which ends with open_connection
+        connected_time = time.time()
+        link_time = self.__link_established_time or connected_time
+        self.bringup_timings["link"] = link_time - start_initialization
+        self.bringup_timings["toc"] = connected_time - link_time
+
         # * Led sanity check
         self.set_led(255.0)
 
-        self.scf.cf.param.add_update_callback(
-            group="deck", name="bcFlow2", cb=self.flow_deck_attached_callback
-        )
-        if self.multiranger:
+        if not self.__deck_callbacks_added:
             self.scf.cf.param.add_update_callback(
                 group="deck",
-                name="bcMultiranger",
-                cb=self.multiranger_deck_attached_callback,
+                name="bcFlow2",
+                cb=self.flow_deck_attached_callback,
             )
+            if self.multiranger:
+                self.scf.cf.param.add_update_callback(
+                    group="deck",
+                    name="bcMultiranger",
+                    cb=self.multiranger_deck_attached_callback,
+                )
+            self.__deck_callbacks_added = True
 
         while (
             not self.__connection_opened
             or not self.__flow_deck_attached
             or (not self.__multiranger_attached and self.multiranger)
         ):
-            if time.time() - start_initialization > self.__connection_timeout:
+            if time.time() - start_initialization > connection_timeout:
                 log(f"Initialization timeout for {self.name}", self.logger)
                 self.close_connection()
                 return False
             time.sleep(0.1)
+        self.bringup_timings["decks"] = time.time() - connected_time
 
         log(f"Crazyflie {self.name} connected.", self.logger)
 
@@ -127,14 +185,21 @@ class CrazyflieRobot:
             f"Resetting estimators of Crazyflie {self.name} ...",
             self.logger,
         )
-        self.reset_estimator()
+        phase_start = time.time()
+        if not self.reset_estimator(timeout=estimator_timeout):
+            log(f"Estimator reset timeout for {self.name}", self.logger)
+            self.close_connection()
+            return False
+        self.bringup_timings["estimator"] = time.time() - phase_start
         log(f"Estimators of Crazyflie {self.name} reset.", self.logger)
 
         log(
             f"Starting estimators of Crazyflie {self.name} ...",
             self.logger,
         )
+        phase_start = time.time()
         self.setup_estimators()
+        self.bringup_timings["logging"] = time.time() - phase_start
         log(f"Estimators of Crazyflie {self.name} started.", self.logger)
 
         log(f"Crazyflie {self.name} initialized", self.logger)
@@ -181,6 +246,9 @@ class CrazyflieRobot:
             log(f"Multiranger is not attached to {self.name}", self.logger)
 
     # Connection management
+    def link_established_callback(self, uri):
+        self.__link_established_time = time.time()
+
     def open_connection(self):
         if self.__connection_opened:
             raise Exception("Connection already opened")
@@ -201,38 +269,28 @@ class CrazyflieRobot:
 
         # * Multirange values (filled only if above a certain height)
         if self.state.z > 0.1:
-            self.__buffer[RangeDirection.FRONT].append(
-                self.multiranger_sensor.front
-            )
-            self.__buffer[RangeDirection.RIGHT].append(
-                self.multiranger_sensor.right
+            self.__buffer.append(
+                [
+                    self.multiranger_sensor.front,
+                    self.multiranger_sensor.right,
+                    self.multiranger_sensor.back,
+                    self.multiranger_sensor.left,
+                    self.multiranger_sensor.up,
+                ]
             )
-            self.__buffer[RangeDirection.BACK].append(
-                self.multiranger_sensor.back
+            self.__filtered_ranges = self.__buffer.compute()
+            self.state_buffer.commit(
+                dict(zip(MULTIRANGER_CHANNELS, self.__filtered_ranges.tolist())),
+                source="multiranger",
             )
-            self.__buffer[RangeDirection.LEFT].append(
-                self.multiranger_sensor.left
-            )
-            self.__buffer[RangeDirection.UP].append(self.multiranger_sensor.up)
-            self.__mean_buffer[RangeDirection.FRONT] = self.__buffer[
-                RangeDirection.FRONT
-            ].compute_mean()
-            self.__mean_buffer[RangeDirection.RIGHT] = self.__buffer[
-                RangeDirection.RIGHT
-            ].compute_mean()
-            self.__mean_buffer[RangeDirection.BACK] = self.__buffer[
-                RangeDirection.BACK
-            ].compute_mean()
-            self.__mean_buffer[RangeDirection.LEFT] = self.__buffer[
-                RangeDirection.LEFT
-            ].compute_mean()
-            self.__mean_buffer[RangeDirection.UP] = self.__buffer[
-                RangeDirection.UP
-            ].compute_mean()
 
         # * Handle take off and land
         z = self.state.z
-        if not self.take_off_done and z >= self.default_take_off_height - 0.05:
+        if (
+            not self.take_off_done
+            and not self.stopped
+            and z >= self.default_take_off_height - 0.05
+        ):
             log(f"Take off done for Crazyflie {self.name}", self.logger)
             self.take_off_done = True
             self.is_flying = True
@@ -245,21 +303,18 @@ class CrazyflieRobot:
 
         # * Handle multirange
         if self.multiranger and self.take_off_done:
+            # Front, right, back and left: the up range does not stop the drone
             if (
-                self.__mean_buffer[RangeDirection.FRONT]
-                < self.emergency_stop_distance
-                or self.__mean_buffer[RangeDirection.RIGHT]
-                < self.emergency_stop_distance
-                or self.__mean_buffer[RangeDirection.BACK]
-                < self.emergency_stop_distance
-                or self.__mean_buffer[RangeDirection.LEFT]
-                < self.emergency_stop_distance
-            ):
+                self.__filtered_ranges[:4] < self.emergency_stop_distance
+            ).any():
                 log(f"Emergency stop for Crazyflie {self.name}", self.logger)
                 self.emergency_stop()
 
     # * Commands
-    def take_off(self, absolute_height=None, duration=None):
+    def check_ready(self):
+        """
+        Raises an exception if the Crazyflie cannot be commanded.
+        """
         if not self.__connection_opened:
             raise Exception("Connection not opened")
         if not self.__flow_deck_attached:
@@ -267,10 +322,14 @@ class CrazyflieRobot:
         if self.multiranger and not self.__multiranger_attached:
             raise Exception("Multiranger not attached")
 
+    def take_off(self, absolute_height=None, duration=None):
+        self.check_ready()
+
         if absolute_height is None:
             absolute_height = self.default_take_off_height
         if duration is None:
             duration = self.default_take_off_duration
+        self.stopped = False
         self.cf.commander.send_hover_setpoint(0, 0, 0, absolute_height)
 
     def land(self, duration=None):
@@ -280,16 +339,18 @@ class CrazyflieRobot:
         self.cf.commander.send_velocity_world_setpoint(0, 0, -0.05, 0)
 
     def emergency_stop(self):
+        """
+        Stops the motors. The stop is latched: no velocity setpoint is sent,
+        which would rearm them, until the next take off.
+        """
+        self.stopped = True
+        self.is_flying = False
+        self.take_off_done = False
         self.cf.commander.send_stop_setpoint()
 
     def set_velocity(self, vx, vy, yaw_rate):
-        if not self.__connection_opened:
-            raise Exception("Connection not opened")
-        if not self.__flow_deck_attached:
-            raise Exception("Flow deck not attached")
-        if self.multiranger and not self.__multiranger_attached:
-            raise Exception("Multiranger not attached")
-        if not self.is_flying:
+        self.check_ready()
+        if not self.is_flying or self.stopped:
             log(f"Not flying {self.name}", self.logger)
             return
         self.cf.commander.send_hover_setpoint(
@@ -305,41 +366,47 @@ class CrazyflieRobot:
 
     # * Getters
     def get_state(self) -> CrazyState:
-        self.get_multiranger_data()
-        return self.state
-
-    def get_multiranger_data(self):
-        self.state.mr_front = self.__mean_buffer[RangeDirection.FRONT]
-        self.state.mr_right = self.__mean_buffer[RangeDirection.RIGHT]
-        self.state.mr_back = self.__mean_buffer[RangeDirection.BACK]
-        self.state.mr_left = self.__mean_buffer[RangeDirection.LEFT]
-        self.state.mr_up = self.__mean_buffer[RangeDirection.UP]
-
-    def pose_estimator_callback(self, timestamp, data, logconf):
-        self.state.x = data["stateEstimate.x"] + self.initial_position.x
-        self.state.y = data["stateEstimate.y"] + self.initial_position.y
-        self.state.z = data["stateEstimate.z"] + self.initial_position.z
-        self.state.roll = data["stabilizer.roll"]
-        self.state.pitch = data["stabilizer.pitch"]
-        self.state.yaw = data["stabilizer.yaw"]
+        return self.state_buffer.state
+
+    def get_state_sample(self) -> StateSample:
+        """
+        The latest state with the firmware timestamp and sequence number of
+        the update that produced it.
+        """
+        return self.state_buffer.snapshot()
+
+    def telemetry_callback(self, timestamp, data, logconf):
+        # All the fields of a log packet are committed at once
+        block = self.telemetry_blocks[logconf.name]
+        self.state_buffer.commit(
+            block.decode(data), timestamp=timestamp, source=logconf.name
+        )
 
     def setup_estimators(self):
-        pose_estimator = LogConfig(name="Pose", period_in_ms=10)
-        pose_estimator.add_variable("stateEstimate.x", "float")
-        pose_estimator.add_variable("stateEstimate.y", "float")
-        pose_estimator.add_variable("stateEstimate.z", "float")
-        pose_estimator.add_variable("stabilizer.roll", "float")
-        pose_estimator.add_variable("stabilizer.pitch", "float")
-        pose_estimator.add_variable("stabilizer.yaw", "float")
-        self.cf.log.add_config(pose_estimator)
-        pose_estimator.data_received_cb.add_callback(
-            self.pose_estimator_callback
-        )
-        pose_estimator.start()
-        self.estimators["pose"] = pose_estimator
+        for block in self.telemetry_blocks.values():
+            estimator = LogConfig(
+                name=block.name, period_in_ms=block.period_in_ms
+            )
+            for variable in block.variables:
+                estimator.add_variable(variable.name, variable.fetch_as)
+            self.cf.log.add_config(estimator)
+            estimator.data_received_cb.add_callback(self.telemetry_callback)
+            estimator.start()
+            self.estimators[block.name] = estimator
 
     # * Estimator Reset
-    def reset_estimator(self):
+    def reset_estimator(self, timeout=None) -> bool:
+        """
+        Resets the Kalman estimator and waits until its position variances
+        settle. The variance packets are read with a timeout, so a Crazyflie
+        that stops sending them cannot block past the deadline.
+
+        Args:
+            timeout (float): Deadline for the variances to settle [s], None waits until they do.
+
+        Returns:
+            bool: False if the deadline expired.
+        """
         self.cf.param.set_value("kalman.resetEstimation", "1")
         time.sleep(0.1)
         self.cf.param.set_value("kalman.resetEstimation", "0")
@@ -354,10 +421,27 @@ class CrazyflieRobot:
         var_z_history = [1000] * 10
 
         threshold = 0.001
+        start = time.time()
+
+        entries = queue.Queue()
 
-        with SyncLogger(self.scf, log_config) as logger:
-            for log_entry in logger:
-                data = log_entry[1]
+        def variance_callback(timestamp, data, logconf):
+            entries.put(data)
+
+        log_config.data_received_cb.add_callback(variance_callback)
+        self.cf.log.add_config(log_config)
+        log_config.start()
+        try:
+            while True:
+                remaining = None
+                if timeout is not None:
+                    remaining = timeout - (time.time() - start)
+                    if remaining <= 0:
+                        return False
+                try:
+                    data = entries.get(timeout=remaining)
+                except queue.Empty:
+                    return False
 
                 var_x_history.append(data["kalman.varPX"])
                 var_x_history.pop(0)
@@ -378,4 +462,13 @@ class CrazyflieRobot:
                     and (max_y - min_y) < threshold
                     and (max_z - min_z) < threshold
                 ):
-                    break
+                    return True
+        finally:
+            log_config.data_received_cb.remove_callback(variance_callback)
+            try:
+                log_config.delete()
+            except Exception as e:
+                log(
+                    f"Error deleting the variance log of {self.name}: {e}",
+                    self.logger,
+                )
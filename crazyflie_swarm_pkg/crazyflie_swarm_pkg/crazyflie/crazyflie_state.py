@@ -2,6 +2,18 @@ from dataclasses import dataclass
 
 import numpy as np
 
+# Beams in the body frame, in the order of the CrazyState fields
+MULTIRANGER_FIELDS = ["mr_front", "mr_right", "mr_back", "mr_left", "mr_up"]
+MULTIRANGER_BEAMS = np.array(
+    [
+        [1.0, 0.0, 0.0],  # front
+        [0.0, -1.0, 0.0],  # right
+        [-1.0, 0.0, 0.0],  # back
+        [0.0, 1.0, 0.0],  # left
+        [0.0, 0.0, 1.0],  # up
+    ]
+)
+
 
 @dataclass
 class CrazyState:
@@ -52,39 +64,19 @@ class CrazyState:
         return np.array([self.init_x, self.init_y, self.init_z])
 
     def get_rotation_matrix(self) -> np.ndarray:
-        roll = np.deg2rad(self.roll)
-        pitch = np.deg2rad(self.pitch)
-        yaw = np.deg2rad(self.yaw)
-        
-        R_roll = np.array(
-            [
-                [1, 0, 0],
-                [0, np.cos(roll), -np.sin(roll)],
-                [0, np.sin(roll), np.cos(roll)],
-            ]
-        )
-
-        R_pitch = np.array(
-            [
-                [np.cos(pitch), 0, np.sin(pitch)],
-                [0, 1, 0],
-                [-np.sin(pitch), 0, np.cos(pitch)],
-            ]
-        )
-
-        # Matrice di rotazione per yaw
-        R_yaw = np.array(
-            [
-                [np.cos(yaw), -np.sin(yaw), 0],
-                [np.sin(yaw), np.cos(yaw), 0],
-                [0, 0, 1],
-            ]
-        )
-
-        # Matrice di rotazione composta
-        R = R_yaw @ R_pitch @ R_roll
-
-        return R
+        """
+        Body to world rotation R = R_yaw @ R_pitch @ R_roll. It is computed
+        once per attitude and cached until the attitude changes, so it is
+        returned read-only.
+        """
+        attitude = (self.roll, self.pitch, self.yaw)
+        if getattr(self, "_rotation_attitude", None) != attitude:
+            self._rotation = rotation_matrices(
+                *np.deg2rad(np.array(attitude)).reshape(3, 1)
+            )[0]
+            self._rotation.setflags(write=False)
+            self._rotation_attitude = attitude
+        return self._rotation
 
     def rel2glob(self, rel_pos: np.ndarray) -> np.ndarray:
         """
@@ -96,7 +88,75 @@ class CrazyState:
         Returns:
             np.ndarray: A 3x1 vector representing the absolute position of the object.
         """
-        rel_pos.reshape(3, 1)
-        R = self.get_rotation_matrix()
-        abs_pos = self.get_position() + R @ rel_pos
+        rel_pos = np.reshape(rel_pos, 3)
+        abs_pos = self.get_position() + self.get_rotation_matrix() @ rel_pos
         return abs_pos.reshape(3, 1)
+
+    def multiranger_to_world(self, max_range: float = np.inf) -> np.ndarray:
+        """
+        (5, 3) world frame points hit by the beams, front, right, back, left
+        and up, NaN for the beams not closer than max_range.
+        """
+        return multiranger_to_world(
+            self.get_position().reshape(1, 3),
+            self.get_rotation_matrix().reshape(1, 3, 3),
+            np.array(
+                [[self.mr_front, self.mr_right, self.mr_back, self.mr_left, self.mr_up]]
+            ),
+            max_range,
+        )[0]
+
+
+def rotation_matrices(
+    rolls: np.ndarray, pitches: np.ndarray, yaws: np.ndarray
+) -> np.ndarray:
+    """
+    (N, 3, 3) body to world rotations R = R_yaw @ R_pitch @ R_roll, as in
+    CrazyState.get_rotation_matrix, from angles in radians.
+    """
+    cr, sr = np.cos(rolls), np.sin(rolls)
+    cp, sp = np.cos(pitches), np.sin(pitches)
+    cy, sy = np.cos(yaws), np.sin(yaws)
+    rotations = np.empty((len(yaws), 3, 3))
+    rotations[:, 0, 0] = cy * cp
+    rotations[:, 0, 1] = cy * sp * sr - sy * cr
+    rotations[:, 0, 2] = cy * sp * cr + sy * sr
+    rotations[:, 1, 0] = sy * cp
+    rotations[:, 1, 1] = sy * sp * sr + cy * cr
+    rotations[:, 1, 2] = sy * sp * cr - cy * sr
+    rotations[:, 2, 0] = -sp
+    rotations[:, 2, 1] = cp * sr
+    rotations[:, 2, 2] = cp * cr
+    return rotations
+
+
+def multiranger_to_world(
+    positions: np.ndarray,
+    rotations: np.ndarray,
+    ranges: np.ndarray,
+    max_range: float = np.inf,
+    beams: np.ndarray = MULTIRANGER_BEAMS,
+) -> np.ndarray:
+    """
+    Transforms the multiranger readings of N drones into the world frame
+    points hit by their beams, with a single einsum.
+
+    Args:
+        positions (np.ndarray): (N, 3) positions of the drones.
+        rotations (np.ndarray): (N, 3, 3) body to world rotations of the drones.
+        ranges (np.ndarray): (N, B) readings, front, right, back, left and up as in CrazyState.
+        max_range (float): Readings not closer than this are out of range.
+        beams (np.ndarray): (B, 3) body frame versors of the beams, in the order of ranges.
+
+    Returns:
+        np.ndarray: (N, B, 3) hit points, NaN for the beams out of range.
+    """
+    ranges = np.asarray(ranges, dtype=float)
+    in_range = (ranges >= 0) & (ranges < max_range)
+    # Out of range beams are zeroed, not to propagate inf * 0 into the einsum
+    rel_pos = np.where(in_range, ranges, 0.0)[:, :, np.newaxis] * beams
+    points = np.asarray(positions, dtype=float)[:, np.newaxis, :] + np.einsum(
+        "nij,nbj->nbi", rotations, rel_pos
+    )
+    points[~in_range] = np.nan
+    return points
@@ -0,0 +1,59 @@
+from typing import Dict
+
+from builtin_interfaces.msg import Time
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+
+from crazyflie_swarm_pkg.utils.latency import LatencyTracer
+
+
+def stamp_to_seconds(stamp: Time) -> float:
+    return stamp.sec + stamp.nanosec * 1e-9
+
+
+def seconds_to_stamp(seconds: float) -> Time:
+    stamp = Time()
+    stamp.sec = int(seconds)
+    stamp.nanosec = int((seconds - stamp.sec) * 1e9)
+    return stamp
+
+
+def latency_diagnostics(
+    tracer: LatencyTracer,
+    node_name: str,
+    warn_threshold: float,
+    reset: bool = False,
+) -> DiagnosticArray:
+    """
+    Builds a DiagnosticArray with one status per stage of the tracer, its
+    latency statistics in ms and its histogram as "upper edge:count" pairs.
+    Stages whose p90 exceeds warn_threshold [s] are reported as warnings.
+    """
+    msg = DiagnosticArray()
+    summary: Dict[str, Dict] = tracer.summary(reset)
+    for stage, stats in summary.items():
+        status = DiagnosticStatus()
+        status.name = f"{node_name}: {stage} latency"
+        status.hardware_id = node_name
+        status.level = DiagnosticStatus.OK
+        if stats["count"] > 0 and stats["p90"] > warn_threshold:
+            status.level = DiagnosticStatus.WARN
+        status.message = (
+            f"p50 {1e3 * stats['p50']:.1f}ms p99 {1e3 * stats['p99']:.1f}ms "
+            + f"over {stats['count']} samples"
+        )
+        status.values = [
+            KeyValue(key="count", value=str(stats["count"])),
+            *[
+                KeyValue(key=f"{key}_ms", value=f"{1e3 * stats[key]:.3f}")
+                for key in ("mean", "p50", "p90", "p99", "max")
+            ],
+            KeyValue(
+                key="histogram_ms",
+                value=" ".join(
+                    f"{1e3 * edge:.3g}:{count}"
+                    for edge, count in stats["bins"]
+                ),
+            ),
+        ]
+        msg.status.append(status)
+    return msg
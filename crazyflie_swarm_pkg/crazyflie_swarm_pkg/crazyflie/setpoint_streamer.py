@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Deque, Optional, Tuple
+
+from crazyflie_swarm_pkg.utils import SetpointConfig, log
+from crazyflie_swarm_pkg.utils.latency import LatencyTracer
+
+if TYPE_CHECKING:
+    from crazyflie_swarm_pkg.crazyflie.crazyflie_robot import CrazyflieRobot
+
+Setpoint = Tuple[float, float, float]  # vx, vy, yaw_rate
+
+HOLD_SETPOINT: Setpoint = (0.0, 0.0, 0.0)
+
+
+@dataclass
+class StreamerStats:
+    received: int = 0  # Commands pushed
+    sent: int = 0  # Setpoints sent, keepalives included
+    coalesced: int = 0  # Commands replaced by a newer one before being sent
+    # Commands evicted from a full queue or received while landed
+    dropped: int = 0
+    keepalives: int = 0  # Setpoints resent without a new command
+    errors: int = 0
+
+    def __str__(self):
+        return (
+            f"received {self.received}, sent {self.sent}, "
+            + f"coalesced {self.coalesced}, dropped {self.dropped}, "
+            + f"keepalives {self.keepalives}, errors {self.errors}"
+        )
+
+
+class SetpointStreamer:
+    """
+    Latest-value-wins velocity setpoint stream of a Crazyflie.
+
+    Commands are queued by push, at any rate and from any thread, in a queue
+    of bounded depth. At every tick, called at the fixed send rate, only the
+    newest queued command is sent and the older ones are coalesced; without a
+    new command the last setpoint is resent as a keepalive, and after
+    command_timeout without commands the Crazyflie is held in place. The
+    radio load is therefore one packet per tick per flying Crazyflie,
+    regardless of how many nodes publish commands.
+
+    Nothing is sent while the Crazyflie is not flying, and the queued and
+    last setpoints are discarded: after an emergency stop, a keepalive would
+    rearm the motors.
+
+    With a tracer, the time from the push of a command to the return of its
+    send_hover_setpoint is recorded in its "command_to_setpoint" stage.
+    """
+
+    def __init__(
+        self,
+        robot: "CrazyflieRobot",
+        config: SetpointConfig = None,
+        clock: Callable[[], float] = time.monotonic,
+        logger=None,
+        tracer: LatencyTracer = None,
+    ):
+        self.robot = robot
+        self.config = config if config is not None else SetpointConfig()
+        self.clock = clock
+        self.logger = logger
+        self.tracer = tracer
+        self.stats = StreamerStats()
+
+        self.__lock = Lock()
+        self.__queue: Deque[Setpoint] = deque()
+        self.__last_setpoint: Optional[Setpoint] = None
+        self.__last_command_time = None
+
+    def push(self, vx: float, vy: float, yaw_rate: float) -> None:
+        with self.__lock:
+            self.stats.received += 1
+            if len(self.__queue) >= max(self.config.queue_size, 1):
+                self.__queue.popleft()
+                self.stats.dropped += 1
+            self.__queue.append((vx, vy, yaw_rate))
+            self.__last_command_time = self.clock()
+
+    def tick(self) -> None:
+        with self.__lock:
+            pending = len(self.__queue)
+            setpoint = self.__queue[-1] if pending > 0 else None
+            self.__queue.clear()
+            last_command_time = self.__last_command_time
+
+            if not self.robot.is_flying or self.robot.stopped:
+                self.stats.dropped += pending
+                self.__last_setpoint = None
+                return
+
+            fresh = setpoint is not None
+            if fresh:
+                self.stats.coalesced += pending - 1
+            elif self.__last_setpoint is not None and self.config.keepalive:
+                setpoint = self.__last_setpoint
+                timeout = self.config.command_timeout
+                if timeout > 0 and self.clock() - last_command_time > timeout:
+                    setpoint = HOLD_SETPOINT
+                self.stats.keepalives += 1
+            else:
+                return
+
+        # The radio is not held under the lock, push never waits for it
+        try:
+            self.robot.set_velocity(*setpoint)
+            sent = True
+            if fresh and self.tracer is not None:
+                self.tracer.record(
+                    "command_to_setpoint", self.clock() - last_command_time
+                )
+        except Exception as e:
+            sent = False
+            log(
+                f"Error sending setpoint to {self.robot.name}: {e}",
+                self.logger,
+                "error",
+            )
+
+        with self.__lock:
+            if sent:
+                self.stats.sent += 1
+            else:
+                self.stats.errors += 1
+            self.__last_setpoint = setpoint
@@ -0,0 +1,84 @@
+import time
+from dataclasses import dataclass, field, replace
+from threading import Lock
+from typing import Dict
+
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+
+
+@dataclass(frozen=True)
+class StateSample:
+    state: CrazyState = field(default_factory=CrazyState)
+    timestamp: int = 0  # Firmware timestamp of the last log packet [ms]
+    sequence: int = 0  # Number of updates committed before this sample
+    source: str = ""  # Log block (or host stage) that committed the sample
+    received: float = 0.0  # Host time of the commit [s]
+    # Host time of the last update with a firmware timestamp [s]
+    stamp: float = 0.0
+
+
+class StateBuffer:
+    """
+    Single-writer-at-a-time, lock-free-reader handoff of the state of a
+    Crazyflie between the cflib receive thread and the ROS executor.
+
+    Every commit copies the latest state, applies all the fields of one update
+    (e.g. one log packet) to the copy and publishes it as a new StateSample by
+    swapping a single reference. A published sample is never modified again,
+    so a reader always sees all the fields of the same packets, together with
+    their firmware timestamp and sequence number, without taking a lock.
+    Writers are serialized by a lock so that concurrent updates of different
+    fields (telemetry from cflib, multiranger from the ROS thread) never drop
+    each other.
+    """
+
+    def __init__(self, state: CrazyState = None):
+        self.__lock = Lock()
+        self.__sample = StateSample(
+            state=state if state is not None else CrazyState(),
+            received=time.time(),
+        )
+
+    def commit(
+        self,
+        values: Dict[str, float],
+        timestamp: int = None,
+        source: str = "",
+    ) -> StateSample:
+        """
+        Atomically applies the CrazyState field values of one update.
+
+        Args:
+            values (Dict[str, float]): The new values, keyed by CrazyState field.
+            timestamp (int): Firmware timestamp of the update [ms], None keeps the previous one.
+            source (str): Name of the log block or stage of the update.
+
+        Returns:
+            StateSample: The committed sample.
+        """
+        now = time.time()
+        with self.__lock:
+            previous = self.__sample
+            sample = StateSample(
+                state=replace(previous.state, **values),
+                timestamp=(
+                    previous.timestamp if timestamp is None else timestamp
+                ),
+                sequence=previous.sequence + 1,
+                source=source,
+                received=now,
+                stamp=previous.stamp if timestamp is None else now,
+            )
+            self.__sample = sample
+        return sample
+
+    def snapshot(self) -> StateSample:
+        """
+        The latest committed sample. Lock-free: the sample is immutable and
+        its reference is swapped atomically by the writers.
+        """
+        return self.__sample
+
+    @property
+    def state(self) -> CrazyState:
+        return self.__sample.state
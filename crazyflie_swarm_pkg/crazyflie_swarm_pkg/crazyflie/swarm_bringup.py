@@ -0,0 +1,199 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from crazyflie_swarm_pkg.crazyflie.crazyflie_robot import CrazyflieRobot
+from crazyflie_swarm_pkg.utils import BringUpConfig, SwarmConfig, log
+
+BRINGUP_PHASES = ["link", "toc", "decks", "estimator", "logging"]
+
+
+@dataclass
+class BringUpReport:
+    name: str
+    uri: str
+    joined: bool = False
+    attempts: int = 0
+    duration: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: str = ""
+    abandoned: bool = False  # Still bringing up when the swarm gave up on it
+
+    def __str__(self):
+        phases = " ".join(
+            f"{phase}={self.timings[phase]:.2f}s"
+            for phase in BRINGUP_PHASES
+            if phase in self.timings
+        )
+        status = "joined" if self.joined else f"FAILED ({self.error})"
+        return (
+            f"{self.name} [{self.uri}]: {status} after {self.attempts} attempt(s) "
+            + f"in {self.duration:.2f}s {phases}"
+        )
+
+
+def create_robots(
+    config: SwarmConfig, names: Optional[List[str]] = None, logger=None
+) -> List[CrazyflieRobot]:
+    """
+    Creates the active Crazyflies of the config, only those in names if given
+    and in the same order.
+    """
+    crazyflie_configs = {
+        crazyflie_config.name: crazyflie_config
+        for crazyflie_config in config.crazyflies
+        if crazyflie_config.active
+    }
+    if names is None:
+        names = list(crazyflie_configs.keys())
+
+    robots: List[CrazyflieRobot] = []
+    for name in names:
+        crazyflie_config = crazyflie_configs[name]
+        crazyflie_robot = CrazyflieRobot(
+            uri=crazyflie_config.uri,
+            name=name,
+            ro_cache="./ro_cache",
+            rw_cache="./rw_cache",
+            logger=logger,
+            multiranger=crazyflie_config.multiranger,
+            initial_position=crazyflie_config.initial_position,
+            default_take_off_height=crazyflie_config.takeoff_height,
+            default_take_off_duration=crazyflie_config.takeoff_duration,
+            telemetry_config=config.telemetry,
+            range_filter_config=config.range_filter,
+            bringup_config=config.bringup,
+        )
+        robots.append(crazyflie_robot)
+    return robots
+
+
+def bring_up_robot(
+    robot: CrazyflieRobot, config: BringUpConfig, logger=None
+) -> BringUpReport:
+    """
+    Initializes a Crazyflie, retrying with an exponential backoff until it
+    succeeds, the attempts are exhausted or its deadline expires.
+    """
+    report = BringUpReport(name=robot.name, uri=robot.uri)
+    start = time.time()
+    delay = config.retry_delay
+
+    while config.max_attempts <= 0 or report.attempts < config.max_attempts:
+        remaining = config.deadline - (time.time() - start)
+        if remaining <= 0:
+            report.error = "deadline expired"
+            break
+
+        report.attempts += 1
+        report.error = ""
+        try:
+            report.joined = robot.initialize(
+                connection_timeout=min(config.connection_timeout, remaining),
+                estimator_timeout=min(config.estimator_timeout, remaining),
+            )
+        except Exception as e:
+            report.error = str(e)
+            # The link may be open, and a retry would fail to reopen it
+            try:
+                robot.close_connection()
+            except Exception:
+                pass
+        report.timings = dict(robot.bringup_timings)
+
+        if report.joined:
+            break
+        if not report.error:
+            report.error = "initialization timeout"
+
+        log(
+            f"Bring-up attempt {report.attempts} of {robot.name} failed: {report.error}",
+            logger,
+            "warn",
+        )
+        if report.attempts == config.max_attempts:
+            break
+        time.sleep(min(delay, max(config.deadline - (time.time() - start), 0)))
+        delay *= config.retry_backoff
+
+    report.duration = time.time() - start
+    return report
+
+
+def release_robot(robot: CrazyflieRobot, logger=None) -> None:
+    """
+    Closes the log blocks and the link of a Crazyflie that did not join the
+    swarm, whatever its bring-up left open. Safe to call more than once.
+    """
+    try:
+        robot.destroy()
+    except Exception as e:
+        log(f"Error releasing {robot.name}: {e}", logger, "warn")
+        try:
+            robot.close_connection()
+        except Exception:
+            pass
+
+
+def bring_up_swarm(
+    robots: List[CrazyflieRobot], config: BringUpConfig, logger=None
+) -> Dict[str, BringUpReport]:
+    """
+    Brings up every Crazyflie of the swarm at the same time: connection, decks
+    detection, TOC fetch and estimator reset run in one thread per robot, so
+    the bring-up takes as long as the slowest robot instead of their sum, and
+    a robot that does not answer only delays itself until its deadline.
+
+    A robot still bringing up at the deadline is abandoned: its thread
+    cannot be interrupted inside cflib, so the robot is released when the
+    thread ends, even if it joined late. The caller must release the robots
+    that did not join again at shutdown, see release_robot.
+
+    Returns:
+        Dict[str, BringUpReport]: The bring-up report of each robot, keyed by name.
+    """
+    reports: Dict[str, BringUpReport] = {}
+    if len(robots) == 0:
+        return reports
+
+    executor = ThreadPoolExecutor(
+        max_workers=len(robots), thread_name_prefix="bringup"
+    )
+    futures = {
+        executor.submit(bring_up_robot, robot, config, logger): robot
+        for robot in robots
+    }
+
+    # A robot stuck inside cflib past its deadline is given up on
+    wait(futures, timeout=config.deadline + 1.0)
+    for future, robot in futures.items():
+        if future.done() and future.exception() is None:
+            reports[robot.name] = future.result()
+        else:
+            abandoned = not future.done()
+            error = (
+                "deadline expired" if abandoned else str(future.exception())
+            )
+            reports[robot.name] = BringUpReport(
+                name=robot.name,
+                uri=robot.uri,
+                duration=config.deadline,
+                timings=dict(robot.bringup_timings),
+                error=error,
+                abandoned=abandoned,
+            )
+            future.add_done_callback(
+                lambda _, robot=robot: release_robot(robot, logger)
+            )
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    joined = [report for report in reports.values() if report.joined]
+    log(
+        f"Swarm bring-up: {len(joined)}/{len(robots)} Crazyflies joined",
+        logger,
+    )
+    for report in reports.values():
+        log(f"  - {report}", logger, "info" if report.joined else "warn")
+
+    return reports
@@ -0,0 +1,461 @@
+import multiprocessing
+import time
+from dataclasses import astuple
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from crazyflie_swarm_pkg.crazyflie.broadcaster import parse_radio_uri
+from crazyflie_swarm_pkg.crazyflie.swarm_state_store import STATE_FIELDS
+from crazyflie_swarm_pkg.utils import ShardingConfig, log
+
+# Status of a Crazyflie in the shared tables
+STATUS_PENDING = 0
+STATUS_JOINED = 1
+STATUS_FAILED = -1
+
+# Swarm-wide commands of the shard command table
+COMMAND_TAKE_OFF = 1
+COMMAND_LAND = 2
+COMMAND_EMERGENCY_STOP = 3
+
+# Shared tables: name -> columns per row, rows are drones or shards
+DRONE_TABLES = {
+    "state": len(STATE_FIELDS),
+    "state_seq": 1,  # Seqlock of the state row, odd while it is written
+    "stamp": 1,  # Host time of the state [s], 0 if unknown, under state_seq
+    "status": 1,
+    "acks": 2,  # Sequence number of the last executed command, success
+    "velocity": 4,  # Sequence number, vx, vy, yaw_rate
+    "led": 2,  # Sequence number, intensity
+}
+SHARD_TABLES = {
+    "ready": 1,  # 1 once the bring-up of the shard is over
+    "commands": 4,  # Sequence number, command, height, duration
+}
+
+
+def shard_groups(crazyflies, config: ShardingConfig) -> List[List[str]]:
+    """
+    Splits the names of the active Crazyflies into the shards: the groups of
+    the config if given, else one shard per Crazyradio, each split again in
+    shards of at most max_drones_per_shard Crazyflies.
+
+    A Crazyradio can be claimed by a single process, so the Crazyflies of a
+    Crazyradio must all be in the same shard: groups may hold several
+    Crazyradios but not split one, and max_drones_per_shard can only split
+    the Crazyflies of other links.
+
+    Raises:
+        ValueError: If the Crazyflies of a Crazyradio are in several shards.
+    """
+    active = [cf for cf in crazyflies if cf.active]
+    if len(config.groups) > 0:
+        names = {cf.name for cf in active}
+        groups = [
+            [name for name in group if name in names]
+            for group in config.groups
+        ]
+        grouped = {name for group in groups for name in group}
+        groups.append([cf.name for cf in active if cf.name not in grouped])
+    else:
+        by_radio: Dict[str, List[str]] = {}
+        for cf in active:
+            radio = parse_radio_uri(cf.uri)
+            key = radio[0] if radio is not None else cf.uri.split(":")[0]
+            by_radio.setdefault(key, []).append(cf.name)
+        groups = list(by_radio.values())
+
+    size = config.max_drones_per_shard
+    shards = []
+    for group in groups:
+        if size <= 0:
+            shards.append(group)
+        else:
+            for start in range(0, len(group), size):
+                end = start + size
+                shards.append(group[start:end])
+    shards = [shard for shard in shards if len(shard) > 0]
+
+    radios = {cf.name: parse_radio_uri(cf.uri) for cf in active}
+    owners: Dict[str, int] = {}  # Shard of each Crazyradio
+    for k, shard in enumerate(shards):
+        for name in shard:
+            if radios[name] is None:
+                continue
+            owner = owners.setdefault(radios[name][0], k)
+            if owner != k:
+                raise ValueError(
+                    f"Crazyradio {radios[name][0]} is split between shards "
+                    + f"{owner} and {k}: a Crazyradio can be used by one "
+                    + "process only, keep its Crazyflies in the same shard"
+                )
+    return shards
+
+
+class SharedSwarmTables:
+    """
+    State and command tables of a sharded swarm, as float64 arrays in one
+    shared memory block: the main process creates it, the shard workers
+    attach to it by name.
+
+    Every row has a single writer: the state, status and ack rows of a
+    Crazyflie are written by its shard, the command rows by the main process.
+    State rows are seqlocked, so the main process never reads a row while it
+    is being written.
+    """
+
+    def __init__(self, n_drones: int, n_shards: int, name: str = None):
+        columns = {**DRONE_TABLES, **SHARD_TABLES}
+        rows = {key: n_drones for key in DRONE_TABLES}
+        rows.update({key: n_shards for key in SHARD_TABLES})
+        size = sum(rows[key] * columns[key] for key in columns) * 8
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=max(size, 8)
+            )
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.n_drones = n_drones
+        self.n_shards = n_shards
+
+        buffer = np.ndarray(
+            (size // 8,), dtype=np.float64, buffer=self.shm.buf
+        )
+        if self.owner:
+            buffer[:] = 0.0
+        self.tables: Dict[str, np.ndarray] = {}
+        offset = 0
+        for key in columns:
+            count = rows[key] * columns[key]
+            end = offset + count
+            self.tables[key] = buffer[offset:end].reshape(
+                rows[key], columns[key]
+            )
+            offset = end
+
+        self.state = self.tables["state"]
+        self.state_seq = self.tables["state_seq"][:, 0]
+        self.stamp = self.tables["stamp"][:, 0]
+        self.status = self.tables["status"][:, 0]
+        self.acks = self.tables["acks"]
+        self.velocity = self.tables["velocity"]
+        self.led = self.tables["led"]
+        self.ready = self.tables["ready"][:, 0]
+        self.commands = self.tables["commands"]
+
+    def write_state(
+        self, row: int, values: np.ndarray, stamp: float = 0.0
+    ) -> None:
+        self.state_seq[row] += 1
+        self.state[row] = values
+        self.stamp[row] = stamp
+        self.state_seq[row] += 1
+
+    def read_states(
+        self, out: np.ndarray, stamps: np.ndarray = None, retries: int = 3
+    ) -> None:
+        """
+        Copies the consistent state rows into out, and their stamps into
+        stamps if given. Rows being written are read again up to retries
+        times and otherwise keep their previous value.
+        """
+        pending = np.arange(self.n_drones)
+        for _ in range(retries + 1):
+            before = self.state_seq[pending].copy()
+            values = self.state[pending].copy()
+            values_stamps = self.stamp[pending].copy()
+            after = self.state_seq[pending]
+            consistent = (before == after) & (before % 2 == 0)
+            out[pending[consistent]] = values[consistent]
+            if stamps is not None:
+                stamps[pending[consistent]] = values_stamps[consistent]
+            pending = pending[~consistent]
+            if len(pending) == 0:
+                break
+
+    def close(self) -> None:
+        self.tables = {}
+        self.state = self.state_seq = self.stamp = None
+        self.status = self.acks = None
+        self.velocity = self.led = self.ready = self.commands = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_shard(
+    shard: int,
+    names: List[str],
+    rows: List[int],
+    swarm_config_path: str,
+    tables_name: str,
+    n_drones: int,
+    n_shards: int,
+    stop_event,
+) -> None:
+    """
+    Entry point of a shard worker process: brings up its Crazyflies, then runs
+    their control loop, writing their states to the shared tables and
+    executing the commands of the main process.
+    """
+    import cflib.crtp as crtp
+
+    from crazyflie_swarm_pkg.crazyflie.broadcaster import SwarmBroadcaster
+    from crazyflie_swarm_pkg.crazyflie.setpoint_streamer import (
+        SetpointStreamer,
+    )
+    from crazyflie_swarm_pkg.crazyflie.swarm_bringup import (
+        bring_up_swarm,
+        create_robots,
+        release_robot,
+    )
+    from crazyflie_swarm_pkg.utils import (
+        LoopScheduler,
+        SwarmConfig,
+        load_config,
+    )
+
+    config = load_config(swarm_config_path, SwarmConfig)
+    tables = SharedSwarmTables(n_drones, n_shards, name=tables_name)
+    prefix = f"[shard {shard}]"
+
+    crtp.init_drivers()
+    robots = create_robots(config, names)
+    reports = bring_up_swarm(robots, config.bringup)
+    swarm = {}
+    failed = []  # Released at shutdown
+    for robot, row in zip(robots, rows):
+        joined = reports[robot.name].joined
+        tables.status[row] = STATUS_JOINED if joined else STATUS_FAILED
+        if joined:
+            swarm[robot.name] = (robot, row)
+        else:
+            failed.append(robot)
+    tables.ready[shard] = 1
+
+    joined_robots = [robot for robot, _ in swarm.values()]
+    broadcaster = SwarmBroadcaster(joined_robots, config.broadcast)
+    broadcaster.open()
+    streamers = {
+        name: SetpointStreamer(robot, config.setpoints)
+        for name, (robot, _) in swarm.items()
+    }
+    # Command rows are written values first, sequence number last
+    last_velocity = {name: 0.0 for name in swarm}
+    last_led = {name: 0.0 for name in swarm}
+    last_command = tables.commands[shard, 0]
+
+    def update() -> None:
+        for name, (robot, _) in swarm.items():
+            try:
+                robot.update()
+            except Exception as e:
+                log(f"{prefix} Error updating {name}: {e}")
+
+    def commands() -> None:
+        nonlocal last_command
+        seq, command, height, duration = tables.commands[shard]
+        if seq != last_command:
+            last_command = seq
+            try:
+                if command == COMMAND_TAKE_OFF:
+                    results = broadcaster.take_off(height, duration)
+                elif command == COMMAND_LAND:
+                    results = broadcaster.land(duration)
+                elif command == COMMAND_EMERGENCY_STOP:
+                    results = broadcaster.emergency_stop()
+                else:
+                    results = {}
+            except Exception as e:
+                log(f"{prefix} Error executing command {command}: {e}")
+                results = {}
+            for name, (_, row) in swarm.items():
+                tables.acks[row] = (seq, float(results.get(name, False)))
+
+        for name, (robot, row) in swarm.items():
+            velocity = tables.velocity[row].copy()
+            if velocity[0] != last_velocity[name]:
+                last_velocity[name] = velocity[0]
+                streamers[name].push(*velocity[1:])
+            led = tables.led[row].copy()
+            if led[0] != last_led[name]:
+                last_led[name] = led[0]
+                robot.set_led(int(led[1]))
+
+    def setpoints() -> None:
+        for streamer in streamers.values():
+            streamer.tick()
+
+    def state() -> None:
+        for robot, row in swarm.values():
+            sample = robot.get_state_sample()
+            tables.write_state(row, astuple(sample.state), sample.stamp)
+
+    loop = LoopScheduler(config.loop.rate)
+    loop.add_stage("commands", config.loop.rate, commands)
+    loop.add_stage("update", config.loop.update_rate, update)
+    loop.add_stage("setpoints", config.setpoints.rate, setpoints)
+    loop.add_stage("state", config.state_publisher_rate, state)
+
+    try:
+        next_tick = time.monotonic()
+        while not stop_event.is_set():
+            loop.tick()
+            next_tick += loop.period
+            time.sleep(max(next_tick - time.monotonic(), 0.0))
+    finally:
+        broadcaster.close()
+        for robot, _ in swarm.values():
+            robot.destroy()
+        for robot in failed:
+            release_robot(robot)
+        tables.close()
+
+
+class ShardedSwarm:
+    """
+    Main process side of a sharded swarm: one worker process per shard owns
+    the Crazyflies of the shard, so radio I/O and log decoding of different
+    shards run on different cores, while the main process only aggregates
+    the shared state table and writes the command tables.
+    """
+
+    def __init__(self, swarm_config_path: str, config, logger=None):
+        self.config = config
+        self.logger = logger
+        self.groups = shard_groups(config.crazyflies, config.sharding)
+        self.names: List[str] = [
+            name for group in self.groups for name in group
+        ]
+        self.rows: Dict[str, int] = {
+            name: i for i, name in enumerate(self.names)
+        }
+        self.tables = SharedSwarmTables(len(self.names), len(self.groups))
+        self.__states = np.zeros_like(self.tables.state)
+        self.__stamps = np.zeros_like(self.tables.stamp)
+
+        # Spawned, not forked, so the workers do not inherit the ROS context
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        self.processes = []
+        for shard, group in enumerate(self.groups):
+            process = context.Process(
+                target=run_shard,
+                args=(
+                    shard,
+                    group,
+                    [self.rows[name] for name in group],
+                    swarm_config_path,
+                    self.tables.name,
+                    len(self.names),
+                    len(self.groups),
+                    self.stop_event,
+                ),
+                name=f"crazyflie_shard_{shard}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        log(
+            f"Swarm sharded in {len(self.groups)} processes: "
+            + "; ".join(", ".join(group) for group in self.groups),
+            self.logger,
+        )
+        self.__seq = 0
+
+    def wait_ready(self, timeout: float) -> List[str]:
+        """
+        Waits until every shard has brought up its Crazyflies.
+
+        Returns:
+            List[str]: The names of the Crazyflies that joined.
+        """
+        start = time.monotonic()
+        while (self.tables.ready < 1).any():
+            if time.monotonic() - start > timeout:
+                log("Shards bring-up timeout", self.logger, "warn")
+                break
+            time.sleep(0.1)
+        return [
+            name
+            for name in self.names
+            if self.tables.status[self.rows[name]] == STATUS_JOINED
+        ]
+
+    def read_states(
+        self,
+        out: np.ndarray,
+        rows: np.ndarray = None,
+        stamps: np.ndarray = None,
+    ) -> None:
+        """
+        Copies the states of the Crazyflies into out, row i of out receiving
+        the state of the Crazyflie in row rows[i] of the shared table, and
+        their host time stamps into stamps if given.
+        """
+        self.tables.read_states(self.__states, self.__stamps)
+        out[:] = self.__states if rows is None else self.__states[rows]
+        if stamps is not None:
+            stamps[:] = self.__stamps if rows is None else self.__stamps[rows]
+
+    def set_velocity(
+        self, name: str, vx: float, vy: float, yaw_rate: float
+    ) -> None:
+        row = self.rows[name]
+        sequence = self.tables.velocity[row, 0] + 1
+        self.tables.velocity[row, 1:] = (vx, vy, yaw_rate)
+        self.tables.velocity[row, 0] = sequence
+
+    def set_led(self, name: str, intensity: float) -> None:
+        row = self.rows[name]
+        sequence = self.tables.led[row, 0] + 1
+        self.tables.led[row, 1] = intensity
+        self.tables.led[row, 0] = sequence
+
+    def command(
+        self,
+        command: int,
+        height: float = 0.0,
+        duration: float = 0.0,
+        timeout: float = 1.0,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, bool]:
+        """
+        Sends a swarm-wide command to every shard and waits for the
+        confirmation of each Crazyflie.
+
+        Returns:
+            Dict[str, bool]: Whether each Crazyflie executed the command, keyed by name.
+        """
+        if names is None:
+            names = self.names
+        self.__seq += 1
+        seq = self.__seq
+        for shard in range(len(self.groups)):
+            self.tables.commands[shard, 1:] = (command, height, duration)
+            self.tables.commands[shard, 0] = seq
+
+        rows = np.array([self.rows[name] for name in names], dtype=int)
+        start = time.monotonic()
+        while (self.tables.acks[rows, 0] != seq).any():
+            if time.monotonic() - start > timeout:
+                break
+            time.sleep(0.005)
+        acks = self.tables.acks[rows]
+        return {
+            name: bool(ack[0] == seq and ack[1] > 0)
+            for name, ack in zip(names, acks)
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.tables.close()
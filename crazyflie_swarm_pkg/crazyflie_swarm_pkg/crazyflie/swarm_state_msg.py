@@ -0,0 +1,108 @@
+import array
+from typing import Dict, List
+
+import numpy as np
+
+from crazyflie_swarm_interfaces.msg import SwarmState
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+
+# SwarmState array fields and the number of values per drone
+SWARM_STATE_FIELDS = {
+    "position": 3,
+    "euler_orientation": 3,
+    "linear_velocity": 3,
+    "angular_velocity": 3,
+    "multiranger": 5,
+    "initial_position": 3,
+}
+
+
+def to_float32_sequence(values: np.ndarray) -> array.array:
+    """
+    Converts an array into the array.array used by rclpy for float32[]
+    fields, with a single buffer copy instead of a per-element check.
+    """
+    sequence = array.array("f")
+    sequence.frombytes(
+        np.ascontiguousarray(values, dtype=np.float32).tobytes()
+    )
+    return sequence
+
+
+def states_to_arrays(states: List[CrazyState]) -> Dict[str, np.ndarray]:
+    """
+    Stacks the states of the drones into the (N, k) arrays of the SwarmState fields.
+    """
+    n = len(states)
+    arrays = {
+        key: np.empty((n, size)) for key, size in SWARM_STATE_FIELDS.items()
+    }
+    for i, state in enumerate(states):
+        arrays["position"][i] = (state.x, state.y, state.z)
+        arrays["euler_orientation"][i] = (state.roll, state.pitch, state.yaw)
+        arrays["linear_velocity"][i] = (state.vx, state.vy, state.vz)
+        arrays["angular_velocity"][i] = (
+            state.roll_rate,
+            state.pitch_rate,
+            state.yaw_rate,
+        )
+        arrays["multiranger"][i] = (
+            state.mr_front,
+            state.mr_right,
+            state.mr_back,
+            state.mr_left,
+            state.mr_up,
+        )
+        arrays["initial_position"][i] = (
+            state.init_x,
+            state.init_y,
+            state.init_z,
+        )
+    return arrays
+
+
+def arrays_to_swarm_state_msg(
+    names: List[str],
+    uris: List[str],
+    arrays: Dict[str, np.ndarray],
+    stamps: np.ndarray = None,
+) -> SwarmState:
+    """
+    Builds a SwarmState message from the (N, k) arrays of its fields and the
+    (N,) receive times of the states, if known.
+    """
+    msg = SwarmState()
+    msg.names = list(names)
+    msg.uris = list(uris)
+    for key in SWARM_STATE_FIELDS:
+        setattr(msg, key, to_float32_sequence(arrays[key]))
+    if stamps is not None:
+        msg.stamps = array.array(
+            "d", np.asarray(stamps, dtype=np.float64).tobytes()
+        )
+    return msg
+
+
+def swarm_state_msg_to_arrays(msg: SwarmState) -> Dict[str, np.ndarray]:
+    """
+    Decodes a SwarmState message into (N, k) float32 arrays, keyed by field
+    name, without copying the message buffers.
+    """
+    n = len(msg.names)
+    return {
+        key: np.frombuffer(getattr(msg, key), dtype=np.float32).reshape(
+            n, size
+        )
+        for key, size in SWARM_STATE_FIELDS.items()
+    }
+
+
+def swarm_state_msg_stamps(msg: SwarmState) -> np.ndarray:
+    """
+    (N,) receive times of the states of a SwarmState message, zeros if the
+    publisher did not fill them.
+    """
+    stamps = np.asarray(msg.stamps, dtype=np.float64)
+    if stamps.shape[0] != len(msg.names):
+        return np.zeros(len(msg.names))
+    return stamps
@@ -0,0 +1,166 @@
+from dataclasses import fields
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from crazyflie_swarm_pkg.crazyflie.crazyflie_state import CrazyState
+
+# Columns of the store, in the order of the CrazyState fields
+STATE_FIELDS: List[str] = [f.name for f in fields(CrazyState)]
+STATE_COLUMNS: Dict[str, int] = {
+    name: i for i, name in enumerate(STATE_FIELDS)
+}
+
+# Columns of each SwarmState array field
+MSG_FIELD_COLUMNS: Dict[str, slice] = {
+    "position": slice(STATE_COLUMNS["x"], STATE_COLUMNS["z"] + 1),
+    "euler_orientation": slice(
+        STATE_COLUMNS["roll"], STATE_COLUMNS["yaw"] + 1
+    ),
+    "linear_velocity": slice(STATE_COLUMNS["vx"], STATE_COLUMNS["vz"] + 1),
+    "angular_velocity": slice(
+        STATE_COLUMNS["roll_rate"], STATE_COLUMNS["yaw_rate"] + 1
+    ),
+    "multiranger": slice(
+        STATE_COLUMNS["mr_front"], STATE_COLUMNS["mr_up"] + 1
+    ),
+    "initial_position": slice(
+        STATE_COLUMNS["init_x"], STATE_COLUMNS["init_z"] + 1
+    ),
+}
+
+
+class CrazyStateProxy:
+    """
+    CrazyState backed by one row of a SwarmStateStore: reading or writing an
+    attribute reads or writes the store, so code written for CrazyState keeps
+    working on the store without copies.
+    """
+
+    __slots__ = ("_row", "_rotation", "_rotation_attitude")
+
+    def __init__(self, row: np.ndarray):
+        self._row = row
+
+    def get_position(self) -> np.ndarray:
+        return self._row[MSG_FIELD_COLUMNS["position"]].copy()
+
+    def get_initial_position(self) -> np.ndarray:
+        return self._row[MSG_FIELD_COLUMNS["initial_position"]].copy()
+
+    def to_state(self) -> CrazyState:
+        return CrazyState(*self._row.tolist())
+
+    get_rotation_matrix = CrazyState.get_rotation_matrix
+    rel2glob = CrazyState.rel2glob
+    multiranger_to_world = CrazyState.multiranger_to_world
+    __str__ = CrazyState.__str__
+
+
+def _column_property(column: int) -> property:
+    def getter(self: CrazyStateProxy) -> float:
+        return float(self._row[column])
+
+    def setter(self: CrazyStateProxy, value: float) -> None:
+        self._row[column] = value
+
+    return property(getter, setter)
+
+
+for _name, _column in STATE_COLUMNS.items():
+    setattr(CrazyStateProxy, _name, _column_property(_column))
+
+
+class SwarmStateStore:
+    """
+    Structure-of-arrays state of the whole swarm: one preallocated float64
+    (N, F) array, with a row per drone and a column per CrazyState field.
+
+    The named attributes (positions, attitudes, ranges, ...) are views on the
+    array, so reading the state of the whole swarm never copies, and
+    store[name] returns a CrazyStateProxy for code using the CrazyState API.
+    """
+
+    def __init__(self, names: List[str]):
+        self.names: List[str] = list(names)
+        self.indices: Dict[str, int] = {
+            name: i for i, name in enumerate(self.names)
+        }
+        self.data = np.zeros((len(self.names), len(STATE_FIELDS)))
+
+        # Zero-copy views on the columns
+        self.positions = self.data[:, MSG_FIELD_COLUMNS["position"]]
+        self.attitudes = self.data[:, MSG_FIELD_COLUMNS["euler_orientation"]]
+        self.linear_velocities = self.data[
+            :, MSG_FIELD_COLUMNS["linear_velocity"]
+        ]
+        self.angular_velocities = self.data[
+            :, MSG_FIELD_COLUMNS["angular_velocity"]
+        ]
+        # front, right, back, left, up
+        self.ranges = self.data[:, MSG_FIELD_COLUMNS["multiranger"]]
+        self.initial_positions = self.data[
+            :, MSG_FIELD_COLUMNS["initial_position"]
+        ]
+        self.yaws = self.data[:, STATE_COLUMNS["yaw"]]
+        # Host time each state was received from its Crazyflie [s], 0 if unknown
+        self.stamps = np.zeros(len(self.names))
+
+        self.__proxies = [CrazyStateProxy(row) for row in self.data]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.indices
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __getitem__(self, name: str) -> CrazyStateProxy:
+        return self.__proxies[self.indices[name]]
+
+    def column(self, field: str) -> np.ndarray:
+        return self.data[:, STATE_COLUMNS[field]]
+
+    def as_dict(self) -> Dict[str, CrazyStateProxy]:
+        """
+        The swarm state as the Dict[str, CrazyState] used by Agent, backed by the store.
+        """
+        return {name: self.__proxies[i] for name, i in self.indices.items()}
+
+    def set_state(
+        self, name: str, state: CrazyState, stamp: float = None
+    ) -> None:
+        row = self.data[self.indices[name]]
+        for i, field in enumerate(STATE_FIELDS):
+            row[i] = getattr(state, field)
+        if stamp is not None:
+            self.stamps[self.indices[name]] = stamp
+
+    def msg_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Views of the store as the (N, k) arrays of the SwarmState fields.
+        """
+        return {
+            key: self.data[:, columns]
+            for key, columns in MSG_FIELD_COLUMNS.items()
+        }
+
+    def set_msg_arrays(
+        self,
+        arrays: Dict[str, np.ndarray],
+        rows: np.ndarray = None,
+        msg_rows: np.ndarray = None,
+    ) -> None:
+        """
+        Writes the (M, k) arrays of SwarmState fields into the store, row
+        msg_rows[i] of the arrays into row rows[i] of the store.
+        """
+        if rows is None:
+            rows = slice(None)
+        if msg_rows is None:
+            msg_rows = slice(None)
+        for key, columns in MSG_FIELD_COLUMNS.items():
+            if key in arrays:
+                self.data[rows, columns] = arrays[key][msg_rows]
@@ -0,0 +1,184 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from crazyflie_swarm_pkg.utils import TelemetryConfig
+
+# Data bytes of a log packet: 30 bytes CRTP payload - block id (1) - timestamp (3)
+LOG_BLOCK_MAX_BYTES = 26
+
+# Size in bytes of the log types supported by cflib
+LOG_TYPE_SIZES = {
+    "uint8_t": 1,
+    "int8_t": 1,
+    "uint16_t": 2,
+    "int16_t": 2,
+    "FP16": 2,
+    "uint32_t": 4,
+    "int32_t": 4,
+    "float": 4,
+}
+
+
+@dataclass
+class TelemetryVariable:
+    name: str  # Firmware log variable
+    fetch_as: str  # Log type transmitted over the radio
+    field: str  # CrazyState field
+    scale: float = 1.0  # CrazyState value = raw value * scale + offset
+    offset: float = 0.0
+    period_in_ms: int = 10
+
+    @property
+    def size(self) -> int:
+        return LOG_TYPE_SIZES[self.fetch_as]
+
+
+@dataclass
+class TelemetryBlock:
+    name: str
+    period_in_ms: int
+    variables: List[TelemetryVariable] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return sum(variable.size for variable in self.variables)
+
+    def decode(self, data: Dict[str, float]) -> Dict[str, float]:
+        """
+        Converts the raw values of a log packet of this block into CrazyState fields.
+        """
+        return {
+            variable.field: data[variable.name] * variable.scale
+            + variable.offset
+            for variable in self.variables
+        }
+
+
+def telemetry_variables(
+    config: TelemetryConfig, initial_position=None
+) -> List[TelemetryVariable]:
+    """
+    Lists the variables needed to fill position, velocity, attitude and
+    angular rates of a CrazyState.
+
+    When compressed, the firmware stateEstimateZ group is used:
+        - position: int16 in mm, +-32.7 m range, 1 mm resolution.
+        - velocity: int16 in mm/s, +-32.7 m/s range, 1 mm/s resolution.
+        - angular rates: int16 in mrad/s, +-32.7 rad/s range, 1 mrad/s resolution.
+    and the attitude is sent as FP16 degrees, 11 significant bits, i.e.
+    better than 0.125 deg up to 180 deg. Otherwise every variable is a float32.
+
+    Position is offset by the initial position, attitude is in degrees and
+    angular rates in rad/s, as in the rest of the stack.
+    """
+    if initial_position is None:
+        x0, y0, z0 = 0.0, 0.0, 0.0
+    else:
+        x0, y0, z0 = initial_position.x, initial_position.y, initial_position.z
+
+    pose = config.pose_period_in_ms
+    twist = config.twist_period_in_ms
+
+    if config.compressed:
+        mm = 1e-3
+        return [
+            TelemetryVariable(
+                "stateEstimateZ.x", "int16_t", "x", mm, x0, pose
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.y", "int16_t", "y", mm, y0, pose
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.z", "int16_t", "z", mm, z0, pose
+            ),
+            TelemetryVariable(
+                "stabilizer.roll", "FP16", "roll", 1.0, 0.0, pose
+            ),
+            TelemetryVariable(
+                "stabilizer.pitch", "FP16", "pitch", 1.0, 0.0, pose
+            ),
+            TelemetryVariable("stabilizer.yaw", "FP16", "yaw", 1.0, 0.0, pose),
+            TelemetryVariable(
+                "stateEstimateZ.vx", "int16_t", "vx", mm, 0.0, twist
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.vy", "int16_t", "vy", mm, 0.0, twist
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.vz", "int16_t", "vz", mm, 0.0, twist
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.rateRoll",
+                "int16_t",
+                "roll_rate",
+                mm,
+                0.0,
+                twist,
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.ratePitch",
+                "int16_t",
+                "pitch_rate",
+                mm,
+                0.0,
+                twist,
+            ),
+            TelemetryVariable(
+                "stateEstimateZ.rateYaw", "int16_t", "yaw_rate", mm, 0.0, twist
+            ),
+        ]
+
+    deg = np.pi / 180
+    return [
+        TelemetryVariable("stateEstimate.x", "float", "x", 1.0, x0, pose),
+        TelemetryVariable("stateEstimate.y", "float", "y", 1.0, y0, pose),
+        TelemetryVariable("stateEstimate.z", "float", "z", 1.0, z0, pose),
+        TelemetryVariable("stabilizer.roll", "float", "roll", 1.0, 0.0, pose),
+        TelemetryVariable(
+            "stabilizer.pitch", "float", "pitch", 1.0, 0.0, pose
+        ),
+        TelemetryVariable("stabilizer.yaw", "float", "yaw", 1.0, 0.0, pose),
+        TelemetryVariable("stateEstimate.vx", "float", "vx", 1.0, 0.0, twist),
+        TelemetryVariable("stateEstimate.vy", "float", "vy", 1.0, 0.0, twist),
+        TelemetryVariable("stateEstimate.vz", "float", "vz", 1.0, 0.0, twist),
+        TelemetryVariable("gyro.x", "float", "roll_rate", deg, 0.0, twist),
+        TelemetryVariable("gyro.y", "float", "pitch_rate", deg, 0.0, twist),
+        TelemetryVariable("gyro.z", "float", "yaw_rate", deg, 0.0, twist),
+    ]
+
+
+def pack_blocks(
+    variables: List[TelemetryVariable],
+    max_bytes: int = LOG_BLOCK_MAX_BYTES,
+) -> List[TelemetryBlock]:
+    """
+    Packs the variables into the fewest log blocks, so the fewest radio
+    packets. Variables logged at the same period share the blocks, which are
+    filled first-fit by decreasing size without exceeding max_bytes.
+    """
+    blocks: List[TelemetryBlock] = []
+    periods = sorted({variable.period_in_ms for variable in variables})
+    for period in periods:
+        same_period = [v for v in variables if v.period_in_ms == period]
+        period_blocks: List[TelemetryBlock] = []
+        for variable in sorted(same_period, key=lambda v: -v.size):
+            if variable.size > max_bytes:
+                raise ValueError(
+                    f"{variable.name} does not fit in a log block"
+                )
+            for block in period_blocks:
+                if block.size + variable.size <= max_bytes:
+                    block.variables.append(variable)
+                    break
+            else:
+                period_blocks.append(
+                    TelemetryBlock(
+                        name=f"Telemetry{period}ms_{len(period_blocks)}",
+                        period_in_ms=period,
+                        variables=[variable],
+                    )
+                )
+        blocks += period_blocks
+    return blocks
@@ -1,17 +1,48 @@
 import time
-from typing import Dict
+from typing import Dict, List
 
 import cflib.crtp as crtp
+import numpy as np
 import rclpy
+from diagnostic_msgs.msg import DiagnosticArray
 from geometry_msgs.msg import Twist
-from std_srvs.srv import Empty
 from rclpy.node import Node, Publisher, Subscription
 from std_msgs.msg import Float32
+from std_srvs.srv import Empty
 
-from crazyflie_swarm_interfaces.msg import CrazyflieState
+from crazyflie_swarm_interfaces.msg import CrazyflieState, SwarmState
 from crazyflie_swarm_interfaces.srv import Land, TakeOff
-from crazyflie_swarm_pkg.crazyflie import CrazyflieRobot
-from crazyflie_swarm_pkg.utils import SwarmConfig, load_config
+from crazyflie_swarm_pkg.crazyflie import (
+    CrazyflieRobot,
+    SetpointStreamer,
+    ShardedSwarm,
+    SwarmBroadcaster,
+    SwarmStateStore,
+    bring_up_swarm,
+    release_robot,
+)
+from crazyflie_swarm_pkg.crazyflie.latency_msg import (
+    latency_diagnostics,
+    seconds_to_stamp,
+)
+from crazyflie_swarm_pkg.crazyflie.swarm_bringup import create_robots
+from crazyflie_swarm_pkg.crazyflie.swarm_shards import (
+    COMMAND_EMERGENCY_STOP,
+    COMMAND_LAND,
+    COMMAND_TAKE_OFF,
+)
+from crazyflie_swarm_pkg.crazyflie.swarm_state_msg import (
+    arrays_to_swarm_state_msg,
+)
+from crazyflie_swarm_pkg.utils import (
+    LatencyTracer,
+    LoopScheduler,
+    SwarmConfig,
+    load_config,
+)
+
+# Latency stages of this node, from the reception of a pose or a command
+LATENCY_STAGES = ["pose_to_publish", "command_to_setpoint"]
 
 
 class CrazyflieSwarmNode(Node):
@@ -33,36 +64,68 @@ class CrazyflieSwarmNode(Node):
             self.get_logger().info(f"  - {cf_config.name}: {cf_config.uri}")
 
         # * CrazyflieSwarm
-        crtp.init_drivers()
-
         self.swarm: Dict[str, CrazyflieRobot] = {}
-        for crazyflie_config in self.config.crazyflies:
-            if crazyflie_config.active is False:
-                continue
-            uri = crazyflie_config.uri
-            name = crazyflie_config.name
-            multiranger = crazyflie_config.multiranger
-            initial_position = crazyflie_config.initial_position
-            height = crazyflie_config.takeoff_height
-            duration = crazyflie_config.takeoff_duration
-            crazyflie_robot = CrazyflieRobot(
-                uri=uri,
-                name=name,
-                ro_cache="./ro_cache",
-                rw_cache="./rw_cache",
+        self.bringup_reports = {}
+        self.failed_robots: List[CrazyflieRobot] = []  # Released at shutdown
+        self.shards = None
+        if self.config.sharding.enabled:
+            # The shard processes own the Crazyflies, this node only aggregates
+            self.shards = ShardedSwarm(
+                swarm_config_path, self.config, self.get_logger()
+            )
+            self.names: List[str] = self.shards.wait_ready(
+                self.config.bringup.deadline + 5.0
+            )
+        else:
+            crtp.init_drivers()
+            robots = create_robots(self.config, logger=self.get_logger())
+            self.bringup_reports = bring_up_swarm(
+                robots, self.config.bringup, self.get_logger()
+            )
+            for crazyflie_robot in robots:
+                if self.bringup_reports[crazyflie_robot.name].joined:
+                    self.swarm[crazyflie_robot.name] = crazyflie_robot
+                else:
+                    self.failed_robots.append(crazyflie_robot)
+            self.names: List[str] = list(self.swarm.keys())
+
+        # * Swarm-wide commands, broadcast per Crazyradio and channel
+        self.broadcaster = SwarmBroadcaster(
+            list(self.swarm.values()), self.config.broadcast, self.get_logger()
+        )
+        self.broadcaster.open()
+
+        # * Latency tracing
+        self.tracer = None
+        if self.config.latency.enabled:
+            self.tracer = LatencyTracer(LATENCY_STAGES)
+            self.diagnostics_publisher = self.create_publisher(
+                DiagnosticArray, self.config.latency.topic, 10
+            )
+
+        # * Velocity setpoints, streamed at a fixed rate per Crazyflie
+        self.setpoint_streamers: Dict[str, SetpointStreamer] = {
+            name: SetpointStreamer(
+                cf,
+                self.config.setpoints,
                 logger=self.get_logger(),
-                multiranger=multiranger,
-                initial_position=initial_position,
-                default_take_off_height=height,
-                default_take_off_duration=duration
+                tracer=self.tracer,
+            )
+            for name, cf in self.swarm.items()
+        }
+
+        # * Swarm State
+        self.swarm_state = SwarmStateStore(self.names)
+        uris = {cf.name: cf.uri for cf in self.config.crazyflies}
+        self.uris: List[str] = [uris[name] for name in self.names]
+        if self.shards is not None:
+            self.__shard_rows = np.array(
+                [self.shards.rows[name] for name in self.names], dtype=int
             )
-            while not crazyflie_robot.initialize():
-                time.sleep(0.5)
-            self.swarm[name] = crazyflie_robot
 
         # * Subscriptions
         self.led_subscribers: Dict[str, Subscription] = {}
-        for name, _ in self.swarm.items():
+        for name in self.names:
             self.led_subscribers[name] = self.create_subscription(
                 Float32,
                 f"/{name}/led",
@@ -71,7 +134,7 @@ class CrazyflieSwarmNode(Node):
             )
 
         self.velocity_subscribers: Dict[str, Subscription] = {}
-        for name, _ in self.swarm.items():
+        for name in self.names:
             self.velocity_subscribers[name] = self.create_subscription(
                 Twist,
                 f"/{name}/cmd_vel",
@@ -81,17 +144,16 @@ class CrazyflieSwarmNode(Node):
 
         # * Publishers
         self.state_publishers: Dict[str, Publisher] = {}
-        state_publisher_rate = self.config.state_publisher_rate
-        for name, _ in self.swarm.items():
-            publisher = self.create_publisher(
-                CrazyflieState, f"/{name}/state", 10
-            )
-            self.state_publishers[name] = publisher
-            self.create_timer(
-                1 / state_publisher_rate,
-                lambda name=name, publisher=publisher: self.state_callback(
-                    name, publisher
-                ),
+        if self.config.drone_states:
+            for name in self.names:
+                self.state_publishers[name] = self.create_publisher(
+                    CrazyflieState, f"/{name}/state", 10
+                )
+
+        self.swarm_state_publisher = None
+        if self.config.swarm_state_topic:
+            self.swarm_state_publisher = self.create_publisher(
+                SwarmState, self.config.swarm_state_topic, 10
             )
 
         # * Services
@@ -101,19 +163,130 @@ class CrazyflieSwarmNode(Node):
         self.land_service = self.create_service(
             Land, "/land", self.land_service_callback
         )
+        self.emergency_stop_service = self.create_service(
+            Empty, "/emergency_stop", self.emergency_stop_service_callback
+        )
         
-        # * Timers
-        for name, _ in self.swarm.items():
-            self.create_timer(0.1, lambda name=name: self.update_robot(name))
+        # * Control loop: a single timer runs every stage in a fixed order
+        loop_config = self.config.loop
+        self.loop = LoopScheduler(loop_config.rate)
+        self.loop.add_stage(
+            "update", loop_config.update_rate, self.update_callback
+        )
+        self.loop.add_stage(
+            "setpoints", self.config.setpoints.rate, self.setpoints_callback
+        )
+        self.loop.add_stage(
+            "state", self.config.state_publisher_rate, self.state_callback
+        )
+        if loop_config.stats_rate > 0:
+            self.loop.add_stage(
+                "stats", loop_config.stats_rate, self.loop_stats_callback
+            )
+        if self.tracer is not None and self.config.latency.publish_rate > 0:
+            self.loop.add_stage(
+                "latency",
+                self.config.latency.publish_rate,
+                self.latency_callback,
+            )
+        self.create_timer(1 / loop_config.rate, self.loop.tick)
+
+    # * Control Loop Stages
+    def update_callback(self) -> None:
+        for name, cf in self.swarm.items():
+            try:
+                cf.update()
+            except Exception as e:
+                self.get_logger().error(f"Error updating {name}: {e}")
+
+    def setpoints_callback(self) -> None:
+        for streamer in self.setpoint_streamers.values():
+            streamer.tick()
+
+    def state_callback(self) -> None:
+        if self.shards is not None:
+            self.shards_state_callback()
+            return
+
+        try:
+            for name, cf in self.swarm.items():
+                sample = cf.get_state_sample()
+                self.swarm_state.set_state(name, sample.state, sample.stamp)
+                if name in self.state_publishers:
+                    state_msg = self.build_state_msg(sample.state)
+                    state_msg.header.stamp = seconds_to_stamp(sample.stamp)
+                    state_msg.header.frame_id = "world"
+                    self.state_publishers[name].publish(state_msg)
+
+            self.publish_swarm_state()
+            self.trace_states()
+
+        except Exception as e:
+            self.get_logger().error(f"Error in state_callback: {e}")
+
+    def trace_states(self) -> None:
+        if self.tracer is not None:
+            stamps = self.swarm_state.stamps
+            self.tracer.record_many(
+                "pose_to_publish", time.time() - stamps[stamps > 0]
+            )
+
+    def shards_state_callback(self) -> None:
+        try:
+            self.shards.read_states(
+                self.swarm_state.data,
+                self.__shard_rows,
+                self.swarm_state.stamps,
+            )
+            for name, publisher in self.state_publishers.items():
+                i = self.swarm_state.indices[name]
+                state_msg = self.build_state_msg(self.swarm_state[name])
+                state_msg.header.stamp = seconds_to_stamp(
+                    self.swarm_state.stamps[i]
+                )
+                state_msg.header.frame_id = "world"
+                publisher.publish(state_msg)
+            self.publish_swarm_state()
+            self.trace_states()
+
+        except Exception as e:
+            self.get_logger().error(f"Error in shards_state_callback: {e}")
+
+    def publish_swarm_state(self) -> None:
+        if self.swarm_state_publisher is None:
+            return
+        swarm_state_msg = arrays_to_swarm_state_msg(
+            self.swarm_state.names,
+            self.uris,
+            self.swarm_state.msg_arrays(),
+            self.swarm_state.stamps,
+        )
+        swarm_state_msg.header.stamp = self.get_clock().now().to_msg()
+        swarm_state_msg.header.frame_id = "world"
+        self.swarm_state_publisher.publish(swarm_state_msg)
+
+    def latency_callback(self) -> None:
+        self.diagnostics_publisher.publish(
+            latency_diagnostics(
+                self.tracer,
+                self.get_name(),
+                self.config.latency.warn_threshold,
+                self.config.latency.window,
+            )
+        )
 
-    # *Timers Callbacks
-    def update_robot(self, name) -> None:
-        self.swarm[name].update()
+    def loop_stats_callback(self) -> None:
+        self.get_logger().info(self.loop.report())
+        for name, streamer in self.setpoint_streamers.items():
+            self.get_logger().info(f"Setpoints of {name}: {streamer.stats}")
 
     # * Subscribers Callbacks
     def led_callback(self, msg, name: str) -> None:
         try:
-            self.swarm[name].set_led(int(msg.data))
+            if self.shards is not None:
+                self.shards.set_led(name, msg.data)
+            else:
+                self.swarm[name].set_led(int(msg.data))
 
         except Exception as e:
             self.get_logger().error(f"Error in led_callback: {e}")
@@ -124,46 +297,45 @@ class CrazyflieSwarmNode(Node):
         yaw_rate = msg.angular.z
 
         try:
-            self.swarm[name].set_velocity(velocity_x, velocity_y, yaw_rate)
-            pass
+            if self.shards is not None:
+                self.shards.set_velocity(name, velocity_x, velocity_y, yaw_rate)
+            else:
+                self.setpoint_streamers[name].push(
+                    velocity_x, velocity_y, yaw_rate
+                )
         except Exception as e:
             self.get_logger().error(f"Error in velocity_callback: {e}")
 
-    # * Publishers Callbacks
-    def state_callback(self, name, publisher) -> None:
-        try:
-            state = self.swarm[name].get_state()
-
-            state_msg = CrazyflieState()
-
-            state_msg.position[0] = state.x
-            state_msg.position[1] = state.y
-            state_msg.position[2] = state.z
-            state_msg.euler_orientation[0] = state.roll
-            state_msg.euler_orientation[1] = state.pitch
-            state_msg.euler_orientation[2] = state.yaw
-
-            state_msg.linear_velocity[0] = state.vx
-            state_msg.linear_velocity[1] = state.vy
-            state_msg.linear_velocity[2] = state.vz
-            state_msg.angular_velocity[0] = state.roll_rate
-            state_msg.angular_velocity[1] = state.pitch_rate
-            state_msg.angular_velocity[2] = state.yaw_rate
-
-            state_msg.multiranger[0] = state.mr_front
-            state_msg.multiranger[1] = state.mr_right
-            state_msg.multiranger[2] = state.mr_back
-            state_msg.multiranger[3] = state.mr_left
-            state_msg.multiranger[4] = state.mr_up
-
-            state_msg.initial_position[0] = state.init_x
-            state_msg.initial_position[1] = state.init_y
-            state_msg.initial_position[2] = state.init_z
-
-            publisher.publish(state_msg)
-
-        except Exception as e:
-            self.get_logger().error(f"Error in state_callback: {e}")
+    # * Messages
+    @staticmethod
+    def build_state_msg(state) -> CrazyflieState:
+        state_msg = CrazyflieState()
+
+        state_msg.position[0] = state.x
+        state_msg.position[1] = state.y
+        state_msg.position[2] = state.z
+        state_msg.euler_orientation[0] = state.roll
+        state_msg.euler_orientation[1] = state.pitch
+        state_msg.euler_orientation[2] = state.yaw
+
+        state_msg.linear_velocity[0] = state.vx
+        state_msg.linear_velocity[1] = state.vy
+        state_msg.linear_velocity[2] = state.vz
+        state_msg.angular_velocity[0] = state.roll_rate
+        state_msg.angular_velocity[1] = state.pitch_rate
+        state_msg.angular_velocity[2] = state.yaw_rate
+
+        state_msg.multiranger[0] = state.mr_front
+        state_msg.multiranger[1] = state.mr_right
+        state_msg.multiranger[2] = state.mr_back
+        state_msg.multiranger[3] = state.mr_left
+        state_msg.multiranger[4] = state.mr_up
+
+        state_msg.initial_position[0] = state.init_x
+        state_msg.initial_position[1] = state.init_y
+        state_msg.initial_position[2] = state.init_z
+
+        return state_msg
 
     # * Services Callbacks
     def take_off_service_callback(self, request, response):
@@ -171,9 +343,11 @@ class CrazyflieSwarmNode(Node):
             height = request.height
             duration = request.duration
             self.get_logger().info(f"Take off at {height}m for {duration}s")
-            for name, cf in self.swarm.items():
-                cf.take_off(height, duration)
-            response.success = True
+            if self.shards is not None:
+                results = self.shards_command(COMMAND_TAKE_OFF, height, duration)
+            else:
+                results = self.broadcaster.take_off(height, duration)
+            response.success = all(results.values())
 
         except Exception as e:
             self.get_logger().error(f"Error in take_off_callback: {e}")
@@ -185,9 +359,11 @@ class CrazyflieSwarmNode(Node):
         try:
             self.get_logger().info(f"Land at 0m for {request.duration}s")
             duration = request.duration
-            for name, cf in self.swarm.items():
-                cf.land(duration)
-            response.success = True
+            if self.shards is not None:
+                results = self.shards_command(COMMAND_LAND, duration=duration)
+            else:
+                results = self.broadcaster.land(duration)
+            response.success = all(results.values())
 
         except Exception as e:
             self.get_logger().error(f"Error in land_callback: {e}")
@@ -195,10 +371,37 @@ class CrazyflieSwarmNode(Node):
 
         return response
 
+    def emergency_stop_service_callback(self, request, response):
+        self.get_logger().warn("Emergency stop")
+        if self.shards is not None:
+            results = self.shards_command(COMMAND_EMERGENCY_STOP)
+        else:
+            results = self.broadcaster.emergency_stop()
+        failed = [name for name, success in results.items() if not success]
+        if failed:
+            self.get_logger().error(f"Emergency stop not confirmed by {failed}")
+        return response
+
+    def shards_command(
+        self, command: int, height: float = 0.0, duration: float = 0.0
+    ) -> Dict[str, bool]:
+        return self.shards.command(
+            command,
+            height,
+            duration,
+            timeout=self.config.sharding.command_timeout,
+            names=self.names,
+        )
+
     # * Destroy Node Handler
     def destroy_node(self):
+        self.broadcaster.close()
+        if self.shards is not None:
+            self.shards.close()
         for name, cf in self.swarm.items():
             cf.destroy()
+        for robot in self.failed_robots:
+            release_robot(robot, self.get_logger())
         super().destroy_node()
 
 
@@ -0,0 +1,200 @@
+import os
+import time
+from typing import Any, List
+
+import numpy as np
+import rclpy
+from geometry_msgs.msg import Twist
+from rclpy.node import Node
+from std_msgs.msg import Float64MultiArray
+
+from crazyflie_swarm_interfaces.msg import CrazyflieState, SwarmState
+from crazyflie_swarm_pkg.crazyflie.latency_msg import stamp_to_seconds
+from crazyflie_swarm_pkg.crazyflie.swarm_state_msg import (
+    SWARM_STATE_FIELDS,
+    swarm_state_msg_stamps,
+    swarm_state_msg_to_arrays,
+)
+from crazyflie_swarm_pkg.utils import SwarmConfig, load_config
+from crazyflie_swarm_pkg.utils.flight_recorder import (
+    ColumnSpec,
+    FlightRecorder,
+)
+
+# Columns of the state stream, with the time the state was received from its Crazyflie
+STATE_COLUMNS = [ColumnSpec("stamp", "float64")] + [
+    ColumnSpec(key, "float32", (size,))
+    for key, size in SWARM_STATE_FIELDS.items()
+    if key != "initial_position"
+]
+CMD_VEL_COLUMNS = [
+    ColumnSpec("linear", "float64", (3,)),
+    ColumnSpec("angular", "float64", (3,)),
+]
+
+
+class FlightRecorderNode(Node):
+    """
+    Records the states of the swarm, the cmd_vel commands and the flocking
+    telemetry of a flight with a FlightRecorder, in a new directory per run.
+    Samples are timed with the receive time of this node.
+    """
+
+    def __init__(self):
+        super().__init__("flight_recorder_node")
+
+        # * Load Config
+        self.declare_parameter("swarm_config_path", "")
+        swarm_config_path = (
+            self.get_parameter("swarm_config_path")
+            .get_parameter_value()
+            .string_value
+        )
+        self.config = load_config(swarm_config_path, SwarmConfig)
+        recorder_config = self.config.recorder
+
+        # * Recorder
+        self.names: List[str] = [
+            cf.name for cf in self.config.crazyflies if cf.active
+        ]
+        self.indices = {name: i for i, name in enumerate(self.names)}
+        directory = os.path.join(
+            recorder_config.directory, time.strftime("flight_%Y%m%d_%H%M%S")
+        )
+        self.recorder = FlightRecorder(
+            directory, self.names, recorder_config.chunk_size
+        )
+        self.state_stream = self.recorder.add_stream("state", STATE_COLUMNS)
+        self.cmd_vel_stream = None
+        if recorder_config.cmd_vel:
+            self.cmd_vel_stream = self.recorder.add_stream(
+                "cmd_vel", CMD_VEL_COLUMNS
+            )
+        self.flocking_stream = None  # Created with the first message
+        self.__msg_names: List[str] = []
+        self.__msg_rows = np.zeros(0, dtype=int)
+        self.__drones = np.zeros(0, dtype=np.int16)
+        self.get_logger().info(
+            f"FlightRecorderNode recording {len(self.names)} drones in {directory}"
+        )
+
+        # * Subscriptions
+        if self.config.swarm_state_topic:
+            self.create_subscription(
+                SwarmState,
+                self.config.swarm_state_topic,
+                self.swarm_state_callback,
+                10,
+            )
+        else:
+            for name in self.names:
+                self.create_subscription(
+                    CrazyflieState,
+                    f"/{name}/state",
+                    lambda msg, name=name: self.state_callback(msg, name),
+                    10,
+                )
+        if self.cmd_vel_stream is not None:
+            for name in self.names:
+                self.create_subscription(
+                    Twist,
+                    f"/{name}/cmd_vel",
+                    lambda msg, name=name: self.cmd_vel_callback(msg, name),
+                    10,
+                )
+        if recorder_config.flocking_topic:
+            self.create_subscription(
+                Float64MultiArray,
+                recorder_config.flocking_topic,
+                self.flocking_callback,
+                10,
+            )
+
+        # * Timers
+        if recorder_config.meta_period > 0:
+            self.create_timer(
+                recorder_config.meta_period, self.recorder.write_meta
+            )
+
+    def now(self) -> float:
+        return self.get_clock().now().nanoseconds * 1e-9
+
+    def state_callback(self, msg: CrazyflieState, name: str) -> None:
+        self.state_stream.append(
+            self.now(),
+            self.indices[name],
+            stamp=stamp_to_seconds(msg.header.stamp),
+            position=msg.position,
+            euler_orientation=msg.euler_orientation,
+            linear_velocity=msg.linear_velocity,
+            angular_velocity=msg.angular_velocity,
+            multiranger=msg.multiranger,
+        )
+
+    def swarm_state_callback(self, msg: SwarmState) -> None:
+        if msg.names != self.__msg_names:
+            # Rows of the message and of the recording of the recorded drones
+            self.__msg_names = list(msg.names)
+            rows = [
+                (j, self.indices[name])
+                for j, name in enumerate(msg.names)
+                if name in self.indices
+            ]
+            self.__msg_rows = np.array([j for j, _ in rows], dtype=int)
+            self.__drones = np.array([i for _, i in rows], dtype=np.int16)
+
+        arrays = swarm_state_msg_to_arrays(msg)
+        rows = self.__msg_rows
+        self.state_stream.append_rows(
+            self.now(),
+            self.__drones,
+            stamp=swarm_state_msg_stamps(msg)[rows],
+            **{
+                column.name: arrays[column.name][rows]
+                for column in STATE_COLUMNS[1:]
+            },
+        )
+
+    def cmd_vel_callback(self, msg: Twist, name: str) -> None:
+        self.cmd_vel_stream.append(
+            self.now(),
+            self.indices[name],
+            linear=(msg.linear.x, msg.linear.y, msg.linear.z),
+            angular=(msg.angular.x, msg.angular.y, msg.angular.z),
+        )
+
+    def flocking_callback(self, msg: Float64MultiArray) -> None:
+        """
+        Records the (drone, field) telemetry of the flocking node, whose rows
+        follow the active drones of the swarm config as in this node.
+        """
+        n, fields = (dim.size for dim in msg.layout.dim)
+        if self.flocking_stream is None:
+            self.flocking_stream = self.recorder.add_stream(
+                "flocking", [ColumnSpec("values", "float64", (fields,))]
+            )
+            self.__flocking_drones = np.arange(n, dtype=np.int16)
+        values = np.asarray(msg.data, dtype=np.float64).reshape(n, fields)
+        self.flocking_stream.append_rows(
+            self.now(), self.__flocking_drones, values=values
+        )
+
+    def destroy_node(self) -> None:
+        self.recorder.close()
+        self.get_logger().info(f"Flight recorded in {self.recorder.directory}")
+        super().destroy_node()
+
+
+def main(args: Any = None) -> None:
+    rclpy.init(args=args)
+    flight_recorder_node = FlightRecorderNode()
+    try:
+        rclpy.spin(flight_recorder_node)
+    except KeyboardInterrupt:
+        pass
+    flight_recorder_node.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
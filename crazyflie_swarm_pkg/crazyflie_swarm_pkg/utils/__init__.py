@@ -1,13 +1,44 @@
-from .configuration import CrazyflieConfig, SwarmConfig
+from .configuration import (
+    BringUpConfig,
+    BroadcastConfig,
+    CrazyflieConfig,
+    LatencyConfig,
+    LoopConfig,
+    RangeFilterConfig,
+    RecorderConfig,
+    SetpointConfig,
+    ShardingConfig,
+    SwarmConfig,
+    TelemetryConfig,
+)
 from .definitions import RangeDirection
-from .ringbuffer import RingBuffer
+from .flight_recorder import ColumnSpec, FlightLog, FlightRecorder
+from .latency import LatencyHistogram, LatencyTracer
+from .ringbuffer import MultiChannelRingBuffer, RingBuffer
+from .scheduler import LoopScheduler
 from .utils import load_config, log
 
 __all__ = [
     log,
     load_config,
+    BringUpConfig,
+    BroadcastConfig,
     CrazyflieConfig,
+    LatencyConfig,
+    LoopConfig,
+    RangeFilterConfig,
+    RecorderConfig,
+    SetpointConfig,
+    ShardingConfig,
     SwarmConfig,
+    TelemetryConfig,
     RingBuffer,
+    MultiChannelRingBuffer,
+    LoopScheduler,
     RangeDirection,
+    ColumnSpec,
+    FlightLog,
+    FlightRecorder,
+    LatencyHistogram,
+    LatencyTracer,
 ]
@@ -22,12 +22,113 @@ class CrazyflieConfig:
     initial_position: Position = MISSING
 
 
+@dataclass
+class BringUpConfig:
+    # Attempts per Crazyflie, 0 retries until the deadline
+    max_attempts: int = 3
+    retry_delay: float = 0.5  # Delay before the first retry [s]
+    retry_backoff: float = 2.0  # Multiplier of the delay after every retry
+    # Link, TOC and decks deadline per attempt [s]
+    connection_timeout: float = 10.0
+    estimator_timeout: float = 20.0  # Estimator reset deadline per attempt [s]
+    # Overall deadline of the bring-up of a Crazyflie [s]
+    deadline: float = 60.0
+    # Front, right, back or left range under which a flying Crazyflie stops [m]
+    emergency_stop_distance: float = 0.3
+
+
+@dataclass
+class TelemetryConfig:
+    compressed: bool = True  # int16/FP16 log variables instead of float32
+    pose_period_in_ms: int = 10  # Position and attitude log period [ms]
+    twist_period_in_ms: int = 10  # Linear and angular velocity log period [ms]
+
+
+@dataclass
+class RangeFilterConfig:
+    buffer_size: int = 10  # Multiranger samples in the filter window
+    filter: str = "mean"  # Filter of the window: mean, median or min
+
+
+@dataclass
+class BroadcastConfig:
+    enabled: bool = True  # One broadcast packet per Crazyradio and channel
+    # After the broadcast, resend the command to each Crazyflie on its link
+    confirm: bool = True
+    # Broadcast packets per command, broadcasts are not acknowledged
+    repeats: int = 1
+
+
+@dataclass
+class SetpointConfig:
+    rate: float = 10.0  # Setpoints send rate per Crazyflie [Hz]
+    # Commands kept between two sends, the oldest are dropped
+    queue_size: int = 4
+    keepalive: bool = True  # Resend the last setpoint when no command arrives
+    # Hold in place after this long without commands [s], 0 never
+    command_timeout: float = 0.5
+
+
+@dataclass
+class ShardingConfig:
+    enabled: bool = False  # One worker process per shard of Crazyflies
+    # Names per shard, empty: one shard per Crazyradio
+    groups: List[List[str]] = field(default_factory=list)
+    # Split bigger shards, 0 never. A Crazyradio cannot be split between shards
+    max_drones_per_shard: int = 0
+    # Confirmation deadline of the swarm-wide commands [s]
+    command_timeout: float = 1.0
+
+
+@dataclass
+class RecorderConfig:
+    # A flight_{date}_{time} recording per run is created here
+    directory: str = "/tmp/flights"
+    chunk_size: int = 4096  # Samples per chunk file of every stream
+    cmd_vel: bool = True  # Record the /{name}/cmd_vel commands
+    # Flocking telemetry, "" disables it
+    flocking_topic: str = "/flocking/telemetry"
+    # Period of the index updates, recovered on crashes [s]
+    meta_period: float = 1.0
+
+
+@dataclass
+class LatencyConfig:
+    enabled: bool = True  # Trace the latency of the stages of the control loop
+    # Rate of the latency histograms on the topic [Hz]
+    publish_rate: float = 0.2
+    topic: str = "/diagnostics"
+    # Reset the histograms once published, else since the start
+    window: bool = True
+    # Stages with a p90 above it are reported as warnings [s]
+    warn_threshold: float = 0.3
+
+
+@dataclass
+class LoopConfig:
+    rate: float = 10.0  # Control loop tick rate [Hz]
+    update_rate: float = 10.0  # Crazyflies update rate [Hz]
+    # Jitter and overruns report rate [Hz], 0 disables it
+    stats_rate: float = 0.1
+
+
 @dataclass
 class SwarmConfig:
     dt: float = field(default=0.01)
     state_publisher_rate: float = field(default=10.0)
     led_publisher_rate: float = field(default=1.0)
     velocity_publisher_rate: float = field(default=1.0)
+    swarm_state_topic: str = field(default="/swarm/state")  # "" disables it
+    drone_states: bool = field(default=True)  # Also publish /{name}/state
+    loop: LoopConfig = field(default_factory=LoopConfig)
+    bringup: BringUpConfig = field(default_factory=BringUpConfig)
+    broadcast: BroadcastConfig = field(default_factory=BroadcastConfig)
+    setpoints: SetpointConfig = field(default_factory=SetpointConfig)
+    sharding: ShardingConfig = field(default_factory=ShardingConfig)
+    telemetry: TelemetryConfig = field(default_factory=TelemetryConfig)
+    range_filter: RangeFilterConfig = field(default_factory=RangeFilterConfig)
+    recorder: RecorderConfig = field(default_factory=RecorderConfig)
+    latency: LatencyConfig = field(default_factory=LatencyConfig)
     crazyflies: List[CrazyflieConfig] = field(
         default_factory=list[CrazyflieConfig]
     )
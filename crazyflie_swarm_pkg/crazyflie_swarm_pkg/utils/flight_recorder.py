@@ -0,0 +1,376 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+META_FILE = "meta.json"
+
+# Columns of every stream, in front of the ones of the stream
+TIME_COLUMN = "time"  # Time of the sample [s], float64
+DRONE_COLUMN = "drone"  # Row of the drone in the names of the recording, int16
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    dtype: str
+    shape: Tuple[int, ...] = ()  # Shape of the value of a single sample
+
+
+def chunk_file(directory: str, stream: str, column: str, chunk: int) -> str:
+    return os.path.join(directory, stream, f"{column}.{chunk:06d}.npy")
+
+
+class RecorderStream:
+    """
+    Append-only columnar stream of a FlightRecorder.
+
+    Samples are written straight into the memory-mapped .npy files of the
+    current chunk, one file per column with chunk_size preallocated rows.
+    The files of the next chunk are created in the background while the
+    current one fills, so that a rollover only swaps the memory maps.
+    """
+
+    def __init__(
+        self,
+        recorder: "FlightRecorder",
+        name: str,
+        columns: List[ColumnSpec],
+        chunk_size: int,
+    ):
+        self.recorder = recorder
+        self.name = name
+        self.columns = [
+            ColumnSpec(TIME_COLUMN, "float64"),
+            ColumnSpec(DRONE_COLUMN, "int16"),
+            *columns,
+        ]
+        self.chunk_size = chunk_size
+        # rows, t_start and t_end of the closed chunks
+        self.chunks: List[Dict] = []
+        self.rows = 0  # Rows written in the current chunk
+        self.samples = 0
+
+        os.makedirs(os.path.join(recorder.directory, name), exist_ok=True)
+        self.__chunk = 0
+        self.__maps = self.__create_chunk(0)
+        self.__spare = None
+        self.__worker = None
+        self.__prepare_spare()
+
+    def __create_chunk(self, chunk: int) -> Dict[str, np.memmap]:
+        maps = {}
+        for column in self.columns:
+            maps[column.name] = np.lib.format.open_memmap(
+                chunk_file(
+                    self.recorder.directory, self.name, column.name, chunk
+                ),
+                mode="w+",
+                dtype=np.dtype(column.dtype),
+                shape=(self.chunk_size, *column.shape),
+            )
+        maps[TIME_COLUMN][:] = np.nan
+        return maps
+
+    def __prepare_spare(self, full: Dict[str, np.memmap] = None) -> None:
+        def work(chunk):
+            if full is not None:
+                for array in full.values():
+                    array.flush()
+                self.recorder.write_meta()
+            self.__spare = self.__create_chunk(chunk)
+
+        self.__worker = threading.Thread(
+            target=work, args=(self.__chunk + 1,), daemon=True
+        )
+        self.__worker.start()
+
+    def __current_chunk(self) -> Dict:
+        time = self.__maps[TIME_COLUMN]
+        return {
+            "rows": self.rows,
+            "t_start": float(time[0]),
+            "t_end": float(time[self.rows - 1]),
+        }
+
+    def __rollover(self) -> None:
+        self.__worker.join()
+        full = self.__maps
+        with self.recorder.lock:  # The index may be written by another stream
+            self.chunks.append(self.__current_chunk())
+            self.__maps = self.__spare
+            self.__chunk += 1
+            self.rows = 0
+        self.__spare = None
+        self.__prepare_spare(full)
+
+    def append(self, time: float, drone: int, **values) -> None:
+        """
+        Appends one sample. Missing columns keep zeros.
+        """
+        if self.rows == self.chunk_size:
+            self.__rollover()
+        row = self.rows
+        maps = self.__maps
+        maps[TIME_COLUMN][row] = time
+        maps[DRONE_COLUMN][row] = drone
+        for key, value in values.items():
+            maps[key][row] = value
+        self.rows += 1
+        self.samples += 1
+
+    def append_rows(
+        self, time, drones: np.ndarray, **values: np.ndarray
+    ) -> None:
+        """
+        Appends K samples at once, e.g. the states of the whole swarm.
+
+        Args:
+            time (float or np.ndarray): Time of the samples, scalar or (K,).
+            drones (np.ndarray): (K,) rows of the drones.
+            values (np.ndarray): (K, *shape) values of the columns.
+        """
+        drones = np.asarray(drones)
+        k = drones.shape[0]
+        start = 0
+        while start < k:
+            if self.rows == self.chunk_size:
+                self.__rollover()
+            count = min(k - start, self.chunk_size - self.rows)
+            rows = slice(self.rows, self.rows + count)
+            samples = slice(start, start + count)
+            maps = self.__maps
+            maps[TIME_COLUMN][rows] = (
+                time if np.ndim(time) == 0 else time[samples]
+            )
+            maps[DRONE_COLUMN][rows] = drones[samples]
+            for key, value in values.items():
+                maps[key][rows] = value[samples]
+            self.rows += count
+            self.samples += count
+            start += count
+
+    def meta(self) -> Dict:
+        chunks = list(self.chunks)
+        if self.rows > 0:
+            chunks.append(self.__current_chunk())
+        return {
+            "chunk_size": self.chunk_size,
+            "columns": [
+                {"name": c.name, "dtype": c.dtype, "shape": list(c.shape)}
+                for c in self.columns
+            ],
+            "chunks": chunks,
+        }
+
+    def flush(self) -> None:
+        for array in self.__maps.values():
+            array.flush()
+
+    def close(self) -> None:
+        if self.__worker is not None:
+            self.__worker.join()
+        self.flush()
+        if self.rows > 0:
+            self.chunks.append(self.__current_chunk())
+            self.rows = 0
+        # Spare chunk never written
+        for column in self.columns:
+            path = chunk_file(
+                self.recorder.directory,
+                self.name,
+                column.name,
+                self.__chunk + 1,
+            )
+            if os.path.exists(path):
+                os.remove(path)
+        self.__maps = {}
+        self.__spare = None
+
+
+class FlightRecorder:
+    """
+    Records timestamped samples of the drones in chunked, memory-mapped
+    columnar files, read back by FlightLog:
+
+        directory/meta.json                     names, streams, columns and chunks
+        directory/{stream}/{column}.{chunk}.npy one fixed-dtype column per chunk
+
+    Every stream has a time and a drone column in front of its own ones.
+    """
+
+    def __init__(
+        self, directory: str, names: List[str], chunk_size: int = 4096
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.directory = directory
+        self.names = list(names)
+        self.chunk_size = chunk_size
+        self.streams: Dict[str, RecorderStream] = {}
+        self.lock = threading.Lock()  # Guards the index of the streams
+        os.makedirs(directory, exist_ok=True)
+
+    def add_stream(
+        self, name: str, columns: List[ColumnSpec], chunk_size: int = None
+    ) -> RecorderStream:
+        if name in self.streams:
+            raise ValueError(f"Stream {name} already exists")
+        stream = RecorderStream(
+            self, name, columns, chunk_size if chunk_size else self.chunk_size
+        )
+        self.streams[name] = stream
+        self.write_meta()
+        return stream
+
+    def write_meta(self) -> None:
+        with self.lock:
+            meta = {
+                "names": self.names,
+                "streams": {
+                    name: stream.meta()
+                    for name, stream in self.streams.items()
+                },
+            }
+            path = os.path.join(self.directory, META_FILE)
+            with open(path + ".tmp", "w") as file:
+                json.dump(meta, file, indent=2)
+            os.replace(path + ".tmp", path)
+
+    def close(self) -> None:
+        for stream in self.streams.values():
+            stream.close()
+        self.write_meta()
+
+
+class FlightLog:
+    """
+    Reads back a recording of FlightRecorder. Columns are concatenated from
+    memory-mapped chunks, so only the requested columns and time range are
+    read from disk. Chunks missing from meta.json, as after a crash, are
+    recovered up to their last written sample.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r") as file:
+            meta = json.load(file)
+        self.names: List[str] = meta["names"]
+        self.__streams: Dict[str, Dict] = meta["streams"]
+
+    @property
+    def streams(self) -> List[str]:
+        return list(self.__streams.keys())
+
+    def columns(self, stream: str) -> List[str]:
+        return [column["name"] for column in self.__streams[stream]["columns"]]
+
+    def __chunks(self, stream: str) -> List[Dict]:
+        chunks = [
+            dict(chunk, index=i)
+            for i, chunk in enumerate(self.__streams[stream]["chunks"])
+        ]
+        # Chunks written after the last update of meta.json
+        index = len(chunks)
+        if (
+            chunks
+            and chunks[-1]["rows"] < self.__streams[stream]["chunk_size"]
+        ):
+            index -= 1
+            chunks.pop()
+        while os.path.exists(
+            chunk_file(self.directory, stream, TIME_COLUMN, index)
+        ):
+            time = np.load(
+                chunk_file(self.directory, stream, TIME_COLUMN, index),
+                mmap_mode="r",
+            )
+            rows = int(np.count_nonzero(~np.isnan(time)))
+            if rows == 0:
+                break
+            chunks.append(
+                {
+                    "rows": rows,
+                    "t_start": float(time[0]),
+                    "t_end": float(time[rows - 1]),
+                    "index": index,
+                }
+            )
+            index += 1
+        return chunks
+
+    def read(
+        self,
+        stream: str,
+        columns: List[str] = None,
+        start: float = None,
+        end: float = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Reads the columns of a stream.
+
+        Args:
+            stream (str): The stream to read.
+            columns (List[str]): The columns to read, all of them if None.
+            start (float): Skip the samples before this time.
+            end (float): Skip the samples after this time.
+
+        Returns:
+            Dict[str, np.ndarray]: The columns, keyed by name, one row per sample.
+        """
+        if columns is None:
+            columns = self.columns(stream)
+        chunks = [
+            chunk
+            for chunk in self.__chunks(stream)
+            if (start is None or chunk["t_end"] >= start)
+            and (end is None or chunk["t_start"] <= end)
+        ]
+        wanted = list(columns)
+        if TIME_COLUMN not in wanted:
+            wanted.append(TIME_COLUMN)
+        data = {}
+        for column in wanted:
+            parts = [
+                np.load(
+                    chunk_file(self.directory, stream, column, chunk["index"]),
+                    mmap_mode="r",
+                )[: chunk["rows"]]
+                for chunk in chunks
+            ]
+            spec = next(
+                c
+                for c in self.__streams[stream]["columns"]
+                if c["name"] == column
+            )
+            if parts:
+                data[column] = np.concatenate(parts)
+            else:
+                data[column] = np.empty(
+                    (0, *spec["shape"]), dtype=spec["dtype"]
+                )
+
+        if start is not None or end is not None:
+            time = data[TIME_COLUMN]
+            mask = np.ones(time.shape[0], dtype=bool)
+            if start is not None:
+                mask &= time >= start
+            if end is not None:
+                mask &= time <= end
+            data = {column: values[mask] for column, values in data.items()}
+        return {column: data[column] for column in columns}
+
+    def read_drone(
+        self, stream: str, name: str, columns: List[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Reads the columns of a stream for a single drone.
+        """
+        if columns is None:
+            columns = self.columns(stream)
+        data = self.read(stream, list(set(columns) | {DRONE_COLUMN}))
+        mask = data[DRONE_COLUMN] == self.names.index(name)
+        return {column: data[column][mask] for column in columns}
@@ -0,0 +1,115 @@
+from threading import Lock
+from typing import Dict, List
+
+import numpy as np
+
+# Upper edges of the histogram bins [s]: 0.1 ms to 10 s, 20 bins per decade
+LATENCY_BINS = np.logspace(-4, 1, 101)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bin histogram of latencies, cheap enough to be fed on every
+    message: a sample is one binary search and a few increments.
+    Samples above the last bin are counted in an overflow bin.
+    """
+
+    def __init__(self, bins: np.ndarray = LATENCY_BINS):
+        self.bins = np.asarray(bins, dtype=float)
+        self.counts = np.zeros(self.bins.shape[0] + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency: float) -> None:
+        self.counts[np.searchsorted(self.bins, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def add_many(self, latencies: np.ndarray) -> None:
+        latencies = np.asarray(latencies, dtype=float)
+        if latencies.size == 0:
+            return
+        np.add.at(self.counts, np.searchsorted(self.bins, latencies), 1)
+        self.count += latencies.size
+        self.total += float(latencies.sum())
+        self.max = max(self.max, float(latencies.max()))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else float("nan")
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper edge of the bin holding the q-th percentile [s], NaN if empty.
+        """
+        if self.count == 0:
+            return float("nan")
+        k = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        if k >= self.bins.shape[0]:
+            return self.max
+        return min(float(self.bins[k]), self.max)
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class LatencyTracer:
+    """
+    Per-stage latency histograms of the control loop. Every stage is the
+    time elapsed from an origin stamp (e.g. the reception of a pose from
+    cflib) to a point of the pipeline, so the stages of the nodes can be
+    compared with each other to find where the delay is spent.
+    """
+
+    def __init__(self, stages: List[str], bins: np.ndarray = LATENCY_BINS):
+        self.stages = list(stages)
+        self.histograms: Dict[str, LatencyHistogram] = {
+            stage: LatencyHistogram(bins) for stage in self.stages
+        }
+        # Stages are fed from the executor and cflib threads
+        self.__lock = Lock()
+
+    def record(self, stage: str, latency: float) -> None:
+        with self.__lock:
+            self.histograms[stage].add(latency)
+
+    def record_many(self, stage: str, latencies: np.ndarray) -> None:
+        with self.__lock:
+            self.histograms[stage].add_many(latencies)
+
+    def summary(self, reset: bool = False) -> Dict[str, Dict[str, float]]:
+        """
+        Count, mean, p50, p90, p99 and max of every stage [s], and the
+        non-empty bins as (upper edge, count) pairs.
+        """
+        summary = {}
+        with self.__lock:
+            for stage, histogram in self.histograms.items():
+                nonzero = np.flatnonzero(histogram.counts)
+                summary[stage] = {
+                    "count": histogram.count,
+                    "mean": histogram.mean,
+                    "p50": histogram.percentile(50),
+                    "p90": histogram.percentile(90),
+                    "p99": histogram.percentile(99),
+                    "max": histogram.max,
+                    "bins": [
+                        (
+                            (
+                                float(histogram.bins[k])
+                                if k < histogram.bins.shape[0]
+                                else float("inf")
+                            ),
+                            int(histogram.counts[k]),
+                        )
+                        for k in nonzero
+                    ],
+                }
+                if reset:
+                    histogram.reset()
+        return summary
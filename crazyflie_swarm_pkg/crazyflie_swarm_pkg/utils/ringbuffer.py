@@ -1,5 +1,21 @@
 import numpy as np
 
+RING_BUFFER_FILTERS = ["mean", "median", "min"]
+
+
+def as_real_array(elem) -> np.ndarray:
+    """
+    Converts a real scalar or array (Python or NumPy) into a float64 array,
+    None becomes NaN. Returns None if elem is not a real value.
+    """
+    if elem is None:
+        return np.array(np.nan)
+    try:
+        return np.asarray(elem, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
 class RingBuffer:
 
     def __init__(self, size: int, shape: tuple) -> None:
@@ -9,9 +25,8 @@ class RingBuffer:
         self.__filled = False
 
     def append(self, elem) -> None:
-        if type(elem) != float:
-            return
-        if np.isnan(elem):
+        elem = as_real_array(elem)
+        if elem is None or np.isnan(elem).any():
             return
         self.data[self.index] = elem
         self.index = (self.index + 1) % self.size
@@ -46,3 +61,111 @@ class RingBuffer:
     @property
     def shape(self):
         return self.data.shape
+
+
+class MultiChannelRingBuffer:
+    """
+    Ring buffer of the last size samples of several channels, stored in one
+    (size, channels) array so that a sample of every channel is appended with
+    one write.
+
+    Each channel keeps its own write index and count, since missing samples
+    (None or NaN) are skipped per channel, and a running sum, so that the
+    mean of the window is updated in O(channels) per append. The running sums
+    are recomputed from the window every size appends to cancel the rounding
+    drift.
+    """
+
+    def __init__(self, size: int, channels: int, filter: str = "mean") -> None:
+        if filter not in RING_BUFFER_FILTERS:
+            raise ValueError(
+                f"Unknown filter {filter}, expected one of {RING_BUFFER_FILTERS}"
+            )
+        self.size: int = size
+        self.channels: int = channels
+        self.filter: str = filter
+        self.data = np.zeros(shape=(size, channels), dtype=np.float64)
+        self.index = np.zeros(channels, dtype=int)  # Next write row
+        self.count = np.zeros(channels, dtype=int)  # Samples in the window
+        self.__sums = np.zeros(channels, dtype=np.float64)
+        self.__channels = np.arange(channels)
+        self.__appends = 0
+
+    def append(self, elem) -> None:
+        """
+        Appends a sample to every channel. elem is a real scalar, broadcast to
+        all the channels, or a sequence with a value per channel.
+        """
+        values = as_real_array(elem)
+        if values is None:
+            return
+        values = np.broadcast_to(values, (self.channels,))
+        valid = ~np.isnan(values)
+        if not valid.all():
+            channels = self.__channels[valid]
+            values = values[valid]
+        else:
+            channels = self.__channels
+        if len(channels) == 0:
+            return
+
+        rows = self.index[channels]
+        self.__sums[channels] += values - self.data[rows, channels]
+        self.data[rows, channels] = values
+        self.index[channels] = (rows + 1) % self.size
+        self.count[channels] = np.minimum(self.count[channels] + 1, self.size)
+
+        self.__appends += 1
+        if self.__appends % self.size == 0:
+            # Rows not written yet are zeros, so the sum is exact
+            self.__sums = self.data.sum(axis=0)
+
+    def get_current(self) -> np.ndarray:
+        """
+        The last sample of each channel, NaN for empty channels.
+        """
+        current = self.data[(self.index - 1) % self.size, self.__channels]
+        return np.where(self.count > 0, current, np.nan)
+
+    def compute_mean(self) -> np.ndarray:
+        """
+        Mean of the window of each channel in O(channels), NaN for empty channels.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.__sums / self.count, np.nan)
+
+    def compute_median(self) -> np.ndarray:
+        return self.__reduce(np.median, np.nanmedian)
+
+    def compute_min(self) -> np.ndarray:
+        return self.__reduce(np.min, np.nanmin)
+
+    def compute(self) -> np.ndarray:
+        """
+        The configured filter (mean, median or min of the window) of each channel.
+        """
+        if self.filter == "median":
+            return self.compute_median()
+        if self.filter == "min":
+            return self.compute_min()
+        return self.compute_mean()
+
+    def __reduce(self, reduce, nan_reduce) -> np.ndarray:
+        if (self.count == self.size).all():
+            return reduce(self.data, axis=0)
+        window = np.where(
+            np.arange(self.size)[:, None] < self.count[None, :],
+            self.data,
+            np.nan,
+        )
+        result = np.full(self.channels, np.nan)
+        filled = self.count > 0
+        result[filled] = nan_reduce(window[:, filled], axis=0)
+        return result
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def shape(self):
+        return self.data.shape
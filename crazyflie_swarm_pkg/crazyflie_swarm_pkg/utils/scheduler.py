@@ -0,0 +1,98 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass
+class LoopStage:
+    name: str
+    divider: int  # The stage runs every divider ticks
+    callback: Callable[[], None]
+    runs: int = 0
+    duration: float = 0.0  # Time spent in the stage since the last report [s]
+    max_duration: float = 0.0
+
+
+class LoopScheduler:
+    """
+    Fixed-rate control loop driven by a single timer. At every tick the stages
+    that are due run in the order they were added, each stage at an integer
+    divider of the loop rate, so their phases can never drift apart.
+
+    The scheduler records the jitter of the tick period and the ticks that
+    overran it.
+    """
+
+    def __init__(
+        self, rate: float, clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate
+        self.period = 1 / rate
+        self.clock = clock
+        self.stages: List[LoopStage] = []
+        self.ticks = 0
+        self.overruns = 0
+        self.__last_tick = None
+        self.__jitter_sum = 0.0
+        self.__jitter_max = 0.0
+        self.__jitter_count = 0
+        self.__window_overruns = 0
+
+    def add_stage(
+        self, name: str, rate: float, callback: Callable[[], None]
+    ) -> None:
+        divider = max(1, int(round(self.rate / rate)))
+        self.stages.append(
+            LoopStage(name=name, divider=divider, callback=callback)
+        )
+
+    def tick(self) -> None:
+        start = self.clock()
+        if self.__last_tick is not None:
+            jitter = abs(start - self.__last_tick - self.period)
+            self.__jitter_sum += jitter
+            self.__jitter_max = max(self.__jitter_max, jitter)
+            self.__jitter_count += 1
+        self.__last_tick = start
+
+        for stage in self.stages:
+            if self.ticks % stage.divider != 0:
+                continue
+            stage_start = self.clock()
+            stage.callback()
+            duration = self.clock() - stage_start
+            stage.runs += 1
+            stage.duration += duration
+            stage.max_duration = max(stage.max_duration, duration)
+
+        if self.clock() - start > self.period:
+            self.overruns += 1
+            self.__window_overruns += 1
+        self.ticks += 1
+
+    def report(self) -> str:
+        """
+        Summarizes jitter, overruns and stage durations since the last report, then resets them.
+        """
+        jitter_mean = self.__jitter_sum / max(self.__jitter_count, 1)
+        lines = [
+            f"Loop at {self.rate:.1f}Hz: jitter mean {1e3 * jitter_mean:.2f}ms "
+            + f"max {1e3 * self.__jitter_max:.2f}ms, "
+            + f"overruns {self.__window_overruns} ({self.overruns} total)"
+        ]
+        for stage in self.stages:
+            mean = stage.duration / max(stage.runs, 1)
+            lines.append(
+                f"  - {stage.name} at {self.rate / stage.divider:.1f}Hz: "
+                + f"mean {1e3 * mean:.2f}ms max {1e3 * stage.max_duration:.2f}ms"
+            )
+            stage.runs = 0
+            stage.duration = 0.0
+            stage.max_duration = 0.0
+
+        self.__jitter_sum = 0.0
+        self.__jitter_max = 0.0
+        self.__jitter_count = 0
+        self.__window_overruns = 0
+
+        return "\n".join(lines)
@@ -1,12 +1,14 @@
-from typing import Type, TypeVar
+from typing import TYPE_CHECKING, Type, TypeVar
 
 import yaml
 from omegaconf import OmegaConf
-from rclpy.impl.rcutils_logger import RcutilsLogger
+
+if TYPE_CHECKING:
+    from rclpy.impl.rcutils_logger import RcutilsLogger
 
 
 def log(
-    message="", ros2_logger: RcutilsLogger = None, ros2_logger_level="info"
+    message="", ros2_logger: "RcutilsLogger" = None, ros2_logger_level="info"
 ) -> None:
     if ros2_logger is None:
         print(message)
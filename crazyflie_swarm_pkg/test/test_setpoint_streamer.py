@@ -0,0 +1,87 @@
+import pytest
+
+from crazyflie_swarm_pkg.crazyflie.setpoint_streamer import (
+    HOLD_SETPOINT,
+    SetpointStreamer,
+)
+from crazyflie_swarm_pkg.utils import SetpointConfig
+
+
+class FakeRobot:
+    def __init__(self):
+        self.name = "cf1"
+        self.is_flying = True
+        self.stopped = False
+        self.setpoints = []
+
+    def set_velocity(self, vx, vy, yaw_rate):
+        self.setpoints.append((vx, vy, yaw_rate))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def streamer():
+    return SetpointStreamer(
+        FakeRobot(),
+        SetpointConfig(queue_size=4, keepalive=True, command_timeout=0.5),
+        clock=FakeClock(),
+    )
+
+
+def test_only_the_newest_command_is_sent(streamer):
+    for k in range(3):
+        streamer.push(0.1 * k, 0.0, 0.0)
+    streamer.tick()
+
+    assert streamer.robot.setpoints == [(0.2, 0.0, 0.0)]
+    assert streamer.stats.received == 3
+    assert streamer.stats.coalesced == 2
+    assert streamer.stats.sent == 1
+
+
+def test_full_queue_drops_the_oldest_commands(streamer):
+    for k in range(6):
+        streamer.push(0.1 * k, 0.0, 0.0)
+    streamer.tick()
+
+    assert streamer.robot.setpoints == [(0.5, 0.0, 0.0)]
+    assert streamer.stats.dropped == 2
+    assert streamer.stats.coalesced == 3
+
+
+def test_keepalive_then_hold_after_the_timeout(streamer):
+    streamer.push(0.3, 0.1, 5.0)
+    streamer.tick()
+    streamer.clock.now = 0.2
+    streamer.tick()
+    streamer.clock.now = 1.0
+    streamer.tick()
+
+    assert streamer.robot.setpoints == [
+        (0.3, 0.1, 5.0),
+        (0.3, 0.1, 5.0),
+        HOLD_SETPOINT,
+    ]
+    assert streamer.stats.keepalives == 2
+    assert streamer.stats.sent == 3
+
+
+def test_nothing_is_sent_once_stopped(streamer):
+    streamer.push(0.3, 0.0, 0.0)
+    streamer.tick()
+    streamer.robot.stopped = True
+    streamer.push(0.4, 0.0, 0.0)
+    streamer.tick()
+    streamer.robot.stopped = False
+    streamer.tick()
+
+    # The last setpoint is forgotten, a keepalive would rearm the motors
+    assert streamer.robot.setpoints == [(0.3, 0.0, 0.0)]
+    assert streamer.stats.dropped == 1
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cflib")
+
+from crazyflie_swarm_pkg.crazyflie.swarm_shards import (  # noqa: E402
+    SharedSwarmTables,
+    shard_groups,
+)
+from crazyflie_swarm_pkg.utils import ShardingConfig  # noqa: E402
+
+
+@pytest.fixture
+def tables():
+    owner = SharedSwarmTables(3, 2)
+    reader = SharedSwarmTables(3, 2, name=owner.name)
+    yield owner, reader
+    reader.close()
+    owner.close()
+
+
+def test_states_are_shared_with_their_stamps(tables):
+    owner, reader = tables
+    values = np.arange(owner.state.shape[1], dtype=float)
+
+    owner.write_state(1, values, stamp=12.5)
+    out = np.zeros_like(reader.state)
+    stamps = np.zeros(3)
+    reader.read_states(out, stamps)
+
+    np.testing.assert_array_equal(out[1], values)
+    assert not out[[0, 2]].any()
+    np.testing.assert_array_equal(stamps, [0.0, 12.5, 0.0])
+    assert owner.state_seq[1] == 2
+
+
+def test_rows_being_written_keep_their_previous_value(tables):
+    owner, reader = tables
+    owner.write_state(0, np.ones(owner.state.shape[1]), stamp=1.0)
+    out = np.zeros_like(reader.state)
+    stamps = np.zeros(3)
+    reader.read_states(out, stamps)
+
+    # A writer stopped halfway: odd sequence number and a torn row
+    owner.state_seq[0] += 1
+    owner.state[0] = 2.0
+    owner.stamp[0] = 2.0
+    reader.read_states(out, stamps, retries=2)
+
+    assert (out[0] == 1.0).all()
+    assert stamps[0] == 1.0
+
+    owner.state_seq[0] += 1
+    reader.read_states(out, stamps)
+    assert (out[0] == 2.0).all()
+    assert stamps[0] == 2.0
+
+
+def crazyflie(name: str, uri: str):
+    return SimpleNamespace(name=name, uri=uri, active=True)
+
+
+def test_shards_never_split_a_crazyradio():
+    crazyflies = [
+        crazyflie("cf1", "radio://0/80/2M/E7E7E7E701"),
+        crazyflie("cf2", "radio://0/80/2M/E7E7E7E702"),
+        crazyflie("cf3", "radio://1/90/2M/E7E7E7E703"),
+    ]
+
+    assert shard_groups(crazyflies, ShardingConfig()) == [
+        ["cf1", "cf2"],
+        ["cf3"],
+    ]
+    with pytest.raises(ValueError):
+        shard_groups(crazyflies, ShardingConfig(max_drones_per_shard=1))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("crazyflie_swarm_interfaces")
+
+from crazyflie_swarm_pkg.crazyflie.swarm_state_msg import (  # noqa: E402
+    SWARM_STATE_FIELDS,
+    arrays_to_swarm_state_msg,
+    swarm_state_msg_stamps,
+    swarm_state_msg_to_arrays,
+)
+
+
+def test_swarm_state_msg_round_trip():
+    names = ["cf1", "cf2", "cf3"]
+    uris = [f"radio://0/80/2M/E7E7E7E70{i}" for i in range(len(names))]
+    rng = np.random.default_rng(0)
+    arrays = {
+        key: rng.uniform(-5.0, 5.0, (len(names), size))
+        for key, size in SWARM_STATE_FIELDS.items()
+    }
+    stamps = np.array([1.5, 0.0, 1700000000.123456])
+
+    msg = arrays_to_swarm_state_msg(names, uris, arrays, stamps)
+    decoded = swarm_state_msg_to_arrays(msg)
+
+    assert list(msg.names) == names and list(msg.uris) == uris
+    assert decoded.keys() == arrays.keys()
+    for key, values in arrays.items():
+        assert decoded[key].dtype == np.float32
+        np.testing.assert_array_equal(decoded[key], values.astype(np.float32))
+    # The stamps keep the float64 resolution of the clock
+    np.testing.assert_array_equal(swarm_state_msg_stamps(msg), stamps)
+
+
+def test_swarm_state_msg_without_stamps():
+    names = ["cf1", "cf2"]
+    arrays = {
+        key: np.zeros((len(names), size))
+        for key, size in SWARM_STATE_FIELDS.items()
+    }
+
+    msg = arrays_to_swarm_state_msg(names, ["", ""], arrays)
+
+    np.testing.assert_array_equal(swarm_state_msg_stamps(msg), np.zeros(2))